@@ -1,18 +1,24 @@
 # -*- coding: utf-8 -*-
-import pandas as pd
-import win32com.client
 import sys
-import gspread
 from datetime import datetime, timedelta
 import subprocess
-import time
 import re
 import os
 import configparser
-import pywintypes
+import logging
 import ssl
 from dotenv import load_dotenv
 
+from sap_conexao import obter_sapgui, ErroCOM
+from resolvedor_controles import ResolvedorControles
+from rastreamento import span, rastrear, instrumentar_sessao, instrumentar_planilha
+from cliente_planilhas import com_cota, conectar_google, em_segundo_plano
+from espera_sap import aguardar_sap as aguardar_sessao_sap, aguardar_condicao, fechar_popup
+from cache_validacao import CacheValidacao
+from diario_lotes import DiarioLotes
+from conferencia_grid import ConferenciaGrid
+from log_fila import iniciar_log_em_fila, arquivo_rotativo, FormatoJSON
+
 # Ajuste SSL para requisições
 ssl._create_default_https_context = ssl._create_unverified_context
 
@@ -25,6 +31,28 @@ class Colors:
     AZUL = "\033[94m"
     CIANO = "\033[96m"
 
+# estilo do registro → (prefixo, cor no console)
+ESTILOS_LOG = {
+    'header': ('', Colors.AZUL),
+    'sucesso': ('[SUCESSO] ', Colors.VERDE),
+    'info': ('[INFO]    ', Colors.CIANO),
+    'aviso': ('[AVISO]   ', Colors.AMARELO),
+    'erro': ('[ERRO]    ', Colors.VERMELHO),
+    'detalhe': ('', ''),
+}
+
+class FormatoConsole(logging.Formatter):
+    def format(self, record):
+        prefixo, cor = ESTILOS_LOG.get(getattr(record, 'estilo', 'info'), ESTILOS_LOG['info'])
+        texto = f"{prefixo}{record.getMessage()}"
+        return f"{cor}{texto}{Colors.RESET}" if cor else texto
+
+class FormatoArquivo(logging.Formatter):
+    def format(self, record):
+        prefixo, _ = ESTILOS_LOG.get(getattr(record, 'estilo', 'info'), ESTILOS_LOG['info'])
+        momento = datetime.fromtimestamp(record.created).strftime("%d/%m/%Y %H:%M:%S")
+        return f"[{momento}] {prefixo}{record.getMessage().strip()}"
+
 class SAPBotCLI:
     # Mapeamento de Depósitos por Origem
     DEPOSITO_MAPPING = {
@@ -40,13 +68,18 @@ class SAPBotCLI:
         'BR1B': 'AE01', 'BR0F': 'AE01', 'BR8I': 'AE01', 'BRIJ': 'AE01', 'BR8G': 'AE01'
     }
 
-    def __init__(self):
+    def __init__(self, base_path=None):
         self.running = True
         self.session = None
+        self._resolvedor = None
+        self.diario = None
+        self._contexto_log = {}  # campos do lote atual, repetidos em cada registro
         self.config = configparser.ConfigParser()
         
         # Define os caminhos base
-        if getattr(sys, 'frozen', False):
+        if base_path:
+            self.base_path = base_path
+        elif getattr(sys, 'frozen', False):
             self.base_path = os.path.dirname(sys.executable)
         else:
             self.base_path = os.path.dirname(os.path.abspath(__file__))
@@ -62,8 +95,17 @@ class SAPBotCLI:
         with open(self.log_file_path, 'a', encoding='utf-8') as log_file:
             log_file.write(f"\n{'='*50}\nSessão iniciada em {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
             log_file.write(f"Caminho base: {self.base_path}\n{'='*50}\n")
-            
+
+        self._iniciar_log(formato_json=os.getenv('FC_LOG_JSON') == '1')
         self.load_config()
+        if not self._log_json and self.config.getboolean('LOG', 'json', fallback=False):
+            self._iniciar_log(formato_json=True)
+
+        # Cache de validações (PN, ORIGEM, DESTINO) entre execuções
+        self.cache_validacao = CacheValidacao(
+            os.path.join(self.base_path, 'cache_validacao.json'),
+            ttl_horas=self.config.getfloat('CACHE', 'ttl_horas', fallback=168),
+        )
 
     def load_config(self):
         if not os.path.exists(self.config_path):
@@ -82,59 +124,78 @@ class SAPBotCLI:
     def create_default_config(self):
         self.config['SAP'] = {
             'caminho_logon': r'C:\Program Files (x86)\SAP\FrontEnd\SAPgui\saplogon.exe', 
-            'sistema': 'ECC PRODUÇÃO'
+            'sistema': 'ECC PRODUÇÃO',
+            'botao_excluir_item': 'DELETE',
+            'coluna_deposito_grid': ''
         }
         self.config['GOOGLE'] = {
             'credenciais': 'credentials.json', 
             'planilha': 'MAPEAMENTO PLANNING', 
             'aba': 'REQ INTERNA'
         }
+        self.config['EXECUCAO'] = {
+            'passagem_unica': 'false'
+        }
+        self.config['CACHE'] = {
+            'ttl_horas': '168'
+        }
+        self.config['LOG'] = {
+            'json': 'false'
+        }
         with open(self.config_path, 'w', encoding='utf-8') as configfile:
             self.config.write(configfile)
 
     # --- Funções de Log ---
-    def print_header(self, texto):
+    # Cada print_* vira um registro do logger, enfileirado sem esperar disco:
+    # a thread do log_fila escreve no console (com cores), no app_log.txt
+    # rotativo e, com [LOG] json = true (ou FC_LOG_JSON=1), no app_log.jsonl.
+    # campos (lote, item, material, rc...) só aparecem no JSON.
+    def _iniciar_log(self, formato_json=False):
+        self.logger = logging.getLogger(f"{__name__}.SAPBotCLI")
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(FormatoConsole())
+        handlers = [console, arquivo_rotativo(self.log_file_path, FormatoArquivo())]
+        if formato_json:
+            handlers.append(arquivo_rotativo(os.path.splitext(self.log_file_path)[0] + '.jsonl', FormatoJSON()))
+        iniciar_log_em_fila(self.logger, handlers)
+        self._log_json = formato_json
+
+    def _log(self, nivel, estilo, texto, campos):
+        if self._contexto_log or campos:
+            campos = {**self._contexto_log, **campos}
+        self.logger.log(nivel, texto, extra={'estilo': estilo, 'campos': campos})
+
+    def print_header(self, texto, **campos):
         log_text = f"\n{'='*60}\n {texto.center(58)}\n {'='*60}"
-        print(f"{Colors.AZUL}{log_text}{Colors.RESET}")
-        self._write_to_log_file(log_text)
-
-    def print_sucesso(self, texto):
-        log_text = f"[SUCESSO] {texto}"
-        print(f"{Colors.VERDE}{log_text}{Colors.RESET}")
-        self._write_to_log_file(log_text)
-
-    def print_info(self, texto):
-        log_text = f"[INFO]    {texto}"
-        print(f"{Colors.CIANO}{log_text}{Colors.RESET}")
-        self._write_to_log_file(log_text)
-
-    def print_aviso(self, texto):
-        log_text = f"[AVISO]   {texto}"
-        print(f"{Colors.AMARELO}{log_text}{Colors.RESET}")
-        self._write_to_log_file(log_text)
-
-    def print_erro(self, texto):
-        log_text = f"[ERRO]    {texto}"
-        print(f"{Colors.VERMELHO}{log_text}{Colors.RESET}")
-        self._write_to_log_file(log_text)
-
-    def _write_to_log_file(self, text_to_log):
-        try:
-            timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            cleaned_text = re.sub(r'\033\[[0-9;]*m', '', text_to_log) # Remove códigos de cor ANSI
-            with open(self.log_file_path, 'a', encoding='utf-8') as log_file:
-                log_file.write(f"[{timestamp}] {cleaned_text.strip()}\n")
-        except Exception: pass
+        self._log(logging.INFO, 'header', log_text, campos)
+
+    def print_sucesso(self, texto, **campos):
+        self._log(logging.INFO, 'sucesso', texto, campos)
+
+    def print_info(self, texto, **campos):
+        self._log(logging.INFO, 'info', texto, campos)
+
+    def print_detalhe(self, texto, **campos):
+        self._log(logging.INFO, 'detalhe', texto, campos)
+
+    def print_aviso(self, texto, **campos):
+        self._log(logging.WARNING, 'aviso', texto, campos)
+
+    def print_erro(self, texto, **campos):
+        self._log(logging.ERROR, 'erro', texto, campos)
 
     # --- Automação SAP ---
     def run(self):
         try:
             self.print_header("Iniciando Robô de Requisição de Compra no SAP")
-            
+
+            # Planilha em segundo plano enquanto o SAP conecta (ou abre o logon)
+            planilha = em_segundo_plano(self._conectar_planilha)
+
             # Conexão SAP
             if not self.is_session_valid():
                 self.print_aviso("Sessão SAP inválida ou inexistente. Tentando conectar...")
-                self.session = self.sap_login_handler()
+                self.session = instrumentar_sessao(self.sap_login_handler())
 
             if not self.session:
                 self.print_erro("Falha na conexão com o SAP. Verifique se o SAP está acessível e as credenciais no .env estão corretas.")
@@ -145,26 +206,9 @@ class SAPBotCLI:
             # Processamento Planilha
             try:
                 self.print_header("CONECTANDO À PLANILHA")
-                credenciais_path = os.path.join(self.base_path, self.config.get('GOOGLE', 'credenciais'))
-                gc = gspread.service_account(filename=credenciais_path)
-                spreadsheet = gc.open(self.config.get('GOOGLE', 'planilha'))
-                worksheet = spreadsheet.worksheet(self.config.get('GOOGLE', 'aba'))
+                worksheet = planilha.result()
                 self.print_sucesso("Conexão com a planilha estabelecida.")
-                
-                headers = worksheet.row_values(1)
-                status_col_index = headers.index("Status") + 1
-                req_col_index = headers.index("REQUISIÇÃO") + 1
-                
-                df = pd.DataFrame(worksheet.get_all_records())
-                df['linha_planilha'] = df.index + 2
-                
-                # Considera apenas linhas sem status
-                df_para_processar = df[df['Status'] == ''].copy()
-
-                if df_para_processar.empty:
-                    self.print_aviso("Nenhuma linha nova para processar.")
-                else:
-                    self.processar_lotes(df_para_processar, worksheet, status_col_index, req_col_index)
+                self.processar_aba(worksheet)
 
             except Exception as e:
                 self.print_erro(f"Erro crítico no ciclo principal: {e}")
@@ -177,31 +221,88 @@ class SAPBotCLI:
         finally:
             self.print_header("FIM DO CICLO")
 
+    def _conectar_planilha(self):
+        # ID da planilha e token de acesso reaproveitados de cache_google.json
+        credenciais_path = os.path.join(self.base_path, self.config.get('GOOGLE', 'credenciais'))
+        _, spreadsheet = conectar_google(credenciais_path, nome=self.config.get('GOOGLE', 'planilha'))
+        return spreadsheet.worksheet(self.config.get('GOOGLE', 'aba'))
+
+    def processar_aba(self, worksheet):
+        """Processa as linhas sem status de uma aba já aberta com a sessão atual."""
+        worksheet = instrumentar_planilha(com_cota(worksheet))
+        self.session = instrumentar_sessao(self.session)
+        headers = worksheet.row_values(1)
+        status_col_index = headers.index("Status") + 1
+        req_col_index = headers.index("REQUISIÇÃO") + 1
+        
+        import pandas as pd  # só aqui: deixa o início do executável mais rápido
+        df = pd.DataFrame(worksheet.get_all_records())
+        df['linha_planilha'] = df.index + 2
+        
+        # Considera apenas linhas sem status e com PN (coluna A), como em
+        # leitura_incremental.linha_pendente
+        com_pn = df.iloc[:, 0].astype(str).str.strip() != ''
+        df_para_processar = df[(df['Status'] == '') & com_pn].copy()
+
+        self.diario = DiarioLotes(os.path.join(self.base_path, 'diario_lotes.db'), worksheet.title)
+        try:
+            df_para_processar = self._recuperar_diario(df_para_processar, worksheet, headers)
+
+            if df_para_processar.empty:
+                self.print_aviso("Nenhuma linha nova para processar.")
+            else:
+                with span('execucao', script='transferencia', itens=len(df_para_processar)):
+                    self.processar_lotes(df_para_processar, worksheet, status_col_index, req_col_index)
+        finally:
+            self.diario.compactar()
+            self.diario.fechar()
+
+    def _recuperar_diario(self, df_para_processar, worksheet, headers):
+        """
+        Regrava na planilha o que ficou só no diário local (script caiu entre
+        o Gravar e o batch_update) e tira essas linhas dos pendentes, para a
+        RC nunca ser digitada duas vezes.
+        """
+        pendentes = dict(zip(df_para_processar['linha_planilha'], df_para_processar['PN'].astype(str)))
+        regravar = self.diario.recuperar(pendentes)
+        if not regravar:
+            return df_para_processar
+
+        from gspread.utils import rowcol_to_a1
+        updates = [
+            {'range': rowcol_to_a1(linha, headers.index(coluna) + 1), 'values': [[str(valor)]]}
+            for linha, valores in regravar.items() for coluna, valor in valores.items()
+        ]
+        try:
+            worksheet.batch_update(updates)
+            self._confirmar_no_diario(updates)
+            self.print_aviso(f"{len(regravar)} linha(s) de execução interrompida recuperadas do diário local.")
+        except Exception as e:
+            self.print_erro(f"Erro ao regravar resultados do diário (nova tentativa na próxima execução): {e}")
+        return df_para_processar[~df_para_processar['linha_planilha'].isin(regravar)].copy()
+
+    def _confirmar_no_diario(self, updates):
+        if self.diario is not None:
+            from gspread.utils import a1_to_rowcol
+            self.diario.confirmar(a1_to_rowcol(u['range'])[0] for u in updates)
+
     def aguardar_sap(self, timeout=30):
-        if not self.session: return False
-        start_time = time.time()
-        while self.running:
-            try:
-                if not self.session.busy: return True
-            except: return False
-            if time.time() - start_time > timeout:
-                self.print_aviso(f"Timeout ao aguardar SAP após {timeout} segundos")
-                return False
-            time.sleep(0.2)
-        return False
+        return aguardar_sessao_sap(
+            self.session, timeout, deve_continuar=lambda: self.running, avisar=self.print_aviso
+        )
 
     def is_session_valid(self):
         if self.session is None: return False
         try:
             self.session.findById("wnd")
             return True
-        except (pywintypes.com_error, Exception):
+        except (ErroCOM, Exception):
             return False
 
     def sap_login_handler(self):
         try:
             self.print_info("Procurando por uma sessão SAP GUI...")
-            sap_gui_auto = win32com.client.GetObject("SAPGUI")
+            sap_gui_auto = obter_sapgui()
             application = sap_gui_auto.GetScriptingEngine
             
             if application.Connections.Count > 0:
@@ -218,7 +319,7 @@ class SAPBotCLI:
             
             self.print_aviso("Nenhuma sessão SAP válida encontrada. Iniciando nova conexão...")
             return self.open_and_login_sap()
-        except (pywintypes.com_error, Exception):
+        except (ErroCOM, Exception):
             self.print_aviso("Iniciando processo de login...")
             return self.open_and_login_sap()
 
@@ -234,20 +335,25 @@ class SAPBotCLI:
                 
             self.print_info(f"Abrindo SAP Logon...")
             subprocess.Popen(sap_path)
-            time.sleep(5)
-            
-            sap_gui_auto = win32com.client.GetObject("SAPGUI")
+
+            def _obter_sapgui():
+                try: return obter_sapgui()
+                except (ErroCOM, Exception): return None
+
+            # Espera o SAP Logon registrar o objeto SAPGUI (antes: sleep fixo de 5s)
+            sap_gui_auto = aguardar_condicao(_obter_sapgui, timeout=30)
+            if not sap_gui_auto:
+                self.print_erro("SAP Logon não respondeu em 30 segundos.")
+                return None
             application = sap_gui_auto.GetScriptingEngine
             
             self.print_info(f"Conectando ao sistema '{sap_system}'...")
             connection = application.OpenConnection(sap_system, True)
-            time.sleep(3)
+            if not aguardar_condicao(lambda: connection.Children.Count > 0, timeout=30):
+                return None
             session = connection.Children(0)
             
-            start_time = time.time()
-            while session.busy:
-                time.sleep(0.5)
-                if time.time() - start_time > 30: return None
+            if not aguardar_sessao_sap(session, 30): return None
             
             main_window = session.findById("wnd")
             
@@ -268,10 +374,7 @@ class SAPBotCLI:
                 main_window.findById("usr/pwdRSYST-BCODE").text = password
                 main_window.sendVKey(0)
 
-                start_time = time.time()
-                while session.busy:
-                    time.sleep(0.5)
-                    if time.time() - start_time > 30: return None
+                if not aguardar_sessao_sap(session, 30): return None
                 
                 try: session.findById("wnd").sendVKey(0) 
                 except: pass
@@ -292,6 +395,9 @@ class SAPBotCLI:
 
     def processar_lotes(self, df_para_processar, worksheet, status_col_index, req_col_index):
         self.print_info(f"Encontradas {len(df_para_processar)} linhas pendentes.")
+        passagem_unica = self.config.getboolean('EXECUCAO', 'passagem_unica', fallback=False)
+        if passagem_unica:
+            self.print_info("Modo passagem única: validação e criação na mesma ME51N.")
         
         # Agrupa por Origem e Destino
         grupos = df_para_processar.groupby(['ORIGEM', 'DESTINO'])
@@ -312,203 +418,442 @@ class SAPBotCLI:
             if not self.running: break
             if not self.is_session_valid():
                 self.print_erro("Sessão SAP perdida. Tentando reconectar...")
-                self.session = self.sap_login_handler()
+                self.session = instrumentar_sessao(self.sap_login_handler())
                 if not self.session: break
             
-            origem_val = lote_df.iloc['ORIGEM']
-            destino_val = lote_df.iloc['DESTINO']
-            self.print_header(f"Processando Lote {idx + 1}/{total_lotes} | {origem_val} -> {destino_val}")
+            origem_val = lote_df.iloc[0]['ORIGEM']
+            destino_val = lote_df.iloc[0]['DESTINO']
+            self._contexto_log = {'lote': idx + 1, 'origem': origem_val, 'destino': destino_val}
+            self.print_header(f"Processando Lote {idx + 1}/{total_lotes} | {origem_val} -> {destino_val}",
+                              itens=len(lote_df))
+
+            with span('lote', n=idx + 1, origem=origem_val, destino=destino_val, itens=len(lote_df)):
+                if passagem_unica:
+                    self._processar_lote_passagem_unica(lote_df, worksheet, status_col_index, req_col_index)
+                    continue
             
-            # --- Validação ---
-            resultados = self.validar_lote_na_rc(lote_df)
+                # --- Validação ---
+                resultados = self.validar_lote_na_rc(lote_df)
             
-            # Atualização da Planilha (Validação)
-            validation_updates = []
-            linhas_ok = []
-            for res in resultados:
-                validation_updates.append({'range': f'{gspread.utils.rowcol_to_a1(res["linha_planilha"], status_col_index)}', 'values': [[str(res['status'])]]})
-                validation_updates.append({'range': f'{gspread.utils.rowcol_to_a1(res["linha_planilha"], req_col_index)}', 'values': [[str(res['numero_rc'])]]})
-                if res['status'] == 'OK': linhas_ok.append(res['linha_planilha'])
-
-            if validation_updates:
-                try: 
-                    worksheet.batch_update(validation_updates)
-                except Exception as e: 
-                    self.print_erro(f"Erro update planilha: {e}")
-
-            # --- Criação (apenas itens OK) ---
-            if not linhas_ok:
-                self.print_aviso("Nenhum item válido neste lote. Pulando criação.")
-                continue
+                # Atualização da Planilha (Validação)
+                validation_updates = self._montar_updates(resultados, status_col_index, req_col_index)
+                linhas_ok = [res['linha_planilha'] for res in resultados if res['status'] == 'OK']
+
+                if validation_updates:
+                    try: 
+                        worksheet.batch_update(validation_updates)
+                        self._confirmar_no_diario(validation_updates)
+                    except Exception as e: 
+                        self.print_erro(f"Erro update planilha: {e}")
+
+                # --- Criação (apenas itens OK) ---
+                if not linhas_ok:
+                    self.print_aviso("Nenhum item válido neste lote. Pulando criação.")
+                    continue
                 
-            lote_df_ok = lote_df[lote_df['linha_planilha'].isin(linhas_ok)].copy()
-            lote_df_ok['grid_index'] = range(len(lote_df_ok))
+                lote_df_ok = lote_df[lote_df['linha_planilha'].isin(linhas_ok)].copy()
+                lote_df_ok['grid_index'] = range(len(lote_df_ok))
             
-            if not self.is_session_valid():
-                self.print_erro("Sessão SAP perdida.")
-                break
+                if not self.is_session_valid():
+                    self.print_erro("Sessão SAP perdida.")
+                    break
             
-            numero_rc, msg_status = self.criar_rc_para_lote_ok(lote_df_ok)
+                numero_rc, msg_status = self.criar_rc_para_lote_ok(lote_df_ok)
             
-            # Atualização Final
-            creation_updates = []
-            for linha in lote_df_ok['linha_planilha']:
-                creation_updates.append({'range': f'{gspread.utils.rowcol_to_a1(linha, status_col_index)}', 'values': [[str(msg_status)]]})
-                if numero_rc:
-                    creation_updates.append({'range': f'{gspread.utils.rowcol_to_a1(linha, req_col_index)}', 'values': [[str(numero_rc)]]})
+                # Atualização Final
+                creation_updates = self._montar_updates_criacao(lote_df_ok, numero_rc, msg_status, status_col_index, req_col_index)
             
-            if creation_updates:
-                try:
-                    worksheet.batch_update(creation_updates)
-                    self.print_sucesso("RC Criada e Planilha atualizada.")
-                except Exception as e: 
-                    self.print_erro(f"Erro update final: {e}")
+                if creation_updates:
+                    try:
+                        worksheet.batch_update(creation_updates)
+                        self._confirmar_no_diario(creation_updates)
+                        self.print_sucesso("RC Criada e Planilha atualizada.", rc=numero_rc)
+                    except Exception as e: 
+                        self.print_erro(f"Erro update final: {e}")
+        self._contexto_log = {}
+
+    def _processar_lote_passagem_unica(self, lote_df, worksheet, status_col_index, req_col_index):
+        rejeitados, lote_df_ok, numero_rc, msg_status = self.validar_e_criar_rc(lote_df)
+
+        if msg_status is None and not lote_df_ok.empty:
+            # Não foi possível remover as linhas com erro do grid: cria em uma
+            # segunda ME51N só com os itens aprovados (fluxo antigo)
+            numero_rc, msg_status = self.criar_rc_para_lote_ok(lote_df_ok)
 
-    def validar_lote_na_rc(self, lote_de_itens):
-        if lote_de_itens.empty: return []
-        resultados_finais = []
+        # Rejeitados e número da RC em um único batch_update
+        updates = self._montar_updates(rejeitados, status_col_index, req_col_index)
+        if not lote_df_ok.empty:
+            updates += self._montar_updates_criacao(lote_df_ok, numero_rc, msg_status, status_col_index, req_col_index)
+        if not updates:
+            return
+        try:
+            worksheet.batch_update(updates)
+            self._confirmar_no_diario(updates)
+            if numero_rc:
+                self.print_sucesso("RC Criada e Planilha atualizada.", rc=numero_rc)
+            else:
+                self.print_aviso("Planilha atualizada (sem RC criada neste lote).")
+        except Exception as e:
+            self.print_erro(f"Erro update planilha: {e}")
+
+    @staticmethod
+    def _montar_updates(resultados, status_col_index, req_col_index):
+        from gspread.utils import rowcol_to_a1
+        updates = []
+        for res in resultados:
+            updates.append({'range': f'{rowcol_to_a1(res["linha_planilha"], status_col_index)}', 'values': [[str(res['status'])]]})
+            updates.append({'range': f'{rowcol_to_a1(res["linha_planilha"], req_col_index)}', 'values': [[str(res['numero_rc'])]]})
+        return updates
+
+    @staticmethod
+    def _montar_updates_criacao(lote_df_ok, numero_rc, msg_status, status_col_index, req_col_index):
+        from gspread.utils import rowcol_to_a1
+        updates = []
+        for linha in lote_df_ok['linha_planilha']:
+            updates.append({'range': f'{rowcol_to_a1(linha, status_col_index)}', 'values': [[str(msg_status)]]})
+            if numero_rc:
+                updates.append({'range': f'{rowcol_to_a1(linha, req_col_index)}', 'values': [[str(numero_rc)]]})
+        return updates
+
+    # --- Blocos da ME51N (ZRT) ---
+    def _controles(self):
+        """Resolvedor de controles da sessão atual (recriado se a sessão mudar)."""
+        if self._resolvedor is None or self._resolvedor.session is not self.session:
+            self._resolvedor = ResolvedorControles(self.session)
+        return self._resolvedor
+
+    def _abrir_me51n_zrt(self):
+        """Abre a ME51N com tipo de documento ZRT e retorna o grid de itens."""
+        self.session.findById("wnd").maximize()
+        self.session.findById("wnd/tbar/okcd").text = "/NME51N"
+        self.session.findById("wnd").sendVKey(0)
+        self.aguardar_sap()
+        controles = self._controles()
+        controles.invalidar()
+        # Espera o combo de tipo de documento existir (antes: sleep fixo de 1s)
+        combo = controles.aguardar('tipo_documento', timeout=30, deve_continuar=lambda: self.running)
+        if combo is None:
+            combo = controles.controle('tipo_documento')
+        combo.key = "ZRT"
+        self.session.findById("wnd").sendVKey(0)
+        self.aguardar_sap()
+        return controles.controle('grid')
+
+    @staticmethod
+    def _data_remessa(item):
+        try:
+            lt_dias = int(str(item.get('LT', 0)).strip() or 0)
+        except ValueError:
+            lt_dias = 0
+        return (datetime.now() + timedelta(days=lt_dias)).strftime('%d.%m.%Y')
+
+    def _preencher_linha(self, grid, i, item):
+        grid.modifyCell(i, "MATNR", str(item.get('PN')))
+        grid.modifyCell(i, "MENGE", str(item.get('QTD', '1')).replace(',', '.'))
+        grid.modifyCell(i, "RESWK", str(item.get('ORIGEM')))
+        grid.modifyCell(i, "EEIND", self._data_remessa(item))
+        grid.modifyCell(i, "EPSTP", "U")
+        grid.modifyCell(i, "NAME1", str(item.get('DESTINO')))
+        grid.modifyCell(i, "EKGRP", "P04")
+        grid.modifyCell(i, "TXZ01", str(item.get('TEXTO')))
+        coluna_deposito = self._coluna_deposito_grid()
+        if coluna_deposito:
+            try:
+                grid.modifyCell(i, coluna_deposito, self._deposito(item))
+            except Exception:
+                pass  # layout sem a coluna: a conferência em _inserir_depositos cai no detalhe
+
+    def _confirmar_e_ler_status(self):
+        """Enter (duas vezes, como na validação) e retorna 'OK' ou a mensagem de erro."""
+        self.session.findById("wnd").sendVKey(0)
+        self.aguardar_sap()
         try:
-            self.print_info(f"Validando Lote ({len(lote_de_itens)} itens)")
-            self.session.findById("wnd").maximize()
-            self.session.findById("wnd/tbar/okcd").text = "/NME51N"
             self.session.findById("wnd").sendVKey(0)
             self.aguardar_sap()
-            time.sleep(1)
-            self.session.findById("wnd/usr/subSUB0:SAPLMEGUI:0016/subSUB0:SAPLMEGUI:0030/subSUB1:SAPLMEGUI:3327/cmbMEREQ_TOPLINE-BSART").key = "ZRT"
-            self.session.findById("wnd").sendVKey(0)
+        except: pass
+
+        status_bar = self.session.findById("wnd/sbar")
+        if status_bar.messageType in ('E', 'A') or "não está atualizado no centro" in status_bar.text:
+            return status_bar.text
+        return "OK"
+
+    def _excluir_linha(self, grid, i):
+        """Remove a linha i do grid de itens (botão configurável em [SAP] botao_excluir_item)."""
+        grid.selectedRows = str(i)
+        grid.pressToolbarButton(self.config.get('SAP', 'botao_excluir_item', fallback='DELETE'))
+        self.aguardar_sap()
+        fechar_popup(self.session, "wnd[1]/usr/btnSPOP-OPTION1", alternativas=("wnd[1]/tbar[0]/btn[0]",))
+
+    def _descartar_documento(self):
+        """Sai da ME51N sem gravar (/N e confirma o popup de dados perdidos)."""
+        self.session.findById("wnd/tbar/okcd").text = "/N"
+        self.session.findById("wnd").sendVKey(0)
+        self.aguardar_sap()
+        fechar_popup(self.session, "wnd[1]/usr/btnSPOP-OPTION1", alternativas=("wnd[1]/tbar[0]/btn[0]",))
+
+    def _deposito(self, item):
+        origem_key = str(item.get('ORIGEM')).strip().upper()
+        return str(self.DEPOSITO_MAPPING.get(origem_key, 'AE01'))
+
+    def _coluna_deposito_grid(self):
+        """Coluna do grid para EBAN-ZZDEP_FORNEC ([SAP] coluna_deposito_grid); vazio = só pelo detalhe."""
+        return self.config.get('SAP', 'coluna_deposito_grid', fallback='').strip()
+
+    def _inserir_depositos(self, grid, lote):
+        """
+        Preenche EBAN-ZZDEP_FORNEC em todos os itens. Retorna False se cancelado.
+
+        - Com [SAP] coluna_deposito_grid o depósito já foi digitado no grid
+          por _preencher_linha: as células são relidas (ConferenciaGrid) e,
+          se todas mostram o depósito certo, o detalhe não é aberto.
+        - Sem a configuração (padrão), ou se alguma célula não confere: uma
+          única passada pelo detalhe. Abre o 1º item, seleciona as abas uma
+          vez (a ME51N mantém a aba ao trocar de item) e, a cada item, só
+          digita o depósito e avança. Campo que já mostra o depósito certo
+          não é redigitado.
+        """
+        depositos = [self._deposito(item) for _, item in lote.iterrows()]
+        if self._depositos_conferidos_no_grid(grid, depositos):
+            return True
+
+        controles = self._controles()
+        grid.setCurrentCell(0, "MATNR")
+        self.aguardar_sap()
+
+        campo = None
+        for i, deposito in enumerate(depositos):
+            if not self.running: return False
+
+            campo = controles.localizar('deposito_fornecedor') if campo is not None else None
+            if campo is None:
+                # Primeiro item, ou a tela perdeu a aba: seleciona de novo
+                controles.controle('aba_dados_cliente').select()
+                controles.controle('aba_transporte').select()
+                campo = controles.controle('deposito_fornecedor')
+            if campo.text.strip() != deposito:
+                campo.text = deposito
+            if i < len(depositos) - 1:
+                controles.controle('proximo_item').press()
+                self.aguardar_sap()
+        return True
+
+    def _depositos_conferidos_no_grid(self, grid, depositos):
+        """True se a coluna configurada do grid mostra o depósito certo em todas as linhas."""
+        coluna = self._coluna_deposito_grid()
+        if not coluna:
+            return False
+        conferencia = ConferenciaGrid(grid, (coluna,), self.logger)
+        for i, deposito in enumerate(depositos):
+            conferencia.esperar(i, coluna, deposito)
+        divergentes = conferencia.divergencias()
+        if divergentes:
+            self.print_aviso(f"Coluna {coluna} não confere em {len(divergentes)} linha(s) do grid. Usando o detalhe do item.")
+            return False
+        self.print_info(f"Depósitos conferidos na coluna {coluna} do grid.")
+        return True
+
+    def _salvar_rc(self, lote):
+        linhas_diario = list(zip(lote['linha_planilha'], lote['PN'].astype(str)))
+        if self.diario is not None:
+            # Antes do Gravar: se o script cair daqui em diante, a próxima
+            # execução não redigita estas linhas
+            self.diario.registrar_envio(linhas_diario)
+        try:
+            numero_rc, msg = self._gravar_e_ler_rc()
+        except Exception as e:
+            numero_rc, msg = None, f"Erro criação: {e}"
+        if self.diario is not None:
+            valores = {'Status': msg, 'REQUISIÇÃO': numero_rc} if numero_rc else {'Status': msg}
+            self.diario.registrar_resultado(linhas_diario, valores)
+        return numero_rc, msg
+
+    def _gravar_e_ler_rc(self):
+        self.print_info("Salvando RC...")
+        self.session.findById("wnd/tbar/btn").press()
+        self.aguardar_sap()
+
+        try:
+            self.session.findById("wnd").sendVKey(0) 
             self.aguardar_sap()
-            grid = self.session.findById("wnd/usr/subSUB0:SAPLMEGUI:0016/subSUB2:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:3212/cntlGRIDCONTROL/shellcont/shell")
+        except: pass
+        
+        msg = self.session.findById("wnd/sbar").text
+        match = re.search(r'(\d{10,})', msg)
+        if match:
+            rc = match.group(0)
+            self.print_sucesso(f"RC Criada: {rc}", rc=rc)
+            return rc, msg
+        else:
+            self.print_erro(f"Falha ao salvar RC: {msg}", status=msg)
+            return None, msg
+
+    def _separar_por_cache(self, lote_de_itens):
+        """Retorna (resultados do cache, lote restante com grid_index refeito)."""
+        resultados = []
+        linhas_sem_cache = []
+        for pos, (_, item) in enumerate(lote_de_itens.iterrows()):
+            status_cache = self.cache_validacao.consultar(item.get('PN'), item.get('ORIGEM'), item.get('DESTINO'))
+            if status_cache is None:
+                linhas_sem_cache.append(pos)
+                continue
+            status_item = status_cache if status_cache == 'OK' else f"{status_cache} (cache)"
+            resultados.append({'linha_planilha': item['linha_planilha'], 'status': status_item, 'numero_rc': '' if status_cache == 'OK' else 'ERRO'})
+
+        if resultados:
+            self.print_info(f"{len(resultados)} item(ns) resolvido(s) pelo cache de validação.")
+        restante = lote_de_itens.iloc[linhas_sem_cache].copy()
+        restante['grid_index'] = range(len(restante))
+        return resultados, restante
+
+    @rastrear('documento', atributos=lambda self, lote_de_itens: {'fase': 'validacao', 'itens': len(lote_de_itens)})
+    def validar_lote_na_rc(self, lote_de_itens):
+        if lote_de_itens.empty: return []
+
+        # Combinações já conhecidas (boas ou com erro cadastral) não passam pelo SAP
+        resultados_finais, lote_de_itens = self._separar_por_cache(lote_de_itens)
+        if lote_de_itens.empty:
+            return resultados_finais
+
+        try:
+            self.print_info(f"Validando Lote ({len(lote_de_itens)} itens)")
+            grid = self._abrir_me51n_zrt()
             
             for _, item in lote_de_itens.iterrows():
                 if not self.running: break
                 
                 grid_index = int(item['grid_index'])
-                
                 mat_id = item.get('PN')
-                origem = item.get('ORIGEM')
-                destino = item.get('DESTINO')
-                qtd = str(item.get('QTD', '1')).replace(',', '.')
-                texto = item.get('TEXTO')
-                
-                try:
-                    lt_dias = int(str(item.get('LT', 0)).strip() or 0)
-                except ValueError:
-                    lt_dias = 0
-                
-                data_remessa = (datetime.now() + timedelta(days=lt_dias)).strftime('%d.%m.%Y')
                 
-                status_item = "OK"
-                print(f" -> Avaliando Item {grid_index + 1} (Mat: {mat_id} | Data: {data_remessa})")
-                try:
-                    grid.modifyCell(grid_index, "MATNR", str(mat_id))
-                    grid.modifyCell(grid_index, "MENGE", qtd)
-                    grid.modifyCell(grid_index, "RESWK", str(origem))
-                    grid.modifyCell(grid_index, "EEIND", data_remessa)
-                    grid.modifyCell(grid_index, "EPSTP", "U")
-                    grid.modifyCell(grid_index, "NAME1", str(destino))
-                    grid.modifyCell(grid_index, "EKGRP", "P04")
-                    grid.modifyCell(grid_index, "TXZ01", str(texto))
-                    self.session.findById("wnd").sendVKey(0)
-                    self.aguardar_sap()
-                    time.sleep(1.5)
-                    try: self.session.findById("wnd").sendVKey(0)
-                    except: pass
-                    
-                    status_bar = self.session.findById("wnd/sbar")
-                    if status_bar.messageType in ('E', 'A') or "não está atualizado no centro" in status_bar.text:
-                        status_item = status_bar.text
-                        self.print_erro(f"    Erro: {status_item}")
-                    else:
-                        status_item = "OK"
-                        self.print_sucesso("    Item OK")
-                except Exception as e:
-                    status_item = f"Erro crítico: {str(e)}"
-                    self.print_erro(f"    {status_item}")
-                resultados_finais.append({'linha_planilha': item['linha_planilha'], 'status': status_item, 'numero_rc': '' if status_item == 'OK' else 'ERRO'})
+                with span('item', linha=item['linha_planilha'], fase='validacao'):
+                    campos = {'item': grid_index + 1, 'material': mat_id, 'linha': item['linha_planilha']}
+                    self.print_detalhe(f" -> Avaliando Item {grid_index + 1} (Mat: {mat_id} | Data: {self._data_remessa(item)})", **campos)
+                    try:
+                        self._preencher_linha(grid, grid_index, item)
+                        status_item = self._confirmar_e_ler_status()
+                        if status_item == "OK":
+                            self.print_sucesso("    Item OK", status=status_item, **campos)
+                        else:
+                            self.print_erro(f"    Erro: {status_item}", status=status_item, **campos)
+                    except Exception as e:
+                        status_item = f"Erro crítico: {str(e)}"
+                        self.print_erro(f"    {status_item}", status=status_item, **campos)
+                    resultados_finais.append({'linha_planilha': item['linha_planilha'], 'status': status_item, 'numero_rc': '' if status_item == 'OK' else 'ERRO'})
+                    self.cache_validacao.registrar(mat_id, item.get('ORIGEM'), item.get('DESTINO'), status_item)
             return resultados_finais
         finally:
+            try: self.cache_validacao.salvar()
+            except Exception as e: self.print_aviso(f"Não foi possível gravar o cache de validação: {e}")
             try:
                 if self.is_session_valid():
                     self.session.findById("wnd/tbar/okcd").text = "/N"
                     self.session.findById("wnd").sendVKey(0)
             except: pass
 
+    @rastrear('documento', atributos=lambda self, lote_de_itens: {'fase': 'passagem_unica', 'itens': len(lote_de_itens)})
+    def validar_e_criar_rc(self, lote_de_itens):
+        """
+        Modo passagem única: digita o lote uma vez, valida linha a linha,
+        exclui do grid as linhas com erro, insere depósitos e grava.
+
+        Retorna (rejeitados, lote_ok, numero_rc, msg_status). msg_status None
+        com lote_ok preenchido indica que a gravação não aconteceu nesta ME51N
+        (ex.: falha ao excluir linha) e o lote_ok ainda precisa ser criado.
+        """
+        vazio = lote_de_itens.iloc[0:0]
+        if lote_de_itens.empty: return [], vazio, None, "Lote vazio."
+
+        cache_resultados, _ = self._separar_por_cache(lote_de_itens)
+        # Itens OK no cache continuam no lote (precisam entrar na RC); só os
+        # erros do cache são rejeitados sem tocar o SAP
+        rejeitados = [r for r in cache_resultados if r['status'] != 'OK']
+        linhas_rejeitadas = {r['linha_planilha'] for r in rejeitados}
+        candidatos = lote_de_itens[~lote_de_itens['linha_planilha'].isin(linhas_rejeitadas)].copy()
+        if candidatos.empty:
+            return rejeitados, vazio, None, None
+
+        linhas_ok = []
+        try:
+            self.print_info(f"Validando e criando RC ({len(candidatos)} itens)")
+            grid = self._abrir_me51n_zrt()
+
+            pos = 0
+            for _, item in candidatos.iterrows():
+                if not self.running: return rejeitados, vazio, None, "Cancelado."
+                mat_id = item.get('PN')
+                with span('item', linha=item['linha_planilha'], fase='passagem_unica'):
+                    campos = {'item': pos + 1, 'material': mat_id, 'linha': item['linha_planilha']}
+                    self.print_detalhe(f" -> Avaliando Item {pos + 1} (Mat: {mat_id} | Data: {self._data_remessa(item)})", **campos)
+                    try:
+                        self._preencher_linha(grid, pos, item)
+                        status_item = self._confirmar_e_ler_status()
+                    except Exception as e:
+                        status_item = f"Erro crítico: {str(e)}"
+                    self.cache_validacao.registrar(mat_id, item.get('ORIGEM'), item.get('DESTINO'), status_item)
+
+                    if status_item == "OK":
+                        self.print_sucesso("    Item OK", status=status_item, **campos)
+                        linhas_ok.append(item['linha_planilha'])
+                        pos += 1
+                        continue
+
+                    self.print_erro(f"    Erro: {status_item}", status=status_item, **campos)
+                    rejeitados.append({'linha_planilha': item['linha_planilha'], 'status': status_item, 'numero_rc': 'ERRO'})
+                    try:
+                        self._excluir_linha(grid, pos)
+                    except Exception as e:
+                        self.print_aviso(f"Não foi possível excluir a linha {pos + 1} do grid ({e}). Criando em nova ME51N.")
+                        # Itens ainda não avaliados ficam pendentes para a próxima execução
+                        lote_ok = candidatos[candidatos['linha_planilha'].isin(linhas_ok)].copy()
+                        lote_ok['grid_index'] = range(len(lote_ok))
+                        try:
+                            self._descartar_documento()
+                        except Exception as e:
+                            # Uma nova ME51N sobre este documento herdaria os itens dele
+                            msg = f"Erro: ME51N não descartada após falha ao excluir linha ({e})"
+                            self.print_erro(msg)
+                            rejeitados += [{'linha_planilha': linha, 'status': msg, 'numero_rc': 'ERRO'}
+                                           for linha in lote_ok['linha_planilha']]
+                            return rejeitados, vazio, None, None
+                        return rejeitados, lote_ok, None, None
+
+            lote_ok = candidatos[candidatos['linha_planilha'].isin(linhas_ok)].reset_index(drop=True)
+            lote_ok['grid_index'] = range(len(lote_ok))
+            if lote_ok.empty:
+                self.print_aviso("Nenhum item válido neste lote. Pulando criação.")
+                return rejeitados, lote_ok, None, None
+
+            self.print_info("Inserindo Depósitos...")
+            if not self._inserir_depositos(grid, lote_ok):
+                return rejeitados, lote_ok, None, "Cancelado."
+            numero_rc, msg = self._salvar_rc(lote_ok)
+            return rejeitados, lote_ok, numero_rc, msg
+        except Exception as e:
+            lote_ok = candidatos[candidatos['linha_planilha'].isin(linhas_ok)]
+            return rejeitados, lote_ok, None, f"Erro criação: {e}"
+        finally:
+            try: self.cache_validacao.salvar()
+            except Exception as e: self.print_aviso(f"Não foi possível gravar o cache de validação: {e}")
+
+    @rastrear('documento', atributos=lambda self, lote_de_itens_ok: {'fase': 'criacao', 'itens': len(lote_de_itens_ok)})
     def criar_rc_para_lote_ok(self, lote_de_itens_ok):
         if lote_de_itens_ok.empty: return None, "Lote vazio."
         try:
             self.print_info(f"Criando RC para {len(lote_de_itens_ok)} itens aprovados...")
-            self.session.findById("wnd").maximize()
-            self.session.findById("wnd/tbar/okcd").text = "/NME51N"
-            self.session.findById("wnd").sendVKey(0)
-            self.aguardar_sap()
-            self.session.findById("wnd/usr/subSUB0:SAPLMEGUI:0016/subSUB0:SAPLMEGUI:0030/subSUB1:SAPLMEGUI:3327/cmbMEREQ_TOPLINE-BSART").key = "ZRT"
-            self.session.findById("wnd").sendVKey(0)
-            self.aguardar_sap()
-            grid = self.session.findById("wnd/usr/subSUB0:SAPLMEGUI:0016/subSUB2:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:3212/cntlGRIDCONTROL/shellcont/shell")
+            grid = self._abrir_me51n_zrt()
             
             lote = lote_de_itens_ok.reset_index(drop=True)
             for i, item in lote.iterrows():
                 if not self.running: return None, "Cancelado."
-                
-                mat_id = item.get('PN')
-                origem = item.get('ORIGEM')
-                destino = item.get('DESTINO')
-                qtd = str(item.get('QTD', '1')).replace(',', '.')
-                texto = item.get('TEXTO')
-
-                try:
-                    lt_dias = int(str(item.get('LT', 0)).strip() or 0)
-                except ValueError:
-                    lt_dias = 0
-                data_remessa = (datetime.now() + timedelta(days=lt_dias)).strftime('%d.%m.%Y')
-
-                grid.modifyCell(i, "MATNR", str(mat_id))
-                grid.modifyCell(i, "MENGE", qtd)
-                grid.modifyCell(i, "RESWK", str(origem))
-                grid.modifyCell(i, "EEIND", data_remessa)
-                grid.modifyCell(i, "EPSTP", "U")
-                grid.modifyCell(i, "NAME1", str(destino))
-                grid.modifyCell(i, "EKGRP", "P04")
-                grid.modifyCell(i, "TXZ01", str(texto))
+                self._preencher_linha(grid, i, item)
             
             self.session.findById("wnd").sendVKey(0)
             self.aguardar_sap()
             
             self.print_info("Inserindo Depósitos...")
-            for i, item in lote.iterrows():
-                if not self.running: return None, "Cancelado."
-                
-                origem_key = str(item.get('ORIGEM')).strip().upper()
-                deposito = self.DEPOSITO_MAPPING.get(origem_key, 'AE01')
-                
-                grid.setCurrentCell(i, "MATNR")
-                self.aguardar_sap()
-                self.session.findById("wnd/usr/subSUB0:SAPLMEGUI:0015/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:3303/tabsREQ_ITEM_DETAIL/tabpTABREQDT16").select()
-                self.session.findById("wnd/usr/subSUB0:SAPLMEGUI:0015/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:3303/tabsREQ_ITEM_DETAIL/tabpTABREQDT16/ssubTABSTRIPCONTROL1SUB:SAPLMEGUI:1318/ssubCUSTOMER_DATA_ITEM:SAPLXM02:0111/tabsTABREITER1/tabpTRANS").select()
-                depot = self.session.findById("wnd/usr/subSUB0:SAPLMEGUI:0015/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:3303/tabsREQ_ITEM_DETAIL/tabpTABREQDT16/ssubTABSTRIPCONTROL1SUB:SAPLMEGUI:1318/ssubCUSTOMER_DATA_ITEM:SAPLXM02:0111/tabsTABREITER1/tabpTRANS/ssubSUBBILD1:SAPLXM02:0114/ctxtEBAN-ZZDEP_FORNEC")
-                depot.text = str(deposito)
-                if i < len(lote) - 1:
-                    self.session.findById("wnd/usr/subSUB0:SAPLMEGUI:0015/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB1:SAPLMEGUI:6000/btn%#AUTOTEXT002").press()
-                    self.aguardar_sap()
-
-            self.print_info("Salvando RC...")
-            self.session.findById("wnd/tbar/btn").press()
-            self.aguardar_sap()
+            if not self._inserir_depositos(grid, lote):
+                return None, "Cancelado."
 
-            try:
-                self.session.findById("wnd").sendVKey(0) 
-                self.aguardar_sap()
-            except: pass
-            
-            msg = self.session.findById("wnd/sbar").text
-            match = re.search(r'(\d{10,})', msg)
-            if match:
-                rc = match.group(0)
-                self.print_sucesso(f"RC Criada: {rc}")
-                return rc, msg
-            else:
-                self.print_erro(f"Falha ao salvar RC: {msg}")
-                return None, msg
+            return self._salvar_rc(lote)
         except Exception as e:
             return None, f"Erro criação: {e}"
 
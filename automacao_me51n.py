@@ -0,0 +1,586 @@
+import sys
+import logging
+import re
+import copy
+from logging.handlers import RotatingFileHandler
+from datetime import datetime
+import os
+
+from buffer_status import StatusBuffer
+from leitura_incremental import LeitorPendentes
+from pool_sessoes import PoolSessoesSAP
+from planejador_lotes import PlanejadorLotes
+from isolamento_falhas import IsoladorFalhas, OrcamentoTransacoes
+from sap_conexao import obter_sapgui
+from resolvedor_controles import ResolvedorControles
+from rastreamento import span, rastrear, dormir, instrumentar_sessao, instrumentar_planilha
+from cliente_planilhas import com_cota, conectar_google, em_segundo_plano
+from espera_sap import aguardar_sap, fechar_popup, ID_BOTAO_POPUP_OK
+from conferencia_grid import ConferenciaGrid
+from ingestao import preparar_pendentes
+from diario_lotes import DiarioLotes, com_diario, linhas_itens, recuperar_itens
+from duplicidade_rc import verificar_duplicidade
+from grupos_compra import resolver_grupo, definir_grupo, atribuir_grupos
+
+# ==========================================
+# AUTOMAÇÃO DA ME51N (BASE DOS SCRIPTS)
+# ==========================================
+class AutomacaoME51N:
+    """
+    Pipeline comum dos scripts da ME51N (main.py, criar_rc_consumo.py):
+    leitura dos pendentes, pré-validação, grupos de compras, planejamento
+    dos lotes, criação das RCs e gravação dos status. Cada script é uma
+    subclasse com a sua Config e a data de remessa dos itens
+    (_data_remessa, _preparar_pendentes e _anunciar_data_remessa).
+    """
+
+    Config = None            # classe Config do script
+    NOME_SCRIPT = 'me51n'    # rótulo do span 'execucao' no rastreio
+    COLUNA_PEP = None        # coluna com o Elemento PEP do item (None = sem PEP)
+
+    def __init__(self):
+        self.session = None
+        self.sheet_client = None
+        self.workbook = None
+        self.worksheet = None 
+        self.status_buffer = None
+        self.orcamento_retentativas = None
+        self._resolvedor = None
+        self.pool = None  # pool de sessões compartilhado (orquestrador.py)
+        self.diario = None
+        self.grupo_selecionado = None
+        self.grupo_descricao = None 
+        self.logger = logging.getLogger(type(self).__module__)
+
+    # --- UTILITÁRIOS ---
+    def find_column_index(self, headers, col_name):
+        try:
+            return headers.index(col_name) + 1
+        except ValueError:
+            col_name_lower = col_name.lower()
+            for i, h in enumerate(headers):
+                if h.lower() == col_name_lower: return i + 1
+            return len(headers) + 1
+
+    def _atualizar_status_planilha(self, row_index, col_idx, msg):
+        # Enfileira no buffer; o envio real é um batch_update por lote
+        self.status_buffer.adicionar(row_index, col_idx, msg)
+
+    def _valor_item(self, item):
+        """Valor usado no planejamento dos lotes (coluna Preço, como nas antigas faixas)."""
+        return item['_valor']  # já convertido por preparar_pendentes()
+
+    def _item_individual(self, item):
+        # Itens com PEP entram em lotes normais: _preencher_pep_itens navega
+        # entre os detalhes dos itens dentro do mesmo documento
+        return self._valor_item(item) > self.Config.VALOR_ITEM_INDIVIDUAL
+
+    # --- DATA DE REMESSA (DEFINIDA PELO SCRIPT) ---
+    def _anunciar_data_remessa(self):
+        """Define/anuncia a data de remessa no início da execução."""
+
+    def _preparar_pendentes(self, itens):
+        """preparar_pendentes() com as colunas do script. Retorna (validos, rejeitados)."""
+        return preparar_pendentes(itens, logger=self.logger)
+
+    def _data_remessa(self, item):
+        """Data de remessa (dd.mm.aaaa) digitada no EEIND do item."""
+        raise NotImplementedError
+
+    def configurar_parametros_execucao(self, grupo=None):
+        self.logger.info("%s", "\n" + "="*40)
+        self._anunciar_data_remessa()
+        self.logger.info("%s", "="*40)
+
+        grupo = grupo or self.Config.GRUPO_AUTOMATICO
+        if grupo:
+            try:
+                self.grupo_selecionado, self.grupo_descricao = definir_grupo(
+                    grupo, self.Config.OPCOES_GRUPO, self.Config.COLUNA_GRUPO, logger=self.logger)
+            except ValueError as e:
+                self.logger.error(" %s", e)
+                sys.exit(1)
+            return
+
+        self.logger.info("\n>>> SELECIONE O TIPO DE REQUISIÇÃO (GRUPO):")
+        chaves_ordenadas = sorted(self.Config.OPCOES_GRUPO.keys())
+        for key in chaves_ordenadas:
+            info = self.Config.OPCOES_GRUPO[key]
+            self.logger.info(" [%s] - %s (%s)", key, info['codigo'], info['desc'])
+        
+        while True:
+            escolha = input("\nDigite o número da opção: ").strip()
+            if escolha in self.Config.OPCOES_GRUPO:
+                if escolha == '0':
+                    self.logger.info("Encerrando.")
+                    sys.exit()
+                selecao = self.Config.OPCOES_GRUPO[escolha]
+                self.grupo_selecionado = selecao['codigo']
+                self.grupo_descricao = selecao['desc']
+                self.logger.info(" Grupo selecionado: %s (%s)", self.grupo_selecionado, self.grupo_descricao)
+                break
+            else:
+                self.logger.warning(" Opção inválida: %s", escolha)
+        dormir(1)
+
+    # --- CONEXÕES ---
+    def connect_google(self):
+        try:
+            # ID da planilha e token de acesso reaproveitados de cache_google.json
+            self.sheet_client, self.workbook = conectar_google(self.Config.GOOGLE_CREDENTIALS_FILE, nome=self.Config.SHEET_NAME)
+            self.logger.info("Planilha '%s' conectada.", self.Config.SHEET_NAME)
+            return True
+        except Exception as e:
+            self.logger.exception("Erro Google Sheets: %s", e)
+            return False
+
+    def connect_sap(self):
+        try:
+            SapGuiAuto = obter_sapgui()
+            application = SapGuiAuto.GetScriptingEngine
+            connection = application.Children(0)
+            self.session = instrumentar_sessao(connection.Children(0))
+            self.logger.info("Conectado ao SAP.")
+            return True
+        except Exception as e:
+            self.logger.exception("Erro SAP: %s", e)
+            return False
+
+    def _controles(self):
+        """Resolvedor de controles da sessão atual (recriado se a sessão mudar)."""
+        if self._resolvedor is None or self._resolvedor.session is not self.session:
+            self._resolvedor = ResolvedorControles(self.session, logger=self.logger)
+        return self._resolvedor
+
+    # --- TRANSAÇÃO ME51N ---
+    @rastrear('documento', atributos=lambda self, batch_rows: {'itens': len(batch_rows)})
+    def create_purchase_requisition_batch(self, batch_rows):
+        try:
+            # 1. Inicia Transação (/NME51N)
+            self.session.findById("wnd[0]").maximize()
+            self.session.findById("wnd[0]/tbar[0]/okcd").Text = "/NME51N"
+            self.session.findById("wnd[0]").sendVKey(0)
+
+            # Nova ME51N: handles da transação anterior não valem mais
+            controles = self._controles()
+            controles.invalidar()
+
+            # Espera a tela da ME51N carregar (grid presente) em vez de sleep fixo
+            if not controles.aguardar('grid', timeout=self.Config.TIMEOUT_TELA):
+                return "Erro: Tela da ME51N não carregou."
+
+            # 2. ESCREVE O TEXTO DE CABEÇALHO
+            # O SAP pode iniciar com o cabeçalho recolhido na 2ª requisição em diante.
+            # Tentamos escrever; se falhar, expandimos com Ctrl+F2 (VKey 26) e repetimos.
+            data_hoje = datetime.now().strftime('%d.%m.%Y')
+            texto_final = f"Compra para Atender demanda {self.grupo_descricao}\r\n{data_hoje}\r\n"
+
+            def _tentar_escrever_cabecalho():
+                """Retorna True se conseguiu escrever, False caso contrário."""
+                editor = controles.localizar('editor_cabecalho')
+                if editor is None:
+                    return False
+                try:
+                    editor.text = texto_final
+                    try:
+                        editor.setSelectionIndexes(92, 92)
+                    except:
+                        pass
+                    return True
+                except:
+                    return False
+
+            if not _tentar_escrever_cabecalho():
+                # Cabeçalho está recolhido → expande com Ctrl+F2 (atalho "Expandir cabeçalho")
+                self.logger.info("Cabeçalho recolhido. Expandindo com Ctrl+F2 (VKey 26)...")
+                try:
+                    self.session.findById("wnd[0]").sendVKey(26)
+                    controles.aguardar('editor_cabecalho', timeout=5)
+                except Exception as ex:
+                    self.logger.warning(f"Erro ao expandir cabeçalho: {ex}")
+
+                if _tentar_escrever_cabecalho():
+                    self.logger.info("Texto de cabeçalho preenchido (após expansão).")
+                else:
+                    self.logger.warning("Não foi possível preencher o texto de cabeçalho mesmo após expansão.")
+            else:
+                self.logger.info("Texto de cabeçalho preenchido.")
+
+            # 3. PREENCHE O GRID (ITENS)
+            grid = controles.controle('grid')
+            conferencia = ConferenciaGrid(grid, self.Config.COLUNAS_CONFERIDAS, self.logger)
+            
+            # Identifica itens com PEP para tratamento posterior
+            itens_com_pep = []
+            
+            linhas_preenchidas = 0
+            for i, row in enumerate(batch_rows):
+                with span('item', linha=row.get('sheet_row_index')):
+                    try:
+                        material = row['_material']
+                        pep_valor = str(row.get(self.COLUNA_PEP, '')).strip() if self.COLUNA_PEP else ''
+                    
+                        # LOG DE DEBUG
+                        valor_bruto = row.get('Preço', '')
+                        self.logger.info(f" -> Item {i+1} Valor BRUTO (Texto): '{valor_bruto}'")
+                    
+                        # FORMATAÇÃO: já feita em preparar_pendentes()
+                        qtd = row['_qtd']
+                        preco = row['_preco']
+                        data_remessa = self._data_remessa(row)
+                    
+                        self.logger.info(f" -> Enviando: Mat={material}, Qtd={qtd}, Preço={preco}, Remessa={data_remessa}, PEP={pep_valor}")
+                    
+                        try: grid.modifyCell(i, "NAME1", self.Config.CENTRO_PADRAO)
+                        except: pass 
+                    
+                        grid.modifyCell(i, "MATNR", material)
+                        grid.modifyCell(i, "MENGE", qtd)
+                        grid.modifyCell(i, "PREIS", preco)
+                        grid.modifyCell(i, "EEIND", data_remessa)
+                        grid.modifyCell(i, "EKGRP", self.grupo_selecionado)
+                        grid.modifyCell(i, "WAERS", "USD")
+                        conferencia.esperar(i, "MENGE", qtd)
+                        conferencia.esperar(i, "PREIS", preco)
+                        conferencia.esperar(i, "EEIND", data_remessa)
+                    
+                        # Se PEP preenchido, marca Categoria Classif. Contábil como "P" (Projeto)
+                        if pep_valor:
+                            grid.modifyCell(i, "KNTTP", "P")
+                            itens_com_pep.append({'grid_index': i, 'pep': pep_valor, 'material': material})
+                            self.logger.info(f"    -> PEP detectado: Classificação contábil = 'P' (Projeto)")
+                    
+                        linhas_preenchidas += 1
+                    except Exception as e:
+                        self.logger.warning(f"Erro linha {i}: {e}")
+
+            if linhas_preenchidas == 0:
+                return "Erro: Nenhuma linha preenchida."
+
+            # 4. VALIDA A PRIMEIRA INSERÇÃO E FECHA POPUPS
+            try:
+                grid.currentCellColumn = "WAERS"
+                grid.pressEnter()
+            except:
+                self.session.findById("wnd[0]").sendVKey(0)
+            
+            fechar_popup(self.session, timeout=self.Config.TIMEOUT_TELA)
+
+            # =========================================================
+            # 5. CONFERÊNCIA DAS CÉLULAS (DATA DE REMESSA, ...)
+            # Relê o grid e reescreve só o que o SAP trocou; o segundo
+            # Enter só acontece se alguma célula foi corrigida
+            # =========================================================
+            reescritas = conferencia.corrigir()
+            if reescritas:
+                self.logger.info(f"{reescritas} célula(s) reescrita(s). Validando novamente...")
+                try:
+                    grid.currentCellColumn = "EEIND"
+                    grid.pressEnter()
+                except:
+                    self.session.findById("wnd[0]").sendVKey(0)
+
+                fechar_popup(self.session, timeout=self.Config.TIMEOUT_TELA)
+            # =========================================================
+
+            # =========================================================
+            # 5.1 PREENCHIMENTO DO ELEMENTO PEP (ClassCont.)
+            # Para cada item com PEP, navega até a aba ClassCont. e
+            # preenche o campo Elemento PEP
+            # =========================================================
+            if itens_com_pep:
+                self.logger.info(f"Preenchendo Elemento PEP para {len(itens_com_pep)} item(ns)...")
+                falhas_pep = self._preencher_pep_itens(grid, itens_com_pep)
+                if falhas_pep:
+                    # Não grava: o isolador de falhas acha o item pelo número/material
+                    item_pep, motivo = falhas_pep[0]
+                    return f"Erro PEP: Item {(item_pep['grid_index'] + 1) * 10:05d} (Mat: {item_pep['material']}): {motivo}"
+            # =========================================================
+
+            # 6. GRAVAR
+            # Diário antes do Gravar: se o script cair daqui em diante, a
+            # próxima execução não redigita estas linhas
+            if self.diario is not None:
+                self.diario.registrar_envio(linhas_itens(batch_rows))
+            self.logger.info("Gravando...")
+            try:
+                self.session.findById("wnd[0]/tbar[0]/btn[11]").press()
+            except Exception as e:
+                self.logger.error(f"Erro ao pressionar Gravar: {e}")
+
+            # TRATA POPUP "Gravar doc." (Gravar / Processar / Cancelar)
+            # O botão correto é btnSPOP-VAROPTION1 = "Gravar" (capturado pelo VBA)
+            # Fallback genérico (btn[0]) caso o popup seja diferente
+            if fechar_popup(self.session, "wnd[1]/usr/btnSPOP-VAROPTION1",
+                            timeout=self.Config.TIMEOUT_GRAVAR, alternativas=(ID_BOTAO_POPUP_OK,)):
+                self.logger.info("Popup 'Gravar doc.' confirmado.")
+
+            # 7. CAPTURA MENSAGEM FINAL (SÓ NÚMERO)
+            sbar = self.session.findById("wnd[0]/sbar")
+            texto_status = sbar.Text
+            
+            if sbar.MessageType == "S" or any(x in texto_status.lower() for x in ['criad', 'creat', 'gravad']):
+                self.logger.info("Sucesso (Log): %s", texto_status)
+                
+                try: self.session.findById("wnd[0]/tbar[0]/btn[3]").press()
+                except: pass
+                
+                numeros = re.findall(r'\d+', texto_status)
+                if numeros:
+                    return numeros[-1]
+                else:
+                    return texto_status
+            else:
+                self.logger.warning("Status: %s", texto_status)
+                return f"Status Final: {texto_status}"
+
+        except Exception as e:
+            self.logger.exception("Erro Crítico Script: %s", e)
+            return f"Erro Crítico Script: {str(e)}"
+
+    @rastrear('pep', tipo='etapa', atributos=lambda self, grid, itens_com_pep: {'itens': len(itens_com_pep)})
+    def _preencher_pep_itens(self, grid, itens_com_pep):
+        """
+        Preenche o Elemento PEP (ctxtCOBL-PS_POSID) de vários itens do mesmo
+        documento: para cada item seleciona a linha no grid e abre o detalhe;
+        a aba ClassCont. (tabpTABREQDT7) só é clicada quando o campo não está
+        visível (a ME51N mantém a aba ao trocar de item).
+
+        Cada atribuição é conferida: o campo é relido após digitar e a barra
+        de status é verificada após o Enter. Retorna [(item_pep, motivo)] dos
+        itens que não ficaram com o PEP certo (vazio = todos OK).
+        """
+        controles = self._controles()
+        falhas = []
+
+        for item_pep in itens_com_pep:
+            idx = item_pep['grid_index']
+            pep = item_pep['pep']
+            material = item_pep['material']
+
+            try:
+                self.logger.info(f"  -> Preenchendo PEP '{pep}' para item {idx+1} (Mat: {material})")
+
+                # 1. Seleciona a linha do item no grid e pressiona Enter
+                #    para mostrar o detalhe desse item
+                grid.setCurrentCell(idx, "MATNR")
+                grid.selectedRows = str(idx)
+                aguardar_sap(self.session, self.Config.TIMEOUT_TELA)
+                self.session.findById("wnd[0]").sendVKey(0)  # Enter → abre detalhe
+                fechar_popup(self.session, timeout=self.Config.TIMEOUT_TELA)
+
+                # 2. Aba ClassCont. só se o campo PEP ainda não estiver na tela
+                campo = controles.localizar('pep')
+                if campo is None:
+                    controles.controle('aba_classcont').select()
+                    aguardar_sap(self.session, self.Config.TIMEOUT_TELA)
+                    campo = controles.controle('pep')
+
+                # 3. Preenche e relê o campo
+                campo.text = pep
+                campo.caretPosition = len(pep)
+                if campo.text.strip().upper() != pep.upper():
+                    falhas.append((item_pep, f"campo PEP ficou '{campo.text}'"))
+                    continue
+
+                # 4. Confirma com Enter; erro na barra de status sobre o PEP =
+                #    PEP recusado (erros de outros itens, ex. material, ficam
+                #    para a gravação e o isolador de falhas)
+                self.session.findById("wnd[0]").sendVKey(0)
+                fechar_popup(self.session, timeout=self.Config.TIMEOUT_TELA)
+                sbar = self.session.findById("wnd[0]/sbar")
+                texto = sbar.Text.upper()
+                if sbar.MessageType in ('E', 'A') and ('PEP' in texto or pep.upper() in texto):
+                    falhas.append((item_pep, sbar.Text))
+                    continue
+                self.logger.info(f"    -> PEP '{pep}' conferido no item {idx+1}.")
+
+            except Exception as e:
+                self.logger.warning(f"  -> Erro ao preencher PEP para item {idx+1}: {e}")
+                falhas.append((item_pep, f"campo PEP não encontrado ({e})"))
+
+        for item_pep, motivo in falhas:
+            self.logger.warning(f"    -> FALHA PEP item {item_pep['grid_index']+1}: {motivo}")
+        self.logger.info("Preenchimento de PEP concluído.")
+        return falhas
+
+    def run(self, grupo=None):
+        # Google em segundo plano enquanto o SAP conecta e o grupo é escolhido
+        google = em_segundo_plano(self.connect_google)
+        if not self.connect_sap(): return
+        self.configurar_parametros_execucao(grupo)
+        if not google.result(): return
+
+        self.logger.info("\n>>> LENDO DADOS DA ABA: %s", self.Config.NOME_ABA_DADOS)
+        try:
+            worksheet = self.workbook.worksheet(self.Config.NOME_ABA_DADOS)
+        except Exception as e:
+            self.logger.error(f"Erro ao ler planilha: {e}")
+            return
+        self.processar_aba(worksheet)
+
+    def processar_aba(self, worksheet):
+        """
+        Processa os pendentes de uma aba já aberta com a sessão SAP atual.
+        Separado do run() para poder ser chamado com outra planilha/sessão
+        (ex.: benchmark_e2e.py com o simulador).
+        """
+        self.worksheet = instrumentar_planilha(com_cota(worksheet))
+        try:
+            # Lê só a coluna Status e depois apenas as faixas pendentes.
+            # batch_get retorna tudo como String (FORMATTED_VALUE), igual ao
+            # get_all_values(), então "0,27" não vira int 27.
+            leitor = LeitorPendentes(
+                self.worksheet,
+                coluna_status='Status',
+                snapshot_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), self.Config.ARQUIVO_SNAPSHOT),
+                logger=self.logger,
+            )
+            headers, itens_pendentes = leitor.ler()
+
+            if not headers:
+                self.logger.info("Planilha vazia ou sem dados.")
+                return
+
+        except Exception as e:
+            self.logger.error(f"Erro ao ler planilha: {e}")
+            return
+
+        col_status_idx = self.find_column_index(headers, 'Status')
+
+        if not itens_pendentes:
+            self.logger.info("Nenhum item pendente.")
+            return
+
+        self.logger.info("Itens pendentes: %s", len(itens_pendentes))
+
+        self.diario = DiarioLotes(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), self.Config.ARQUIVO_DIARIO),
+            self.worksheet.title, logger=self.logger,
+        )
+        self.status_buffer = StatusBuffer(self.worksheet, logger=self.logger, ao_gravar=self.diario.confirmar_celulas)
+        try:
+            # Antes de planejar: resultados que ficaram só no diário (crash) vão para a planilha
+            itens_pendentes = recuperar_itens(
+                self.diario, itens_pendentes,
+                lambda linha, coluna, valor: self._atualizar_status_planilha(
+                    linha, self.find_column_index(headers, coluna), valor),
+            )
+            self.status_buffer.flush()
+
+            # Normaliza Qtd/Preço (e LT) de todos os pendentes de uma vez; linhas
+            # inválidas vão direto para a planilha, sem abrir a ME51N
+            itens_pendentes, rejeitados = self._preparar_pendentes(itens_pendentes)
+            itens_pendentes, sem_grupo = atribuir_grupos(
+                itens_pendentes, self.Config.OPCOES_GRUPO, self.Config.COLUNA_GRUPO, self.grupo_selecionado)
+            rejeitados += sem_grupo
+            if self.Config.VERIFICAR_DUPLICIDADE:
+                itens_pendentes, duplicados = verificar_duplicidade(
+                    self.session, itens_pendentes, self.Config.CENTRO_PADRAO,
+                    self._data_remessa,
+                    self.Config.JANELA_DUPLICIDADE_DIAS, arquivo=self.Config.ARQUIVO_RCS_ABERTAS, logger=self.logger,
+                )
+                rejeitados += duplicados
+            for item, mensagem in rejeitados:
+                self._atualizar_status_planilha(item['sheet_row_index'], col_status_idx, mensagem)
+            if rejeitados:
+                self.status_buffer.flush()
+            if not itens_pendentes:
+                self.logger.info("Nenhum item válido para enviar ao SAP.")
+                return
+
+            with span('execucao', script=self.NOME_SCRIPT, itens=len(itens_pendentes)):
+                self._processar_pendentes(itens_pendentes, col_status_idx)
+        except KeyboardInterrupt:
+            self.logger.warning("Execução interrompida pelo usuário (Ctrl+C).")
+        finally:
+            self.status_buffer.fechar()
+            self.diario.compactar()
+            self.diario.fechar()
+
+    @staticmethod
+    def _resultado_sucesso(resultado):
+        eh_numero = resultado.isdigit()
+        return eh_numero or any(x in resultado.lower() for x in ['criad', 'creat', 'gravad'])
+
+    def _processar_lote(self, lote):
+        """Cria a RC do lote e isola falhas. Retorna [(item, resultado)]."""
+        rotulo, n_lote, chunk = lote
+        codigo = chunk[0].get('_grupo')
+        if codigo and codigo != self.grupo_selecionado:
+            # Lote de outro grupo (coluna Grupo): cópia com código e texto de cabeçalho dele
+            worker = copy.copy(self)
+            selecao = resolver_grupo(codigo, self.Config.OPCOES_GRUPO)
+            worker.grupo_selecionado, worker.grupo_descricao = selecao['codigo'], selecao['desc']
+            return worker._processar_lote(lote)
+        self.logger.info(" - %s %s (%s item(ns))...", rotulo, n_lote, len(chunk))
+
+        # Falha de lote: isola o item culpado (mensagem SAP) ou divide ao meio,
+        # em vez de recriar cada item como RC própria
+        isolador = IsoladorFalhas(
+            com_diario(self.diario, self.create_purchase_requisition_batch),
+            self._resultado_sucesso,
+            self.orcamento_retentativas,
+            logger=self.logger,
+        )
+        with span('lote', rotulo=rotulo, n=n_lote, itens=len(chunk)):
+            return isolador.processar(chunk)
+
+    def _processar_lote_na_sessao(self, session, lote):
+        # Cópia rasa: mesma configuração do run, mas com a sessão SAP da thread
+        worker = copy.copy(self)
+        worker.session = session
+        return worker._processar_lote(lote)
+
+    def _processar_pendentes(self, itens_pendentes, col_status_idx):
+        planejador = PlanejadorLotes(
+            self._valor_item,
+            item_individual=self._item_individual,
+            max_itens=self.Config.ITENS_POR_DOCUMENTO,
+            valor_max_documento=self.Config.VALOR_MAX_DOCUMENTO,
+            logger=self.logger,
+        )
+        self.orcamento_retentativas = OrcamentoTransacoes(self.Config.MAX_TRANSACOES_EXTRAS)
+
+        # Um documento nunca mistura grupos (EKGRP e texto de cabeçalho são do grupo)
+        grupos = sorted({item['_grupo'] for item in itens_pendentes})
+        lotes = []
+        for codigo in grupos:
+            lotes_grupo = planejador.planejar([item for item in itens_pendentes if item['_grupo'] == codigo])
+            if len(grupos) > 1:
+                lotes_grupo = [(f"{rotulo} {codigo}", n, chunk) for rotulo, n, chunk in lotes_grupo]
+            lotes += lotes_grupo
+
+        # O plano é exibido antes de qualquer interação com o SAP
+        planejador.imprimir(lotes, itens_pendentes)
+
+        pool = self.pool
+        if pool is None and self.Config.SESSOES_PARALELAS > 1:
+            pool = PoolSessoesSAP(self.session, self.Config.SESSOES_PARALELAS, logger=self.logger)
+            pool.preparar()
+        if pool is not None:
+            resultados = pool.mapear(self._processar_lote_na_sessao, lotes)
+        else:
+            resultados = (self._processar_lote(lote) for lote in lotes)
+
+        # Resultados chegam na ordem dos lotes, mesmo com várias sessões
+        for (_, _, chunk), resultado_lote in zip(lotes, resultados):
+            if isinstance(resultado_lote, Exception):
+                resultado_lote = [(item, f"Erro Crítico Script: {resultado_lote}") for item in chunk]
+            for item, resultado in resultado_lote:
+                self._atualizar_status_planilha(item['sheet_row_index'], col_status_idx, resultado)
+            self.status_buffer.flush()
+
+        self.logger.info("\nFim.")
+
+def setup_logging():
+    base = os.path.dirname(os.path.abspath(__file__))
+    log_file = os.path.join(base, 'fc_planning.log')
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s [%(name)s] %(message)s',
+        handlers=[
+            RotatingFileHandler(log_file, maxBytes=5*1024*1024, backupCount=5, encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
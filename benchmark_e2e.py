@@ -0,0 +1,497 @@
+# -*- coding: utf-8 -*-
+import argparse
+import configparser
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import rastreamento
+import sap_conexao
+from sap_simulador import SimuladorSAPGUI, Latencias, Latencia
+
+
+# ==========================================
+# BENCHMARK PONTA A PONTA (SIMULADOR SAP + PLANILHA EM MEMÓRIA)
+# ==========================================
+# Roda os robôs reais (main, criar_rc_consumo, REQ_TRANSF_INTERNA e
+# cancelar_of) contra o SimuladorSAPGUI e uma aba em memória, e mede
+# documentos/hora e itens/hora. Não precisa de Windows, SAP nem Google.
+#
+#   python benchmark_e2e.py --itens 100 --latencia lan --sessoes 1
+#   python benchmark_e2e.py --scripts main consumo --taxa-erro 0.05
+
+PERFIS_LATENCIA = {
+    'nenhuma': lambda: Latencias(),
+    'lan': lambda: Latencias(
+        com=Latencia.constante(0.002),
+        roundtrip=Latencia.lognormal(0.15, 0.4),
+        busy=Latencia.uniforme(0.0, 0.1),
+        gravar=Latencia.lognormal(0.6, 0.3),
+    ),
+    'wan': lambda: Latencias(
+        com=Latencia.constante(0.005),
+        roundtrip=Latencia.lognormal(0.4, 0.5),
+        busy=Latencia.uniforme(0.0, 0.3),
+        gravar=Latencia.lognormal(1.5, 0.3),
+    ),
+}
+
+
+def _coluna_para_indice(letras):
+    n = 0
+    for c in letras:
+        n = n * 26 + (ord(c.upper()) - 64)
+    return n
+
+
+def _parse_a1(faixa):
+    """'A2:C' / 'B5' / 'A5:K9' / '1:1' → (lin_ini, col_ini, lin_fim|None, col_fim)."""
+    faixa = faixa.split('!')[-1]
+    partes = faixa.split(':')
+    m = re.match(r'^([A-Z]*)(\d*)$', partes[0], re.IGNORECASE)
+    col_ini, lin_ini = _coluna_para_indice(m.group(1)) or 1, int(m.group(2) or 1)
+    if len(partes) == 1:
+        return lin_ini, col_ini, lin_ini, col_ini
+    m = re.match(r'^([A-Z]*)(\d*)$', partes[1], re.IGNORECASE)
+    col_fim = _coluna_para_indice(m.group(1)) or _coluna_para_indice('ZZ')  # '1:1' = linha inteira
+    lin_fim = int(m.group(2)) if m.group(2) else None
+    return lin_ini, col_ini, lin_fim, col_fim
+
+
+def _numerizar(valor):
+    # Mesmo comportamento padrão do get_all_records() do gspread
+    if isinstance(valor, str) and re.fullmatch(r'-?\d+', valor):
+        return int(valor)
+    if isinstance(valor, str) and re.fullmatch(r'-?\d+\.\d+', valor):
+        return float(valor)
+    return valor
+
+
+class PlanilhaMemoria:
+    """Aba do gspread em memória (apenas os métodos usados pelos robôs)."""
+
+    def __init__(self, titulo, linhas, latencia=None):
+        self.title = titulo
+        self.linhas = [list(map(str, l)) for l in linhas]
+        self.latencia = latencia or Latencia.constante(0.0)
+        self.chamadas = {}
+
+    def _chamada(self, nome):
+        self.chamadas[nome] = self.chamadas.get(nome, 0) + 1
+        atraso = self.latencia()
+        if atraso:
+            time.sleep(atraso)
+
+    def _celula(self, linha, coluna):
+        if linha - 1 < len(self.linhas) and coluna - 1 < len(self.linhas[linha - 1]):
+            return self.linhas[linha - 1][coluna - 1]
+        return ''
+
+    def _gravar(self, linha, coluna, valor):
+        while len(self.linhas) < linha:
+            self.linhas.append([])
+        registro = self.linhas[linha - 1]
+        while len(registro) < coluna:
+            registro.append('')
+        registro[coluna - 1] = str(valor)
+
+    def _faixa(self, faixa):
+        lin_ini, col_ini, lin_fim, col_fim = _parse_a1(faixa)
+        lin_fim = lin_fim or len(self.linhas)
+        resultado = []
+        for lin in range(lin_ini, lin_fim + 1):
+            valores = [self._celula(lin, c) for c in range(col_ini, col_fim + 1)]
+            while valores and valores[-1] == '':
+                valores.pop()
+            resultado.append(valores)
+        while resultado and not resultado[-1]:
+            resultado.pop()
+        return resultado
+
+    def row_values(self, linha):
+        self._chamada('row_values')
+        valores = list(self.linhas[linha - 1]) if linha - 1 < len(self.linhas) else []
+        while valores and valores[-1] == '':
+            valores.pop()
+        return valores
+
+    def col_values(self, coluna):
+        self._chamada('col_values')
+        valores = [self._celula(l, coluna) for l in range(1, len(self.linhas) + 1)]
+        while valores and valores[-1] == '':
+            valores.pop()
+        return valores
+
+    def get_all_values(self):
+        self._chamada('get_all_values')
+        return [list(l) for l in self.linhas]
+
+    def get_all_records(self):
+        self._chamada('get_all_records')
+        headers = self.linhas[0] if self.linhas else []
+        return [
+            {h: _numerizar(l[i] if i < len(l) else '') for i, h in enumerate(headers)}
+            for l in self.linhas[1:]
+        ]
+
+    def batch_get(self, faixas, **kwargs):
+        self._chamada('batch_get')
+        return [self._faixa(f) for f in faixas]
+
+    def batch_update(self, dados, **kwargs):
+        self._chamada('batch_update')
+        for bloco in dados:
+            lin_ini, col_ini, _, _ = _parse_a1(bloco['range'])
+            for dl, linha in enumerate(bloco['values']):
+                for dc, valor in enumerate(linha):
+                    self._gravar(lin_ini + dl, col_ini + dc, valor)
+
+    def update_cell(self, linha, coluna, valor):
+        self._chamada('update_cell')
+        self._gravar(linha, coluna, valor)
+
+    def coluna(self, nome):
+        idx = self.linhas[0].index(nome)
+        return [l[idx] if idx < len(l) else '' for l in self.linhas[1:]]
+
+
+class PastaMemoria:
+    """Planilha (várias abas PlanilhaMemoria) para o orquestrador."""
+
+    def __init__(self, abas):
+        self.title = 'BENCHMARK'
+        self.id = 'benchmark'
+        self.abas = {aba.title: aba for aba in abas}
+        self._chamadas = {}
+
+    def _chamada(self, nome):
+        self._chamadas[nome] = self._chamadas.get(nome, 0) + 1
+
+    @property
+    def chamadas(self):
+        total = dict(self._chamadas)
+        for aba in self.abas.values():
+            for nome, n in aba.chamadas.items():
+                total[nome] = total.get(nome, 0) + n
+        return total
+
+    def worksheets(self):
+        self._chamada('worksheets')
+        return list(self.abas.values())
+
+    def values_batch_get(self, faixas, **kwargs):
+        self._chamada('values_batch_get')
+        resposta = []
+        for f in faixas:
+            nome, _, faixa = f.partition('!')
+            aba = self.abas[nome.strip("'")]
+            valores = aba._faixa(faixa) if faixa else [list(l) for l in aba.linhas]
+            resposta.append({'range': f, 'values': valores})
+        return {'valueRanges': resposta}
+
+    def get_lastUpdateTime(self):
+        # Versão muda a cada escrita em qualquer aba (como o modifiedTime do Drive)
+        self._chamada('get_lastUpdateTime')
+        escritas = sum(aba.chamadas.get(n, 0) for aba in self.abas.values() for n in ('update_cell', 'batch_update'))
+        return f"v{escritas}-{sum(len(aba.linhas) for aba in self.abas.values())}"
+
+    def coluna(self, nome):
+        return [valor for aba in self.abas.values()
+                for valor in aba.coluna(nome if nome in aba.linhas[0] else nome.upper())]
+
+
+# ------------------------------------------
+# GERAÇÃO DE DADOS
+# ------------------------------------------
+def _material(rng, invalidos, taxa_erro):
+    mat = f"{rng.randint(10000000, 99999999)}"
+    if rng.random() < taxa_erro:
+        invalidos.add(mat)
+    return mat
+
+
+def _preco_br(rng):
+    return f"{rng.uniform(0.5, 20000):.2f}".replace('.', ',')
+
+
+def dados_main(n, rng, invalidos, taxa_erro):
+    linhas = [['Material', 'Descrição', 'Qtd', 'Preço', 'Status']]
+    for _ in range(n):
+        linhas.append([_material(rng, invalidos, taxa_erro), 'ITEM TESTE', str(rng.randint(1, 50)), _preco_br(rng), ''])
+    return linhas
+
+
+def dados_consumo(n, rng, invalidos, taxa_erro):
+    linhas = [['Material', 'Descrição', 'Qtd', 'Preço', 'LT', 'PEP', 'Status']]
+    for _ in range(n):
+        pep = f"BR-{rng.randint(100, 999)}.01" if rng.random() < 0.3 else ''
+        linhas.append([_material(rng, invalidos, taxa_erro), 'ITEM TESTE', str(rng.randint(1, 50)),
+                       _preco_br(rng), str(rng.choice([15, 30, 60, 90])), pep, ''])
+    return linhas
+
+
+def dados_transferencia(n, rng, invalidos, taxa_erro):
+    linhas = [['PN', 'QTD', 'ORIGEM', 'DESTINO', 'LT', 'TEXTO', 'Status', 'REQUISIÇÃO']]
+    for _ in range(n):
+        linhas.append([_material(rng, invalidos, taxa_erro), str(rng.randint(1, 20)),
+                       rng.choice(['BR8E', 'BR0I', 'BR3F']), rng.choice(['BR8A', 'BR1E']),
+                       str(rng.choice([5, 10, 20])), 'TRANSFERENCIA TESTE', '', ''])
+    return linhas
+
+
+def dados_ofs(n, rng, inexistentes, taxa_erro):
+    linhas = [['OF', 'STATUS']]
+    for _ in range(n):
+        of = f"{rng.randint(1000000, 9999999)}"
+        if rng.random() < taxa_erro:
+            inexistentes.add(of)
+        linhas.append([of, ''])
+    return linhas
+
+
+def dados_orquestrador(n, rng, invalidos, taxa_erro):
+    # Mesmo volume em cada aba, com os nomes reais das abas da planilha
+    return {
+        'BD GERAL': dados_main(n, rng, invalidos, taxa_erro),
+        'DANTAS': dados_consumo(n, rng, invalidos, taxa_erro),
+        'REQ INTERNA': dados_transferencia(n, rng, invalidos, taxa_erro),
+        'CANCELAR OF': dados_ofs(n, rng, invalidos, taxa_erro),
+    }
+
+
+# ------------------------------------------
+# EXECUÇÃO DOS ROBÔS
+# ------------------------------------------
+def _sessao(sim):
+    return sim.GetScriptingEngine.Children(0).Children(0)
+
+
+def _exportacao_rcs_abertas(base_path):
+    # O simulador não tem ME5A: lista "não convertida" com RCs de materiais
+    # fora do benchmark, para a verificação de duplicidade rodar sem marcar nada
+    caminho = os.path.join(base_path, 'me5a_abertas.txt')
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write("Lista de requisições de compra\n"
+                "--------------------------------------------------------------\n"
+                "|Req.compra|Item |Material          |Cen.|Dt.remessa|Qtd.RC    |\n"
+                "--------------------------------------------------------------\n"
+                "|0010099001|00010|000000000099999901|BR8E|%s|     1,000|\n"
+                "--------------------------------------------------------------\n"
+                % datetime.now().strftime('%d.%m.%Y'))
+    return caminho
+
+
+def rodar_main(sim, aba, sessoes, base_path):
+    import main
+    main.Config.SESSOES_PARALELAS = sessoes
+    main.Config.ARQUIVO_SNAPSHOT = os.path.join(base_path, 'snapshot_main.json')
+    main.Config.ARQUIVO_DIARIO = os.path.join(base_path, 'diario_lotes.db')
+    main.Config.ARQUIVO_RCS_ABERTAS = _exportacao_rcs_abertas(base_path)
+    app = main.SAPAutomation()
+    app.grupo_selecionado, app.grupo_descricao = 'P04', 'Benchmark'
+    app.data_remessa_calculada = datetime.now().strftime('%d.%m.%Y')
+    if not app.connect_sap():
+        raise RuntimeError("connect_sap falhou no simulador")
+    app.processar_aba(aba)
+    return aba.coluna('Status')
+
+
+def rodar_consumo(sim, aba, sessoes, base_path):
+    import criar_rc_consumo
+    criar_rc_consumo.Config.SESSOES_PARALELAS = sessoes
+    criar_rc_consumo.Config.ARQUIVO_SNAPSHOT = os.path.join(base_path, 'snapshot_consumo.json')
+    criar_rc_consumo.Config.ARQUIVO_DIARIO = os.path.join(base_path, 'diario_lotes.db')
+    criar_rc_consumo.Config.ARQUIVO_RCS_ABERTAS = _exportacao_rcs_abertas(base_path)
+    app = criar_rc_consumo.SAPAutomation()
+    app.grupo_selecionado, app.grupo_descricao = 'P04', 'Benchmark'
+    if not app.connect_sap():
+        raise RuntimeError("connect_sap falhou no simulador")
+    app.processar_aba(aba)
+    return aba.coluna('Status')
+
+
+def _config_transferencia(base_path, passagem_unica):
+    # Sem config.ini o SAPBotCLI cria um padrão e encerra (sys.exit)
+    config = configparser.ConfigParser()
+    config['SAP'] = {'caminho_logon': 'simulador', 'sistema': 'SIMULADOR', 'botao_excluir_item': 'DELETE'}
+    config['GOOGLE'] = {'credenciais': 'credentials.json', 'planilha': 'BENCHMARK', 'aba': 'TRANSF'}
+    config['EXECUCAO'] = {'passagem_unica': 'true' if passagem_unica else 'false'}
+    config['CACHE'] = {'ttl_horas': '0'}
+    with open(os.path.join(base_path, 'config.ini'), 'w', encoding='utf-8') as f:
+        config.write(f)
+
+
+def rodar_transferencia(sim, aba, sessoes, base_path):
+    import REQ_TRANSF_INTERNA
+    bot = REQ_TRANSF_INTERNA.SAPBotCLI(base_path=base_path)
+    bot.session = _sessao(sim)
+    bot.processar_aba(aba)
+    return aba.coluna('Status')
+
+
+def _exportacao_coois(sim, ordens, base_path):
+    # O simulador não tem COOIS: lista "não convertida" em que uma OF a cada
+    # cinco já está encerrada (ENTE) e é marcada sem abrir a CO02
+    caminho = os.path.join(base_path, 'coois_status.txt')
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write("|Ordem       |Material          |Status sistema      |\n")
+        for i, of in enumerate(ordens):
+            if of in sim.ordens_inexistentes:
+                continue
+            status = 'LIB  ENTE' if i % 5 == 0 else 'LIB  CONF'
+            if 'ENTE' in status:
+                sim.status_ordens[of] = 'ENTE'
+            f.write(f"|{int(of):012d}|000000000090800000|{status:<20}|\n")
+    return caminho
+
+
+def rodar_ofs(sim, aba, sessoes, base_path):
+    import cancelar_of
+    cancelar_of.ARQUIVO_COOIS = _exportacao_coois(sim, aba.coluna('OF'), base_path)
+    cancelar_of.SESSOES_PARALELAS = sessoes
+    cancelar_of.concluir_ofs(aba=aba, session=_sessao(sim))
+    return aba.coluna('STATUS')
+
+
+def rodar_orquestrador(sim, pasta, sessoes, base_path):
+    import main
+    import criar_rc_consumo
+    import orquestrador
+    main.Config.ARQUIVO_SNAPSHOT = os.path.join(base_path, 'snapshot_main.json')
+    main.Config.ARQUIVO_DIARIO = os.path.join(base_path, 'diario_lotes.db')
+    main.Config.ARQUIVO_RCS_ABERTAS = _exportacao_rcs_abertas(base_path)
+    criar_rc_consumo.Config.ARQUIVO_SNAPSHOT = os.path.join(base_path, 'snapshot_consumo.json')
+    criar_rc_consumo.Config.ARQUIVO_DIARIO = os.path.join(base_path, 'diario_lotes.db')
+    criar_rc_consumo.Config.ARQUIVO_RCS_ABERTAS = _exportacao_rcs_abertas(base_path)
+    orquestrador.Config.SESSOES_PARALELAS = sessoes
+    import cancelar_of
+    cancelar_of.ARQUIVO_COOIS = _exportacao_coois(sim, pasta.abas['CANCELAR OF'].coluna('OF'), base_path)
+    orq = orquestrador.Orquestrador(planilha=pasta, session=_sessao(sim), base_path=base_path)
+    # Sem perguntas: os robôs ME51N recebem o grupo direto
+    for nome, tipo in orq.tarefas.items():
+        if tipo == 'main':
+            orq.robos[nome] = main.SAPAutomation()
+            orq.robos[nome].data_remessa_calculada = datetime.now().strftime('%d.%m.%Y')
+        elif tipo == 'consumo':
+            orq.robos[nome] = criar_rc_consumo.SAPAutomation()
+        else:
+            continue
+        orq.robos[nome].grupo_selecionado, orq.robos[nome].grupo_descricao = 'P04', 'Benchmark'
+    orq.preparar_robos = lambda: None
+    import REQ_TRANSF_INTERNA
+    for nome, tipo in orq.tarefas.items():
+        if tipo == 'transferencia':
+            orq.robos[nome] = REQ_TRANSF_INTERNA.SAPBotCLI(base_path=base_path)
+    if not orq.connect_sap():
+        raise RuntimeError("connect_sap falhou no simulador")
+    orq.executar()
+    return pasta.coluna('Status')
+
+
+CENARIOS = {
+    'main': ('main.py (ME51N)', 'BD GERAL', dados_main, rodar_main),
+    'consumo': ('criar_rc_consumo.py (ME51N + PEP)', 'DANTAS', dados_consumo, rodar_consumo),
+    'transferencia': ('REQ_TRANSF_INTERNA.py (ZRT)', 'TRANSF', dados_transferencia, rodar_transferencia),
+    'ofs': ('cancelar_of.py (CO02)', 'CANCELAR OF', dados_ofs, rodar_ofs),
+    'orquestrador': ('orquestrador.py (todas as abas)', None, dados_orquestrador, rodar_orquestrador),
+}
+
+
+def executar(nome, n_itens, perfil, sessoes, taxa_erro, semente, base_path, subtela=None, sobrescrever_data=0.0):
+    rotulo, titulo, gerar, rodar = CENARIOS[nome]
+    rng = random.Random(semente)
+    Latencia.semear(semente)
+    falhas_cadastrais = set()
+    linhas = gerar(n_itens, rng, falhas_cadastrais, taxa_erro)
+
+    # OFs têm 7 dígitos e materiais 8: o mesmo conjunto serve aos dois
+    sim = SimuladorSAPGUI(latencias=PERFIS_LATENCIA[perfil](), materiais_invalidos=falhas_cadastrais,
+                          ordens_inexistentes=falhas_cadastrais, subtela_me51n=subtela,
+                          prob_sobrescrever_data=sobrescrever_data, semente=semente)
+    sap_conexao.instalar_simulador(sim)
+    if isinstance(linhas, dict):
+        aba = PastaMemoria(PlanilhaMemoria(t, l) for t, l in linhas.items())
+    else:
+        aba = PlanilhaMemoria(titulo, linhas)
+
+    inicio = time.perf_counter()
+    try:
+        status = rodar(sim, aba, sessoes, base_path)
+    finally:
+        sap_conexao.remover_simulador()
+    duracao = time.perf_counter() - inicio
+
+    est = sim.estatisticas
+    documentos = est.get('documentos', 0) + est.get('ordens_concluidas', 0)
+    itens = est.get('itens', 0) + est.get('ordens_concluidas', 0)
+    return {
+        'rotulo': rotulo,
+        'duracao': duracao,
+        'documentos': documentos,
+        'itens': itens,
+        'pendentes': sum(1 for s in status if not str(s).strip()),
+        'roundtrips': est.get('roundtrips', 0),
+        'chamadas_com': est.get('chamadas_com', 0),
+        'findById_falhos': est.get('findById_falhos', 0),
+        'chamadas_planilha': sum(aba.chamadas.values()),
+    }
+
+
+def imprimir(resultado, n_itens):
+    d = resultado['duracao'] or 1e-9
+    print(f"\n{resultado['rotulo']}")
+    print(f"  tempo:            {d:.2f}s para {n_itens} linha(s)")
+    print(f"  documentos:       {resultado['documentos']}  ({resultado['documentos'] * 3600 / d:.0f}/hora)")
+    print(f"  itens gravados:   {resultado['itens']}  ({resultado['itens'] * 3600 / d:.0f}/hora)")
+    print(f"  linhas sem status: {resultado['pendentes']}")
+    print(f"  roundtrips SAP:   {resultado['roundtrips']} | chamadas COM: {resultado['chamadas_com']}"
+          f" | findById sem resultado: {resultado['findById_falhos']}")
+    print(f"  chamadas planilha: {resultado['chamadas_planilha']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta dos robôs contra o simulador do SAP GUI.")
+    parser.add_argument('--itens', type=int, default=50, help="Linhas geradas por cenário")
+    parser.add_argument('--latencia', choices=sorted(PERFIS_LATENCIA), default='nenhuma')
+    parser.add_argument('--sessoes', type=int, default=1, help="Sessões SAP paralelas (main/consumo/ofs)")
+    parser.add_argument('--taxa-erro', type=float, default=0.05, help="Fração de materiais/OFs inválidos")
+    parser.add_argument('--scripts', nargs='+', choices=sorted(CENARIOS), default=sorted(CENARIOS))
+    parser.add_argument('--passagem-unica', action='store_true', help="REQ_TRANSF_INTERNA em modo passagem única")
+    parser.add_argument('--subtela', help="Força o número de subtela da ME51N no simulador (ex.: 0016)")
+    parser.add_argument('--sobrescrever-data', type=float, default=0.0,
+                        help="Chance de o simulador trocar a data de remessa digitada (EEIND)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--rastreio', help="Grava spans em JSONL (rastreamento.py) e imprime o resumo no fim")
+    parser.add_argument('--verboso', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verboso else logging.WARNING, format='%(levelname)s %(message)s')
+    base_path = tempfile.mkdtemp(prefix='benchmark_sap_')
+    _config_transferencia(base_path, args.passagem_unica)
+    print(f"Perfil de latência: {args.latencia} | sessões: {args.sessoes} | arquivos temporários em {base_path}")
+
+    if args.rastreio:
+        rastreamento.ativar(args.rastreio)
+
+    saida_original = sys.stdout
+    for nome in args.scripts:
+        if not args.verboso:
+            # Os robôs imprimem muito; no modo resumido só o relatório aparece
+            sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+        try:
+            resultado = executar(nome, args.itens, args.latencia, args.sessoes, args.taxa_erro, args.semente, base_path,
+                                  subtela=args.subtela, sobrescrever_data=args.sobrescrever_data)
+        finally:
+            if sys.stdout is not saida_original:
+                sys.stdout.close()
+                sys.stdout = saida_original
+        imprimir(resultado, args.itens)
+
+    if args.rastreio:
+        rastreamento.desativar()
+        rastreamento.resumir(args.rastreio)
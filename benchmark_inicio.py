@@ -0,0 +1,179 @@
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+# ==========================================
+# BENCHMARK DE INICIALIZAÇÃO
+# ==========================================
+# Mede o caminho até o robô estar pronto para ler a planilha:
+#   1. import de cada script em um processo novo (e quais módulos pesados
+#      já foram carregados nesse ponto);
+#   2. connect_google + connect_sap do main.py, em sequência (como antes) e
+#      em paralelo, com cache_google.json frio e quente.
+# Google e SAP são simulados com latências fixas (token, busca da planilha
+# por nome no Drive, open_by_key e attach no SAP GUI), como no
+# benchmark_e2e.py.
+#
+# Exemplo:
+#   python benchmark_inicio.py --repeticoes 5
+
+SCRIPTS = ('main', 'criar_rc_consumo', 'REQ_TRANSF_INTERNA', 'cancelar_of', 'orquestrador')
+MODULOS_PESADOS = ('gspread', 'google.oauth2', 'pandas', 'numpy', 'requests', 'win32com')
+
+# Segundos de cada etapa simulada
+LATENCIAS = {
+    'token': 0.4,        # troca do JWT da conta de serviço por um token de acesso
+    'busca_drive': 1.2,  # client.open(nome): busca por nome no Drive + metadados
+    'abrir_chave': 0.3,  # client.open_by_key(id): só metadados
+    'attach_sap': 0.8,   # GetObject("SAPGUI") + conexão/sessão
+}
+
+_CODIGO_IMPORT = """
+import sys, time
+t = time.perf_counter()
+import {modulo}
+dt = time.perf_counter() - t
+print(dt, ','.join(m for m in {pesados!r} if m in sys.modules))
+"""
+
+
+# ------------------------------------------
+# 1. IMPORTS
+# ------------------------------------------
+def medir_imports(repeticoes):
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    resultados = {}
+    for modulo in SCRIPTS + ('gspread', 'pandas'):
+        tempos, carregados = [], ''
+        for _ in range(repeticoes):
+            saida = subprocess.run(
+                [sys.executable, '-c', _CODIGO_IMPORT.format(modulo=modulo, pesados=MODULOS_PESADOS)],
+                cwd=pasta, capture_output=True, text=True, check=True,
+            ).stdout.split()
+            tempos.append(float(saida[0]))
+            carregados = saida[1] if len(saida) > 1 else ''
+        resultados[modulo] = (statistics.median(tempos), carregados)
+    return resultados
+
+
+# ------------------------------------------
+# 2. CONEXÕES (GOOGLE E SAP SIMULADOS)
+# ------------------------------------------
+def _agora_utc():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class _CredenciaisSimuladas:
+    service_account_email = 'robo@benchmark.iam.gserviceaccount.com'
+
+    def __init__(self):
+        self.token = None
+        self.expiry = None
+
+    def garantir_token(self):
+        if self.token is None or self.expiry <= _agora_utc():
+            time.sleep(LATENCIAS['token'])
+            self.token, self.expiry = 'token-benchmark', _agora_utc() + timedelta(hours=1)
+
+
+class _PlanilhaSimulada:
+    id = '1BenchmarkPlanilha'
+    title = 'MAPEAMENTO PLANNING'
+
+
+class _ClienteSimulado:
+    def __init__(self, creds):
+        self.creds = creds
+
+    def open(self, nome):
+        self.creds.garantir_token()
+        time.sleep(LATENCIAS['busca_drive'])
+        return _PlanilhaSimulada()
+
+    def open_by_key(self, chave):
+        self.creds.garantir_token()
+        time.sleep(LATENCIAS['abrir_chave'])
+        return _PlanilhaSimulada()
+
+
+def _instalar_google_simulado():
+    import gspread
+    from google.oauth2 import service_account
+    gspread.authorize = _ClienteSimulado
+    service_account.Credentials.from_service_account_file = staticmethod(
+        lambda *args, **kwargs: _CredenciaisSimuladas())
+
+
+def _robo(base_path):
+    import main
+    import automacao_me51n
+    from sap_simulador import SimuladorSAPGUI
+
+    simulador = SimuladorSAPGUI()
+
+    def obter_sapgui():
+        time.sleep(LATENCIAS['attach_sap'])
+        return simulador
+
+    automacao_me51n.obter_sapgui = obter_sapgui
+    main.Config.GOOGLE_CREDENTIALS_FILE = os.path.join(base_path, 'credentials.json')
+    return main.SAPAutomation()
+
+
+def medir_conexoes(base_path):
+    import cliente_planilhas
+    from cliente_planilhas import em_segundo_plano, ARQUIVO_CACHE
+
+    _instalar_google_simulado()
+    cliente_planilhas.PASTA_CACHE = base_path
+    cache = os.path.join(base_path, ARQUIVO_CACHE)
+    resultados = {}
+    for paralelo in (False, True):
+        for quente in (False, True):
+            if not quente and os.path.exists(cache):
+                os.remove(cache)
+            robo = _robo(base_path)
+            inicio = time.perf_counter()
+            if paralelo:
+                google = em_segundo_plano(robo.connect_google)
+                ok = robo.connect_sap() and google.result()
+            else:
+                ok = robo.connect_google() and robo.connect_sap()
+            if not ok:
+                raise RuntimeError("Conexão simulada falhou")
+            resultados[(paralelo, quente)] = time.perf_counter() - inicio
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização dos robôs.")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Processos por medição de import (mediana)")
+    args = parser.parse_args()
+
+    print("Import em processo novo (mediana):")
+    imports = medir_imports(args.repeticoes)
+    for modulo, (segundos, carregados) in imports.items():
+        print(f"  {modulo:<20} {segundos * 1000:7.1f} ms  pesados já carregados: {carregados or '-'}")
+
+    base_path = tempfile.mkdtemp(prefix='benchmark_inicio_')
+    try:
+        import logging
+        logging.disable(logging.CRITICAL)
+        conexoes = medir_conexoes(base_path)
+    finally:
+        shutil.rmtree(base_path, ignore_errors=True)
+
+    print("\nconnect_google + connect_sap (main.py, latências simuladas):")
+    for (paralelo, quente), segundos in conexoes.items():
+        modo = 'em paralelo ' if paralelo else 'em sequência'
+        print(f"  {modo}  cache {'quente' if quente else 'frio  '}  {segundos:5.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import atexit
+import logging
+import threading
+import time
+
+from cliente_planilhas import com_cota
+
+
+# ==========================================
+# BUFFER WRITE-BEHIND DE STATUS (GOOGLE SHEETS)
+# ==========================================
+class StatusBuffer:
+    """
+    Acumula atualizações (linha, coluna, valor) e envia tudo em um único
+    worksheet.batch_update, em vez de um update_cell por linha.
+
+    O envio acontece quando flush() é chamado (fim de cada lote), quando a
+    fila atinge max_itens ou quando a atualização mais antiga passa de
+    max_segundos. Um flush final é garantido por fechar() e pelo atexit.
+
+    ao_gravar([(linha, coluna, valor)]) opcional é chamado após cada envio
+    bem-sucedido (ex.: diario_lotes.DiarioLotes.confirmar).
+
+    Retentativas e cota ficam com cliente_planilhas (com_cota); um envio que
+    falha mesmo assim volta para a fila e sai no próximo flush.
+    """
+
+    def __init__(self, worksheet, max_itens=50, max_segundos=30.0, logger=None, ao_gravar=None):
+        self.worksheet = com_cota(worksheet)
+        self.ao_gravar = ao_gravar
+        self.max_itens = max_itens
+        self.max_segundos = max_segundos
+        self.logger = logger or logging.getLogger(__name__)
+
+        # (linha, coluna) -> valor; a última escrita na mesma célula vence
+        self._pendentes = {}
+        self._primeiro_enfileiramento = None
+        self._lock = threading.Lock()
+        self._fechado = False
+        atexit.register(self.fechar)
+
+    def __len__(self):
+        return len(self._pendentes)
+
+    def adicionar(self, row_index, col_idx, valor):
+        with self._lock:
+            if not self._pendentes:
+                self._primeiro_enfileiramento = time.monotonic()
+            self._pendentes[(row_index, col_idx)] = str(valor)
+            cheio = len(self._pendentes) >= self.max_itens
+            vencido = time.monotonic() - self._primeiro_enfileiramento >= self.max_segundos
+        if cheio or vencido:
+            self.flush()
+
+    def flush(self):
+        """Envia as atualizações pendentes. Retorna True se a fila ficou vazia."""
+        with self._lock:
+            if not self._pendentes:
+                return True
+            lote = dict(self._pendentes)
+            self._pendentes.clear()
+            self._primeiro_enfileiramento = None
+
+        from gspread.utils import rowcol_to_a1
+        updates = [
+            {'range': rowcol_to_a1(linha, coluna), 'values': [[valor]]}
+            for (linha, coluna), valor in sorted(lote.items())
+        ]
+
+        try:
+            self.worksheet.batch_update(updates)
+        except Exception as e:
+            self.logger.warning("Falha no batch_update: %s", e)
+        else:
+            self.logger.info("Planilha atualizada: %s célula(s) em 1 chamada.", len(updates))
+            if self.ao_gravar is not None:
+                try:
+                    self.ao_gravar([(linha, coluna, valor) for (linha, coluna), valor in sorted(lote.items())])
+                except Exception as e:
+                    self.logger.warning("Falha ao confirmar gravação (ao_gravar): %s", e)
+            return True
+
+        # Devolve à fila sem sobrescrever valores mais novos enfileirados no meio tempo
+        with self._lock:
+            for chave, valor in lote.items():
+                self._pendentes.setdefault(chave, valor)
+            if self._primeiro_enfileiramento is None:
+                self._primeiro_enfileiramento = time.monotonic()
+        return False
+
+    def fechar(self):
+        """
+        Flush final. Retorna a lista de (linha, coluna, valor) que não puderam
+        ser gravados e registra cada um no log para correção manual.
+        """
+        if self._fechado:
+            return []
+        self._fechado = True
+        try:
+            atexit.unregister(self.fechar)
+        except Exception:
+            pass
+
+        if self.flush():
+            return []
+
+        with self._lock:
+            nao_entregues = [(l, c, v) for (l, c), v in sorted(self._pendentes.items())]
+            self._pendentes.clear()
+
+        from gspread.utils import rowcol_to_a1
+        self.logger.error("%s atualização(ões) NÃO gravadas na planilha:", len(nao_entregues))
+        for linha, coluna, valor in nao_entregues:
+            self.logger.error(" -> %s = %s", rowcol_to_a1(linha, coluna), valor)
+        return nao_entregues
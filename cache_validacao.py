@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import os
+import threading
+import time
+
+
+# ==========================================
+# CACHE PERSISTENTE DE VALIDAÇÃO (PN, ORIGEM, DESTINO)
+# ==========================================
+class CacheValidacao:
+    """
+    Guarda em disco o resultado da validação de cada combinação
+    (PN, ORIGEM, DESTINO) na ME51N, com validade (TTL).
+
+    Só resultados determinísticos são gravados: "OK" e erros cadastrais que
+    casem com MENSAGENS_CACHEAVEIS (ex.: material não atualizado no centro).
+    Erros transitórios (bloqueio, timeout, queda de sessão) sempre voltam
+    para o SAP.
+    """
+
+    MENSAGENS_CACHEAVEIS = (
+        "não está atualizado no centro",
+        "not maintained in plant",
+    )
+
+    def __init__(self, caminho, ttl_horas=168):
+        self.caminho = caminho
+        self.ttl_segundos = float(ttl_horas) * 3600
+        self._dados = {}
+        self._lock = threading.Lock()
+        self._carregar()
+
+    @staticmethod
+    def _chave(pn, origem, destino):
+        return "|".join(str(v).strip().upper() for v in (pn, origem, destino))
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                self._dados = json.load(f)
+        except Exception:
+            # Cache corrompido não pode impedir a execução; recomeça vazio
+            self._dados = {}
+            return
+        # Vencidos nunca mais seriam consultados: saem já na carga e o
+        # arquivo encolhe no próximo salvar()
+        self.expurgar_vencidos()
+
+    def salvar(self):
+        with self._lock:
+            tmp = self.caminho + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._dados, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.caminho)
+
+    def consultar(self, pn, origem, destino):
+        """Retorna o status cacheado ("OK" ou a mensagem de erro) ou None."""
+        entrada = self._dados.get(self._chave(pn, origem, destino))
+        if not entrada:
+            return None
+        if time.time() - entrada['ts'] > self.ttl_segundos:
+            return None
+        return entrada['status']
+
+    def cacheavel(self, status):
+        if status == "OK":
+            return True
+        texto = str(status).lower()
+        return any(m in texto for m in self.MENSAGENS_CACHEAVEIS)
+
+    def registrar(self, pn, origem, destino, status):
+        if not self.cacheavel(status):
+            return False
+        with self._lock:
+            self._dados[self._chave(pn, origem, destino)] = {'status': status, 'ts': time.time()}
+        return True
+
+    def invalidar(self, pn=None, origem=None, destino=None):
+        """
+        Remove entradas. Campos None funcionam como curinga; sem argumentos
+        limpa tudo. Retorna quantas entradas foram removidas.
+        """
+        filtro = [None if v is None else str(v).strip().upper() for v in (pn, origem, destino)]
+        with self._lock:
+            remover = [
+                chave for chave in self._dados
+                if all(f is None or f == parte for f, parte in zip(filtro, chave.split("|")))
+            ]
+            for chave in remover:
+                del self._dados[chave]
+        return len(remover)
+
+    def expurgar_vencidos(self):
+        """Remove entradas além do TTL. Retorna quantas saíram."""
+        agora = time.time()
+        with self._lock:
+            vencidos = [k for k, v in self._dados.items() if agora - v['ts'] > self.ttl_segundos]
+            for chave in vencidos:
+                del self._dados[chave]
+        return len(vencidos)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manutenção do cache de validação de RCs internas.")
+    parser.add_argument('--arquivo', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache_validacao.json'))
+    parser.add_argument('--pn')
+    parser.add_argument('--origem')
+    parser.add_argument('--destino')
+    parser.add_argument('--tudo', action='store_true', help="Limpa o cache inteiro")
+    args = parser.parse_args()
+
+    if not (args.tudo or args.pn or args.origem or args.destino):
+        parser.error("informe --tudo ou ao menos um de --pn/--origem/--destino")
+
+    cache = CacheValidacao(args.arquivo)
+    removidos = cache.invalidar(args.pn, args.origem, args.destino)
+    cache.salvar()
+    print(f"{removidos} entrada(s) removida(s) de {args.arquivo}")
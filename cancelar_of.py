@@ -1,97 +1,179 @@
-import win32com.client
-import gspread
-from google.oauth2.service_account import Credentials
-import time
+import os
 
-def concluir_ofs():
-    print("Iniciando o processo...")
+from sap_conexao import obter_sapgui
+from rastreamento import span, instrumentar_sessao, instrumentar_planilha
+from cliente_planilhas import com_cota, conectar_google, em_segundo_plano
+from buffer_status import StatusBuffer
+from pool_sessoes import PoolSessoesSAP
+from status_ordens import obter_status, concluida
 
-    # ---------------------------------------------------------
-    # 1. CONFIGURAÇÃO DO GOOGLE SHEETS
-    # ---------------------------------------------------------
-    # Define as permissões que o script terá (Drive e Sheets)
-    scopes = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-    
-    try:
-        # Carrega o arquivo JSON que você baixou do Google Cloud
-        creds = Credentials.from_service_account_file("credentials.json", scopes=scopes)
-        client = gspread.authorize(creds)
-        
-        # Abre a planilha pelo nome e seleciona a aba específica
-        planilha = client.open("MAPEAMENTO PLANNING")
-        aba = planilha.worksheet("CANCELAR OF")
-    except Exception as e:
-        print(f"Erro ao conectar no Google Sheets. Verifique o credentials.json e os compartilhamentos: {e}")
-        return
+STATUS_FEITO = "FEITO"
+STATUS_ERRO = "ERRO"
 
-    # ---------------------------------------------------------
-    # 2. CONFIGURAÇÃO DO SAP GUI
-    # ---------------------------------------------------------
+# Exportação da COOIS já baixada (status de sistema das OFs); vazio = roda a COOIS
+ARQUIVO_COOIS = os.getenv('FC_COOIS', '')
+
+# Sessões SAP em paralelo para a CO02 (1 = uma OF de cada vez; máx. 6).
+# None = FC_SESSOES_OF, lida em concluir_ofs() (_sessoes_paralelas)
+SESSOES_PARALELAS = None
+
+
+def _sessoes_paralelas():
+    if SESSOES_PARALELAS is not None:
+        return SESSOES_PARALELAS
+    valor = os.getenv('FC_SESSOES_OF', '1')
     try:
-        # Pega a sessão ativa do SAP (o SAP precisa estar aberto!)
-        SapGuiAuto = win32com.client.GetObject("SAPGUI")
-        application = SapGuiAuto.GetScriptingEngine
-        connection = application.Children(0)
-        session = connection.Children(0)
-    except Exception as e:
-        print("Erro ao conectar ao SAP. Certifique-se de que o SAP está aberto e logado.")
-        return
+        return max(1, int(valor))
+    except ValueError:
+        print(f"Aviso: FC_SESSOES_OF inválido ('{valor}'); usando 1 sessão.")
+        return 1
 
-    # ---------------------------------------------------------
-    # 3. LÓGICA DE REPETIÇÃO (O "While" do seu VBA)
-    # ---------------------------------------------------------
-    # Pega todos os valores da Coluna A (Índice 1 no gspread)
-    valores_coluna_a = aba.col_values(1)
-    
-    # Assumindo que a linha 1 seja cabeçalho, vamos começar da linha 2.
-    # Se não tiver cabeçalho, mude a linha_atual para 1.
-    linha_atual = 2 
-    
-    for i in range(linha_atual - 1, len(valores_coluna_a)):
-        selected_of = str(valores_coluna_a[i]).strip()
-        
-        # Se a célula estiver vazia, encerra o loop (como o <> "" do VBA)
-        if not selected_of:
-            break
-            
+
+def _abrir_aba():
+    # Carrega o arquivo JSON que você baixou do Google Cloud e abre a aba
+    _, planilha = conectar_google("credentials.json", nome="MAPEAMENTO PLANNING")
+    return planilha.worksheet("CANCELAR OF")
+
+
+def _concluir_of(session, selected_of):
+    """CO02 de uma OF. Retorna None ou a exceção (a sessão volta para a tela inicial)."""
+    with span('documento', ordem=selected_of):
         try:
             # Maximiza e chama a transação
             session.findById("wnd").maximize()
             session.findById("wnd/tbar/okcd").Text = "/NCO02"
             session.findById("wnd").sendVKey(0) # Enter
-            
+
             # Preenche o número da OF
             session.findById("wnd/usr/ctxtCAUFVD-AUFNR").Text = selected_of
             session.findById("wnd").sendVKey(0) # Enter
-            
+
             # Navega no menu
             session.findById("wnd/mbar/menu/menu/menu").Select()
             session.findById("wnd").sendVKey(11) # Salvar (Ctrl+S)
-            
+
             # Posiciona o cursor e dá enter
             session.findById("wnd/usr/ctxtCAUFVD-AUFNR").caretPosition = 7
             session.findById("wnd").sendVKey(0)
-            
-            # Escreve "FEITO" na Coluna B (Índice 2)
-            aba.update_cell(linha_atual, 2, "FEITO")
-            print(f"Linha {linha_atual}: OF {selected_of} -> FEITO")
-            
+            return None
+
         except Exception as e:
-            # Em caso de erro (On Error GoTo Handler)
-            aba.update_cell(linha_atual, 2, "ERRO")
-            print(f"Linha {linha_atual}: OF {selected_of} -> ERRO ({e})")
-            
             # Volta para a tela inicial para não travar o loop na próxima OF
-            session.findById("wnd/tbar/okcd").Text = "/N"
-            session.findById("wnd").sendVKey(0)
-            
-        linha_atual += 1
-        
-        # Pausa de 1 segundo para não estourar o limite de requisições da API do Google
-        time.sleep(1)
+            try:
+                session.findById("wnd/tbar/okcd").Text = "/N"
+                session.findById("wnd").sendVKey(0)
+            except Exception:
+                pass
+            return e
+
+
+def concluir_ofs(aba=None, session=None, pool=None):
+    """
+    aba/session opcionais: quando informados (ex.: benchmark_e2e.py com o
+    simulador), pula a conexão com o Google Sheets e/ou com o SAP.
+    pool opcional: PoolSessoesSAP já aberto (orquestrador.py).
+    """
+    print("Iniciando o processo...")
+
+    # ---------------------------------------------------------
+    # 1. CONFIGURAÇÃO DO GOOGLE SHEETS
+    # ---------------------------------------------------------
+    # Conecta em segundo plano enquanto o SAP é acessado abaixo; o ID da
+    # planilha e o token ficam em cache_google.json para a próxima execução
+    google = None
+    if aba is None:
+        google = em_segundo_plano(_abrir_aba)
+
+    # ---------------------------------------------------------
+    # 2. CONFIGURAÇÃO DO SAP GUI
+    # ---------------------------------------------------------
+    if session is None:
+        try:
+            # Pega a sessão ativa do SAP (o SAP precisa estar aberto!)
+            SapGuiAuto = obter_sapgui()
+            application = SapGuiAuto.GetScriptingEngine
+            connection = application.Children(0)
+            session = connection.Children(0)
+        except Exception as e:
+            print("Erro ao conectar ao SAP. Certifique-se de que o SAP está aberto e logado.")
+            return
+
+    if google is not None:
+        try:
+            aba = google.result()
+        except Exception as e:
+            print(f"Erro ao conectar no Google Sheets. Verifique o credentials.json e os compartilhamentos: {e}")
+            return
+
+    aba = instrumentar_planilha(com_cota(aba))
+    session = instrumentar_sessao(session)
+
+    # ---------------------------------------------------------
+    # 3. LÓGICA DE REPETIÇÃO (O "While" do seu VBA)
+    # ---------------------------------------------------------
+    # Colunas A (OF) e B (status) em uma única leitura, a partir da linha 2
+    # (linha 1 = cabeçalho). OFs já FEITO ficam de fora: rodar de novo depois
+    # de uma falha só custa as linhas que ainda estão em aberto.
+    valores = aba.batch_get(["A2:B"])[0]
+
+    pendentes = []  # (linha da planilha, OF)
+    puladas = 0
+    for linha_atual, linha in enumerate(valores, start=2):
+        selected_of = str(linha[0]).strip() if linha else ''
+
+        # Se a célula estiver vazia, encerra o loop (como o <> "" do VBA)
+        if not selected_of:
+            break
+
+        if len(linha) > 1 and str(linha[1]).strip().upper() == STATUS_FEITO:
+            puladas += 1
+            continue
+        pendentes.append((linha_atual, selected_of))
+
+    if puladas:
+        print(f"{puladas} OF(s) já marcadas como FEITO foram puladas.")
+
+    # Resultados vão para a planilha em batch_update periódicos (sem pausa por OF)
+    status_buffer = StatusBuffer(aba)
+    try:
+        # Pré-verificação: uma COOIS para todas as OFs; as já encerradas
+        # recebem FEITO sem abrir a CO02
+        if pendentes:
+            with span('coois', ordens=len(pendentes)):
+                status = obter_status(session, [of for _, of in pendentes], arquivo=ARQUIVO_COOIS or None)
+            if status:
+                restantes = []
+                for linha_atual, selected_of in pendentes:
+                    status_of = status.get(selected_of.lstrip('0'))
+                    if concluida(status_of):
+                        status_buffer.adicionar(linha_atual, 2, STATUS_FEITO)
+                        print(f"Linha {linha_atual}: OF {selected_of} -> FEITO (já estava {status_of})")
+                    else:
+                        restantes.append((linha_atual, selected_of))
+                pendentes = restantes
+
+        # O restante da CO02 é dividido entre as sessões do pool
+        sessoes = _sessoes_paralelas()
+        if pool is None and sessoes > 1 and len(pendentes) > 1:
+            pool = PoolSessoesSAP(session, sessoes)
+            pool.preparar()
+        ordens = [of for _, of in pendentes]
+        if pool is not None:
+            resultados = pool.mapear(_concluir_of, ordens)
+        else:
+            resultados = (_concluir_of(session, of) for of in ordens)
+
+        for (linha_atual, selected_of), erro in zip(pendentes, resultados):
+            if erro is None:
+                # Escreve "FEITO" na Coluna B (Índice 2)
+                status_buffer.adicionar(linha_atual, 2, STATUS_FEITO)
+                print(f"Linha {linha_atual}: OF {selected_of} -> FEITO")
+            else:
+                # Em caso de erro (On Error GoTo Handler)
+                status_buffer.adicionar(linha_atual, 2, STATUS_ERRO)
+                print(f"Linha {linha_atual}: OF {selected_of} -> ERRO ({erro})")
+    finally:
+        status_buffer.fechar()
 
     print("\nProcesso concluído com sucesso!")
 
@@ -0,0 +1,357 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from rastreamento import dormir
+
+
+# ==========================================
+# ACESSO AO GOOGLE SHEETS COM CONTROLE DE COTA
+# ==========================================
+# Todas as chamadas à API passam por dois baldes de tokens (leituras e
+# escritas) compartilhados pelo processo inteiro: os robôs rodando juntos
+# (orquestrador.py, threads do pool) dividem a mesma cota em vez de cada um
+# estourar a sua e dormir às cegas. Com cota sobrando nada espera.
+#
+# Erros 429 (cota) e 5xx são repetidos com espera exponencial e jitter; um
+# 429 também esvazia o balde, para as outras threads frearem junto.
+#
+# Escritas na mesma aba que chegam enquanto outra está esperando cota são
+# juntadas em um único batch_update quando a cota libera.
+#
+# Uso: com_cota(worksheet ou planilha) devolve um proxy com a mesma interface.
+#
+# Início rápido (conectar_google): gspread/google-auth só são importados na
+# conexão, que pode rodar em segundo plano enquanto o SAP conecta
+# (em_segundo_plano); o token de acesso e o ID da planilha resolvido pelo
+# nome ficam em cache local, então a próxima execução não autentica de novo
+# nem faz a busca por nome no Drive.
+
+# Cota padrão da API: 60 leituras e 60 escritas por minuto por usuário
+LEITURAS_POR_MINUTO = int(os.getenv('FC_COTA_LEITURAS', '60'))
+ESCRITAS_POR_MINUTO = int(os.getenv('FC_COTA_ESCRITAS', '60'))
+
+TENTATIVAS = 6
+ESPERA_BASE = 1.0
+ESPERA_MAX = 64.0
+STATUS_REPETIVEIS = (429, 500, 502, 503, 504)
+
+METODOS_LEITURA = (
+    'row_values', 'col_values', 'batch_get', 'get', 'get_values', 'get_all_values', 'get_all_records',
+    'acell', 'cell', 'find', 'findall', 'values_batch_get', 'get_lastUpdateTime', 'fetch_sheet_metadata',
+)
+METODOS_ESCRITA = ('update', 'append_row', 'append_rows', 'clear', 'batch_clear', 'values_batch_update')
+# Devolvem abas: o resultado também passa a ter controle de cota
+METODOS_ABAS = ('worksheet', 'worksheets', 'get_worksheet', 'get_worksheet_by_id', 'add_worksheet')
+
+logger = logging.getLogger(__name__)
+
+
+class BaldeTokens:
+    """Balde com capacidade para uma rajada de um minuto, reposto continuamente."""
+
+    def __init__(self, por_minuto):
+        self.capacidade = float(max(1, por_minuto))
+        self.taxa = self.capacidade / 60.0
+        self.tokens = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self.tokens = min(self.capacidade, self.tokens + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def reservar(self):
+        """Reserva um token e retorna quantos segundos esperar por ele (0 = já)."""
+        with self._lock:
+            self._repor()
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.taxa
+
+    def esvaziar(self):
+        with self._lock:
+            self._repor()
+            self.tokens = min(self.tokens, 0.0)
+
+
+BALDES = {
+    'leitura': BaldeTokens(LEITURAS_POR_MINUTO),
+    'escrita': BaldeTokens(ESCRITAS_POR_MINUTO),
+}
+
+
+def _aguardar_cota(tipo):
+    espera = BALDES[tipo].reservar()
+    if espera > 0:
+        dormir(espera)
+
+
+def _status_http(erro):
+    resposta = getattr(erro, 'response', None)
+    status = getattr(resposta, 'status_code', None)
+    if status is None:
+        status = getattr(erro, 'code', None)
+    return status
+
+
+def _repetivel(erro):
+    if _status_http(erro) in STATUS_REPETIVEIS:
+        return True
+    # Queda de rede/timeout do requests (usado pelo gspread)
+    return type(erro).__name__ in ('ConnectionError', 'Timeout', 'ReadTimeout', 'ConnectTimeout')
+
+
+def chamar(tipo, funcao, *args, _cota_reservada=False, **kwargs):
+    """funcao(*args, **kwargs) dentro da cota de tipo ('leitura'/'escrita'), com retentativas."""
+    for tentativa in range(1, TENTATIVAS + 1):
+        if tentativa > 1 or not _cota_reservada:
+            _aguardar_cota(tipo)
+        try:
+            return funcao(*args, **kwargs)
+        except Exception as e:
+            if not _repetivel(e) or tentativa == TENTATIVAS:
+                raise
+            if _status_http(e) == 429:
+                BALDES[tipo].esvaziar()
+            espera = min(ESPERA_MAX, ESPERA_BASE * 2 ** (tentativa - 1))
+            espera = espera / 2 + random.uniform(0, espera / 2)
+            logger.warning("Sheets %s: %s (tentativa %s/%s); nova tentativa em %.1fs.",
+                           getattr(funcao, '__name__', 'chamada'), _status_http(e) or type(e).__name__,
+                           tentativa, TENTATIVAS, espera)
+            dormir(espera)
+
+
+class _FilaEscrita:
+    """batch_update de uma aba; pedidos que chegam durante a espera saem juntos."""
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self._lock = threading.Lock()
+        self._envio = threading.Lock()
+        self._pendentes = []
+
+    def enviar(self, dados, **kwargs):
+        pedido = {'dados': list(dados), 'kwargs': kwargs, 'pronto': threading.Event(),
+                  'resultado': None, 'erro': None}
+        with self._lock:
+            self._pendentes.append(pedido)
+
+        with self._envio:
+            if not pedido['pronto'].is_set():
+                _aguardar_cota('escrita')
+                with self._lock:
+                    lote, self._pendentes = self._pendentes, []
+                if len(lote) > 1:
+                    logger.info("Sheets: %s escritas juntadas em uma chamada.", len(lote))
+                self._enviar_lote(lote)
+
+        if pedido['erro'] is not None:
+            raise pedido['erro']
+        return pedido['resultado']
+
+    def _enviar_lote(self, lote):
+        # Só junta pedidos com as mesmas opções (ex.: value_input_option);
+        # a ordem é mantida, então a última escrita na mesma célula vence
+        grupos = {}
+        for pedido in lote:
+            grupos.setdefault(tuple(sorted(pedido['kwargs'].items())), []).append(pedido)
+        reservada = True
+        for opcoes, pedidos in grupos.items():
+            dados = [bloco for pedido in pedidos for bloco in pedido['dados']]
+            try:
+                resultado, erro = chamar('escrita', self.worksheet.batch_update, dados,
+                                         _cota_reservada=reservada, **dict(opcoes)), None
+            except Exception as e:
+                resultado, erro = None, e
+            reservada = False
+            for pedido in pedidos:
+                pedido['resultado'], pedido['erro'] = resultado, erro
+                pedido['pronto'].set()
+
+
+_filas = {}
+_filas_lock = threading.Lock()
+
+
+def _fila_da_aba(worksheet):
+    chave = (getattr(worksheet, 'spreadsheet_id', None), getattr(worksheet, 'id', None), id(worksheet))
+    if chave[1] is not None:
+        chave = chave[:2]
+    with _filas_lock:
+        if chave not in _filas:
+            _filas[chave] = _FilaEscrita(worksheet)
+        return _filas[chave]
+
+
+class ComCota:
+    """Proxy de planilha/aba do gspread: leituras e escritas passam pela cota."""
+
+    COM_COTA = True
+    __slots__ = ('_alvo',)
+
+    def __init__(self, alvo):
+        object.__setattr__(self, '_alvo', alvo)
+
+    def __getattr__(self, nome):
+        valor = getattr(self._alvo, nome)
+        if nome in METODOS_LEITURA:
+            return lambda *args, **kwargs: chamar('leitura', valor, *args, **kwargs)
+        if nome in METODOS_ESCRITA:
+            return lambda *args, **kwargs: chamar('escrita', valor, *args, **kwargs)
+        if nome in METODOS_ABAS:
+            def abas(*args, **kwargs):
+                resultado = chamar('leitura', valor, *args, **kwargs)
+                if isinstance(resultado, list):
+                    return [com_cota(aba) for aba in resultado]
+                return com_cota(resultado)
+            return abas
+        return valor
+
+    def __setattr__(self, nome, valor):
+        setattr(self._alvo, nome, valor)
+
+    def batch_update(self, dados, **kwargs):
+        if hasattr(self._alvo, 'worksheets'):
+            # Spreadsheet.batch_update(body): requisição de estrutura, não lista de faixas
+            return chamar('escrita', self._alvo.batch_update, dados, **kwargs)
+        return _fila_da_aba(self._alvo).enviar(dados, **kwargs)
+
+    def update_cell(self, linha, coluna, valor):
+        from gspread.utils import rowcol_to_a1
+        # Mesma opção do update_cell do gspread, para poder juntar com outras escritas
+        return self.batch_update([{'range': rowcol_to_a1(linha, coluna), 'values': [[valor]]}],
+                                 value_input_option='USER_ENTERED')
+
+    def __eq__(self, outro):
+        if isinstance(outro, ComCota):
+            outro = outro._alvo
+        return self._alvo == outro
+
+    def __hash__(self):
+        return hash(self._alvo)
+
+
+def com_cota(objeto):
+    """Planilha ou aba com controle de cota (objetos que já controlam voltam iguais)."""
+    if objeto is None or getattr(objeto, 'COM_COTA', False):
+        return objeto
+    return ComCota(objeto)
+
+
+def abrir_planilha(cliente, nome=None, chave=None):
+    """client.open_by_key/open dentro da cota de leitura, já com controle de cota."""
+    if chave:
+        return com_cota(chamar('leitura', cliente.open_by_key, chave))
+    return com_cota(chamar('leitura', cliente.open, nome))
+
+
+# ------------------------------------------
+# INÍCIO RÁPIDO
+# ------------------------------------------
+ESCOPOS = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+
+# Cache local {'planilhas': {nome: id}, 'token': {...}}. Fica no perfil do
+# usuário (fora da pasta dos scripts e do repositório) porque guarda o token
+# de acesso em texto: %LOCALAPPDATA%\fc_planning no Windows, ~/.cache/fc_planning
+# nos demais; FC_PASTA_CACHE troca a pasta.
+ARQUIVO_CACHE = 'cache_google.json'
+PASTA_CACHE = os.getenv('FC_PASTA_CACHE') or os.path.join(
+    os.getenv('LOCALAPPDATA') or os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'fc_planning',
+)
+
+# Token com menos que isso de validade é renovado em vez de reaproveitado
+MARGEM_TOKEN = timedelta(minutes=5)
+
+
+def _ler_cache(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _gravar_cache(caminho, cache):
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = caminho + '.tmp'
+        # Só o próprio usuário lê o arquivo (tem o token de acesso)
+        descritor = os.open(temporario, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descritor, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=1)
+        os.replace(temporario, caminho)
+    except OSError as e:
+        logger.warning("Não foi possível gravar o cache do Google (%s): %s", caminho, e)
+
+
+def _token_do_cache(creds, cache):
+    """Reaproveita o token de acesso salvo se for da mesma conta e ainda valer."""
+    token = cache.get('token') or {}
+    if token.get('conta') != creds.service_account_email or not token.get('valor'):
+        return False
+    try:
+        expira = datetime.fromisoformat(token['expira'])
+    except (KeyError, TypeError, ValueError):
+        return False
+    # google-auth usa expiry em UTC sem fuso
+    if expira - datetime.now(timezone.utc).replace(tzinfo=None) <= MARGEM_TOKEN:
+        return False
+    creds.token, creds.expiry = token['valor'], expira
+    return True
+
+
+def conectar_google(credenciais, nome=None, chave=None, arquivo_cache=None):
+    """
+    Autoriza e abre a planilha (já com controle de cota). Sem chave, usa o ID
+    guardado no cache para o nome; só na primeira vez (ou se a planilha mudar
+    de ID) faz client.open(nome), que é uma busca no Drive.
+    """
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    arquivo_cache = arquivo_cache or os.path.join(PASTA_CACHE, ARQUIVO_CACHE)
+    cache = _ler_cache(arquivo_cache)
+    creds = Credentials.from_service_account_file(credenciais, scopes=ESCOPOS)
+    token_reaproveitado = _token_do_cache(creds, cache)
+    cliente = gspread.authorize(creds)
+
+    planilhas = cache.setdefault('planilhas', {})
+    chave = chave or planilhas.get(nome)
+    planilha, aberta_por = None, 'chave'
+    if chave:
+        try:
+            planilha = abrir_planilha(cliente, chave=chave)
+        except gspread.exceptions.SpreadsheetNotFound:
+            logger.warning("Planilha %s não encontrada pela chave; procurando pelo nome.", chave)
+            planilhas.pop(nome, None)
+    if planilha is None:
+        planilha, aberta_por = abrir_planilha(cliente, nome=nome), 'nome'
+    if nome:
+        planilhas[nome] = planilha.id
+
+    if creds.token and creds.expiry:
+        cache['token'] = {'conta': creds.service_account_email, 'valor': creds.token,
+                          'expira': creds.expiry.isoformat()}
+    _gravar_cache(arquivo_cache, cache)
+    logger.info("Google: planilha '%s' aberta por %s (token %s).", planilha.title, aberta_por,
+                'do cache' if token_reaproveitado else 'novo')
+    return cliente, planilha
+
+
+def em_segundo_plano(funcao, *args, **kwargs):
+    """
+    Roda funcao numa thread e devolve o Future (.result() espera). Usado para
+    conectar ao Google enquanto a thread principal conecta ao SAP: objetos
+    COM do SAP ficam na thread que os criou, o gspread não tem essa restrição.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inicio')
+    futuro = executor.submit(funcao, *args, **kwargs)
+    executor.shutdown(wait=False)
+    return futuro
@@ -0,0 +1,95 @@
+import logging
+import re
+
+
+# ==========================================
+# CONFERÊNCIA DE CÉLULAS DO GRID (LEITURA DE VOLTA)
+# ==========================================
+# Depois do Enter o SAP pode trocar valores digitados (ex.: EEIND volta para
+# a data padrão do material). Em vez de redigitar tudo às cegas, as células
+# são lidas com getCellValue (chamada COM local, sem ida ao servidor) e só
+# as que divergem são reescritas.
+
+def _normalizar_texto(valor):
+    return str(valor or '').strip().upper()
+
+
+def _normalizar_data(valor):
+    # '17.10.2026', '17/10/2026' e '17102026' são a mesma data
+    return re.sub(r'\D', '', str(valor or ''))
+
+
+def _normalizar_decimal(valor):
+    # SAP devolve com separador de milhar e casas extras ('1.000,000')
+    texto = str(valor or '').strip().replace(' ', '')
+    if not texto:
+        return None
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        return round(float(texto), 3)
+    except ValueError:
+        return texto
+
+
+NORMALIZADORES = {
+    'texto': _normalizar_texto,
+    'data': _normalizar_data,
+    'decimal': _normalizar_decimal,
+}
+
+# Tipo de comparação das colunas usadas pelos scripts da ME51N
+TIPOS_COLUNA = {
+    'EEIND': 'data',
+    'MENGE': 'decimal',
+    'PREIS': 'decimal',
+}
+
+
+class ConferenciaGrid:
+    """
+    Guarda o valor esperado de cada célula digitada e, depois da
+    verificação do SAP, relê as células e reescreve só as divergentes.
+
+        conferencia = ConferenciaGrid(grid, colunas=('EEIND',))
+        conferencia.esperar(i, 'EEIND', data)   # junto do modifyCell
+        ...Enter...
+        if conferencia.corrigir():              # nº de células reescritas
+            ...Enter de novo...
+    """
+
+    def __init__(self, grid, colunas=None, logger=None):
+        self.grid = grid
+        self.colunas = set(colunas) if colunas is not None else None
+        self.logger = logger or logging.getLogger(__name__)
+        self._esperados = {}
+
+    def esperar(self, linha, coluna, valor):
+        """Registra o valor digitado (ignora colunas fora da conferência)."""
+        if self.colunas is None or coluna in self.colunas:
+            self._esperados[(linha, coluna)] = valor
+
+    def divergencias(self):
+        """Lista [(linha, coluna, esperado, lido)] das células que o SAP alterou."""
+        diferentes = []
+        for (linha, coluna), esperado in self._esperados.items():
+            normalizar = NORMALIZADORES[TIPOS_COLUNA.get(coluna, 'texto')]
+            try:
+                lido = self.grid.getCellValue(linha, coluna)
+            except Exception:
+                lido = None  # não deu para ler: reescreve por segurança
+            if lido is None or normalizar(lido) != normalizar(esperado):
+                diferentes.append((linha, coluna, esperado, lido))
+        return diferentes
+
+    def corrigir(self):
+        """Reescreve as células divergentes. Retorna quantas foram reescritas."""
+        reescritas = 0
+        for linha, coluna, esperado, lido in self.divergencias():
+            self.logger.info(f"    -> SAP alterou {coluna} da linha {linha + 1} ('{lido}' ≠ '{esperado}'). Reescrevendo.")
+            try:
+                self.grid.modifyCell(linha, coluna, esperado)
+                reescritas += 1
+            except Exception as e:
+                self.logger.warning(f"    -> Falha ao reescrever {coluna} da linha {linha + 1}: {e}")
+        return reescritas
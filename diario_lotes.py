@@ -0,0 +1,244 @@
+import functools
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+
+
+# ==========================================
+# DIÁRIO LOCAL DE ENVIOS (SQLITE EM MODO WAL)
+# ==========================================
+# Se o script morrer entre o Gravar da ME51N e a escrita do número da RC na
+# planilha, a linha continuaria pendente e a próxima execução criaria uma RC
+# duplicada. O diário registra, por linha da planilha, três eventos
+# (somente inserções):
+#
+#   envio      → as linhas vão ser gravadas no SAP (antes do Gravar)
+#   resultado  → resposta do SAP (número da RC ou erro), ainda não na planilha
+#   gravado    → valor confirmado na planilha
+#
+# Na inicialização, recuperar() olha o último evento de cada linha:
+#   resultado → reenvia o valor para a planilha (sem tocar o SAP);
+#   envio     → não se sabe se a RC foi criada: a linha recebe um aviso
+#               VERIFICAR e sai dos pendentes, para nunca ser digitada de novo.
+# Se a linha agora mostra outro material, o evento é procurado pelo material
+# entre os pendentes (ver recuperar()) em vez de ser descartado.
+
+ENVIO, RESULTADO, GRAVADO = 'envio', 'resultado', 'gravado'
+
+PREFIXO_VERIFICAR = 'VERIFICAR'
+
+
+class DiarioLotes:
+    """Diário de uma aba. Pode ser usado por várias threads (pool de sessões)."""
+
+    def __init__(self, caminho, aba, logger=None):
+        self.caminho = caminho
+        self.aba = aba
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        # FULL: cada evento chega ao disco antes do Gravar/planilha (custo de ms)
+        self._conexao.execute("PRAGMA synchronous=FULL")
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS eventos ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, aba TEXT NOT NULL, linha INTEGER NOT NULL,"
+            " chave TEXT, tipo TEXT NOT NULL, valores TEXT, momento TEXT NOT NULL)"
+        )
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS ix_eventos_aba_linha ON eventos (aba, linha, id)")
+
+    def _inserir(self, eventos):
+        momento = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            with self._conexao:  # uma transação por chamada
+                self._conexao.executemany(
+                    "INSERT INTO eventos (aba, linha, chave, tipo, valores, momento) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(self.aba, int(linha), chave, tipo, valores, momento) for linha, chave, tipo, valores in eventos],
+                )
+
+    # --- REGISTRO ---
+    def registrar_envio(self, linhas):
+        """linhas: [(linha da planilha, chave)] (chave = material, para conferir na recuperação)."""
+        self._inserir([(linha, str(chave or '').strip(), ENVIO, None) for linha, chave in linhas])
+
+    def registrar_resultado(self, linhas, valores, apenas_enviadas=False):
+        """
+        valores: {nome da coluna: valor} que deve ir para cada linha. Com
+        apenas_enviadas, só as linhas cujo último evento é 'envio' (as que
+        chegaram ao Gravar) recebem o resultado.
+        """
+        linhas = list(linhas)
+        if apenas_enviadas:
+            enviadas = self._enviadas([linha for linha, _ in linhas])
+            linhas = [(linha, chave) for linha, chave in linhas if int(linha) in enviadas]
+        texto = json.dumps(valores, ensure_ascii=False)
+        self._inserir([(linha, str(chave or '').strip(), RESULTADO, texto) for linha, chave in linhas])
+
+    def confirmar(self, linhas):
+        """Linhas cujo resultado já está na planilha."""
+        linhas = sorted(set(int(l) for l in linhas))
+        if linhas:
+            self._inserir([(linha, None, GRAVADO, None) for linha in linhas])
+
+    def confirmar_celulas(self, celulas):
+        """ao_gravar do StatusBuffer: celulas = [(linha, coluna, valor)] já na planilha."""
+        self.confirmar(linha for linha, _, _ in celulas)
+
+    # --- RECUPERAÇÃO ---
+    def _enviadas(self, linhas):
+        """Das linhas dadas, as que têm 'envio' como último evento."""
+        if not linhas:
+            return set()
+        marcadores = ', '.join('?' * len(linhas))
+        with self._lock:
+            cursor = self._conexao.execute(
+                "SELECT e.linha FROM eventos e"
+                f" JOIN (SELECT linha, MAX(id) AS id FROM eventos WHERE aba = ? AND linha IN ({marcadores})"
+                " GROUP BY linha) u ON e.id = u.id WHERE e.tipo = ?",
+                (self.aba, *(int(l) for l in linhas), ENVIO),
+            )
+            return {linha for (linha,) in cursor.fetchall()}
+
+    def _em_aberto(self):
+        with self._lock:
+            cursor = self._conexao.execute(
+                "SELECT e.linha, e.chave, e.tipo, e.valores, e.momento FROM eventos e"
+                " JOIN (SELECT linha, MAX(id) AS id FROM eventos WHERE aba = ? GROUP BY linha) u ON e.id = u.id"
+                " WHERE e.tipo != ?",
+                (self.aba, GRAVADO),
+            )
+            return cursor.fetchall()
+
+    def _mover(self, linha, destinos):
+        """
+        Transfere o evento em aberto da linha para outras linhas (resultado
+        a gravar em cada uma) e dá a linha original por resolvida. Numa só
+        transação: se cair no meio, o evento original continua em aberto.
+        """
+        momento = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            with self._conexao:
+                self._conexao.executemany(
+                    "INSERT INTO eventos (aba, linha, chave, tipo, valores, momento) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(self.aba, int(destino), chave, RESULTADO, json.dumps(valores, ensure_ascii=False), momento)
+                     for destino, chave, valores in destinos]
+                    + [(self.aba, int(linha), None, GRAVADO, None, momento)],
+                )
+
+    def recuperar(self, pendentes, coluna_status='Status'):
+        """
+        pendentes: {linha: chave} das linhas que a planilha ainda mostra
+        como pendentes. Retorna {linha: {coluna: valor}} a gravar na planilha
+        antes de planejar novos lotes; essas linhas devem sair dos pendentes.
+        Linhas que já têm status na planilha são só marcadas como gravadas.
+
+        Se a linha do diário agora mostra outro material (linhas inseridas ou
+        ordenadas entre a queda e o reinício), o evento segue o material: com
+        uma única linha pendente dele, vai para ela; com várias, todas
+        recebem VERIFICAR. Sem nenhuma, o evento fica em aberto para as
+        próximas execuções.
+        """
+        pendentes = {linha: str(chave or '').strip() for linha, chave in pendentes.items()}
+        regravar = {}
+        resolvidas = []
+        deslocados = []
+        for linha, chave, tipo, valores, momento in self._em_aberto():
+            if linha not in pendentes:
+                resolvidas.append(linha)  # a planilha já tem um status para ela
+            elif chave and pendentes[linha] != chave:
+                deslocados.append((linha, chave, tipo, valores, momento))
+            else:
+                regravar[linha] = self._valores_recuperados(chave, tipo, valores, momento, coluna_status)
+
+        for linha, chave, tipo, valores, momento in deslocados:
+            candidatas = [l for l, c in pendentes.items() if c == chave and l not in regravar]
+            self.logger.error(
+                "Diário: linha %s mudou (era %s, agora %s). Último evento '%s' em %s: %s",
+                linha, chave, pendentes[linha], tipo, momento, valores or '-',
+            )
+            if not candidatas:
+                self.logger.error("Diário: Mat %s não está pendente em outra linha; evento mantido em aberto.", chave)
+                continue
+            if len(candidatas) == 1:
+                destinos = {candidatas[0]: self._valores_recuperados(chave, tipo, valores, momento, coluna_status)}
+                self.logger.warning("Diário: evento da linha %s movido para a linha %s (Mat %s).",
+                                    linha, candidatas[0], chave)
+            else:
+                aviso = {
+                    coluna_status: f"{PREFIXO_VERIFICAR}: Mat {chave} enviado em {momento} na antiga linha"
+                                   f" {linha}; linhas mudaram de posição, confira na ME5A antes de reenviar",
+                }
+                destinos = {candidata: aviso for candidata in candidatas}
+                self.logger.warning("Diário: Mat %s em %s linhas pendentes (%s); todas marcadas para verificação.",
+                                    chave, len(candidatas), ', '.join(map(str, candidatas)))
+            self._mover(linha, [(destino, chave, novos) for destino, novos in destinos.items()])
+            regravar.update(destinos)
+
+        self.confirmar(resolvidas)
+        if regravar:
+            self.logger.warning("Diário: %s linha(s) com resultado não gravado na planilha serão recuperadas.",
+                                len(regravar))
+        return regravar
+
+    @staticmethod
+    def _valores_recuperados(chave, tipo, valores, momento, coluna_status):
+        if tipo == RESULTADO:
+            return json.loads(valores)
+        return {
+            coluna_status: f"{PREFIXO_VERIFICAR}: envio interrompido em {momento} (Mat: {chave});"
+                           " confira na ME5A antes de reenviar",
+        }
+
+    def compactar(self):
+        """Apaga o histórico das linhas cujo último evento é 'gravado'."""
+        with self._lock:
+            with self._conexao:
+                self._conexao.execute(
+                    "DELETE FROM eventos WHERE aba = ? AND linha IN ("
+                    " SELECT e.linha FROM eventos e"
+                    " JOIN (SELECT linha, MAX(id) AS id FROM eventos WHERE aba = ? GROUP BY linha) u"
+                    " ON e.id = u.id WHERE e.tipo = ?)",
+                    (self.aba, self.aba, GRAVADO),
+                )
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+
+# ------------------------------------------
+# ITENS DE main.py / criar_rc_consumo.py
+# ------------------------------------------
+# Nesses scripts cada item é o dicionário da linha, com 'sheet_row_index'
+# e a coluna Material como chave de conferência.
+
+def linhas_itens(itens, campo_chave='Material'):
+    """[(linha da planilha, material)] para registrar_envio/registrar_resultado."""
+    return [(item['sheet_row_index'], item.get(campo_chave)) for item in itens]
+
+
+def com_diario(diario, criar):
+    """
+    Envolve criar(itens) → resultado do SAP. O resultado vai para o diário
+    nas linhas que chegaram ao Gravar (registrar_envio feito dentro de criar).
+    """
+    @functools.wraps(criar)
+    def criar_registrando(itens):
+        resultado = criar(itens)
+        diario.registrar_resultado(linhas_itens(itens), {'Status': resultado}, apenas_enviadas=True)
+        return resultado
+    return criar_registrando
+
+
+def recuperar_itens(diario, itens, gravar):
+    """
+    Passa para gravar(linha, coluna, valor) os resultados de execuções
+    interrompidas e devolve os itens que continuam pendentes.
+    """
+    regravar = diario.recuperar({item['sheet_row_index']: item.get('Material') for item in itens})
+    for linha, valores in regravar.items():
+        for coluna, valor in valores.items():
+            gravar(linha, coluna, valor)
+    return [item for item in itens if item['sheet_row_index'] not in regravar]
@@ -0,0 +1,255 @@
+import argparse
+import logging
+import os
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+
+from espera_sap import aguardar_sap, aguardar_controle
+from exportacao_sap import ler_tabela, sem_zeros, importar_selecao_multipla, salvar_lista, voltar_ao_menu
+from rastreamento import span
+
+
+# ==========================================
+# DETECÇÃO DE RCs DUPLICADAS (ME5A / EBAN)
+# ==========================================
+# Antes de abrir a ME51N, as RCs em aberto de todos os materiais pendentes
+# são baixadas de uma vez (ME5A → "Salvar lista em arquivo", não convertido)
+# ou lidas de um arquivo já exportado (ex.: SE16N da EBAN, texto com
+# tabulação). O índice (material, centro) → RCs permite marcar na planilha
+# as linhas que já têm RC em aberto na mesma janela de entrega.
+#
+# Teste offline de um arquivo exportado:
+#   python duplicidade_rc.py export_me5a.txt [--material 90801586]
+
+# --- IDs DA ME5A (tela de seleção RM06BA00 e popups padrão de lista) ---
+ID_ME5A_MATERIAL_MULTIPLO = "wnd[0]/usr/btn%_BA_MATNR_%_APP_%-VALU_PUSH"
+ID_ME5A_CENTRO = "wnd[0]/usr/ctxtBA_WERKS-LOW"
+ID_ME5A_FECHADAS = "wnd[0]/usr/chkP_ERLBA"          # incluir RCs concluídas
+
+# Cabeçalhos aceitos (comparados sem acento, pontuação e espaços)
+COLUNAS = {
+    'rc': ('reqcompra', 'requisicao', 'requisicaodecompra', 'rc', 'purchreq', 'purchaserequisition', 'banfn'),
+    'item': ('item', 'itemrc', 'itemreqc', 'itm', 'bnfpo'),
+    'material': ('material', 'matnr'),
+    'centro': ('cen', 'centro', 'plnt', 'plant', 'werks'),
+    'data': ('dtremessa', 'dataremessa', 'datadeconremessa', 'datadaremessa', 'delivdate', 'deliverydate', 'lfdat'),
+    'quantidade': ('qtdrc', 'qtd', 'quantidade', 'qtdsolicitada', 'quantity', 'qtyrequested', 'menge'),
+    'pedida': ('qtdpedida', 'quantidadepedida', 'quantityordered', 'qtyordered', 'bsmng'),
+    'eliminado': ('elim', 'd', 'codeliminacao', 'deletionindicator', 'loekz'),
+    'fechado': ('fechado', 'concluida', 'closed', 'ebakz'),
+}
+
+
+def _data(texto):
+    texto = str(texto or '').strip()
+    for formato in ('%d.%m.%Y', '%d/%m/%Y', '%Y-%m-%d', '%Y%m%d', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _numero(texto):
+    texto = str(texto or '').strip().replace(' ', '')
+    if not texto:
+        return None
+    if texto.endswith('-'):
+        texto = '-' + texto[:-1]
+    # "1.000,000" (BR) ou "1,000.000" (EN): o último separador é o decimal
+    if ',' in texto and texto.rfind(',') > texto.rfind('.'):
+        texto = texto.replace('.', '').replace(',', '.')
+    else:
+        texto = texto.replace(',', '')
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+
+# ------------------------------------------
+# LEITURA DA EXPORTAÇÃO
+# ------------------------------------------
+def ler_exportacao(caminho):
+    """
+    Lê a lista exportada (ME5A não convertido, com '|', ou EBAN/SE16N com
+    tabulação) e retorna as RCs em aberto: [{'rc', 'item', 'material',
+    'centro', 'data', 'quantidade'}]. Linhas eliminadas, concluídas ou já
+    totalmente pedidas ficam de fora.
+    """
+    registros = []
+    for valores in ler_tabela(caminho, COLUNAS, ('material', 'rc')):
+        if not valores['rc'] or not valores['material']:
+            continue
+        if valores.get('eliminado') or valores.get('fechado'):
+            continue
+        quantidade, pedida = _numero(valores.get('quantidade')), _numero(valores.get('pedida'))
+        if quantidade is not None and pedida is not None and pedida >= quantidade:
+            continue
+        registros.append({
+            'rc': valores['rc'],
+            'item': valores.get('item', ''),
+            'material': sem_zeros(valores['material']),
+            'centro': valores.get('centro', '').upper(),
+            'data': _data(valores.get('data')),
+            'quantidade': quantidade,
+        })
+    return registros
+
+
+class IndiceRequisicoes:
+    """Índice (material, centro) → RCs em aberto."""
+
+    def __init__(self, registros):
+        self._indice = defaultdict(list)
+        for registro in registros:
+            self._indice[(registro['material'], registro['centro'])].append(registro)
+        self.total = len(registros)
+
+    @classmethod
+    def de_arquivo(cls, caminho):
+        return cls(ler_exportacao(caminho))
+
+    def procurar(self, material, centro, data_remessa=None, janela_dias=30):
+        """
+        RC em aberto do material no centro com entrega a até janela_dias da
+        data_remessa ('dd.mm.aaaa' ou date). Sem data, qualquer RC aberta conta.
+        """
+        candidatos = self._indice.get((sem_zeros(material), str(centro).upper()), [])
+        alvo = data_remessa if data_remessa is None or hasattr(data_remessa, 'year') else _data(data_remessa)
+        for registro in candidatos:
+            if alvo is None or registro['data'] is None:
+                return registro
+            if abs((registro['data'] - alvo).days) <= janela_dias:
+                return registro
+        return None
+
+
+def marcar_duplicadas(itens, indice, centro, data_do_item, janela_dias=30, campo_material='Material'):
+    """
+    Separa os itens que já têm RC em aberto. Retorna (livres, duplicados) com
+    duplicados = [(item, mensagem)], no formato de preparar_pendentes().
+    """
+    livres, duplicados = [], []
+    for item in itens:
+        registro = indice.procurar(item.get(campo_material), centro, data_do_item(item), janela_dias)
+        if registro is None:
+            livres.append(item)
+            continue
+        entrega = registro['data'].strftime('%d.%m.%Y') if registro['data'] else '-'
+        duplicados.append((item, f"Duplicidade: RC {registro['rc']}/{registro['item']} em aberto (entrega {entrega})"))
+    return livres, duplicados
+
+
+# ------------------------------------------
+# EXPORTAÇÃO PELA ME5A
+# ------------------------------------------
+def exportar_me5a(session, materiais, centro, pasta=None, timeout=60, logger=None):
+    """
+    Roda a ME5A para todos os materiais de uma vez (seleção múltipla
+    importada de arquivo texto) e salva a lista como arquivo não convertido.
+    Retorna o caminho do arquivo ou None se algo falhar.
+    """
+    logger = logger or logging.getLogger(__name__)
+    pasta = pasta or tempfile.gettempdir()
+    arquivo_lista = 'me5a_abertas.txt'
+
+    try:
+        session.findById("wnd[0]/tbar[0]/okcd").Text = "/NME5A"
+        session.findById("wnd[0]").sendVKey(0)
+        if not aguardar_controle(session, ID_ME5A_CENTRO, timeout):
+            logger.warning("ME5A: tela de seleção não abriu.")
+            return None
+
+        importar_selecao_multipla(session, ID_ME5A_MATERIAL_MULTIPLO, materiais, pasta, 'me5a_materiais.txt')
+        session.findById(ID_ME5A_CENTRO).Text = centro
+        try:
+            session.findById(ID_ME5A_FECHADAS).Selected = False
+        except Exception:
+            pass
+        session.findById("wnd[0]/tbar[1]/btn[8]").press()  # Executar (F8)
+        if not aguardar_sap(session, timeout):
+            return None
+
+        if session.findById(ID_ME5A_CENTRO, False) is not None:
+            # A lista não abriu e a ME5A ficou na tela de seleção. Mensagem
+            # de erro é falha; aviso/informação é seleção vazia (nenhuma RC
+            # em aberto), sem depender do idioma do texto
+            sbar = session.findById("wnd[0]/sbar")
+            if sbar.MessageType in ('E', 'A'):
+                logger.warning("ME5A: %s", sbar.Text)
+                return None
+            with open(os.path.join(pasta, arquivo_lista), 'w', encoding='utf-8') as f:
+                f.write("|Req.compra|Item|Material|Cen.|Dt.remessa|\n")
+            return os.path.join(pasta, arquivo_lista)
+
+        return salvar_lista(session, pasta, arquivo_lista, timeout=timeout)
+    except Exception as e:
+        logger.warning("ME5A: exportação falhou (%s).", e)
+        return None
+    finally:
+        voltar_ao_menu(session)
+
+
+def obter_indice(session, materiais, centro, arquivo=None, pasta=None, logger=None):
+    """
+    Índice das RCs em aberto: de arquivo (se informado e existente) ou de uma
+    exportação da ME5A feita agora. None se não foi possível obter.
+    """
+    logger = logger or logging.getLogger(__name__)
+    if arquivo and os.path.exists(arquivo):
+        caminho = arquivo
+    else:
+        caminho = exportar_me5a(session, materiais, centro, pasta=pasta, logger=logger)
+    if not caminho:
+        return None
+    try:
+        indice = IndiceRequisicoes.de_arquivo(caminho)
+    except Exception as e:
+        logger.warning("Não foi possível ler a lista de RCs em aberto (%s): %s", caminho, e)
+        return None
+    logger.info("RCs em aberto indexadas: %s (arquivo %s).", indice.total, caminho)
+    return indice
+
+
+def verificar_duplicidade(session, itens, centro, data_do_item, janela_dias=30, arquivo=None,
+                          campo_material='_material', logger=None):
+    """
+    Uma exportação da ME5A para todos os materiais pendentes; linhas com RC
+    em aberto no centro e na janela de entrega saem como rejeitadas.
+    Retorna (livres, duplicados); sem a lista de RCs, segue sem verificar.
+    """
+    logger = logger or logging.getLogger(__name__)
+    if not itens:
+        return itens, []
+    with span('duplicidade', itens=len(itens)):
+        indice = obter_indice(session, [item[campo_material] for item in itens], centro,
+                              arquivo=arquivo, logger=logger)
+    if indice is None:
+        logger.warning("Verificação de duplicidade não realizada; seguindo sem ela.")
+        return itens, []
+    livres, duplicados = marcar_duplicadas(itens, indice, centro, data_do_item, janela_dias, campo_material)
+    if duplicados:
+        logger.info("Duplicidade: %s linha(s) já têm RC em aberto.", len(duplicados))
+    return livres, duplicados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lê uma exportação da ME5A/EBAN e mostra as RCs em aberto.")
+    parser.add_argument('arquivo')
+    parser.add_argument('--material', help="Mostra só as RCs deste material")
+    parser.add_argument('--centro', default='BR8E')
+    parser.add_argument('--data', help="Data de remessa (dd.mm.aaaa) para testar a janela")
+    parser.add_argument('--janela', type=int, default=30)
+    args = parser.parse_args()
+
+    registros = ler_exportacao(args.arquivo)
+    print(f"{len(registros)} item(ns) de RC em aberto.")
+    if args.material:
+        indice = IndiceRequisicoes(registros)
+        achado = indice.procurar(args.material, args.centro, args.data, args.janela)
+        print(f"Duplicidade: {achado}" if achado else "Nenhuma RC em aberto na janela.")
+    else:
+        for registro in registros[:50]:
+            print(registro)
@@ -0,0 +1,101 @@
+import logging
+import time
+
+import rastreamento
+
+logger = logging.getLogger(__name__)
+
+# Backoff do polling: começa curto (a maioria dos passos termina em poucos
+# ms) e dobra até o teto, para não martelar o SAP GUI em saves longos
+INTERVALO_INICIAL = 0.05
+INTERVALO_MAXIMO = 0.5
+
+ID_POPUP = "wnd[1]"
+ID_BOTAO_POPUP_OK = "wnd[1]/tbar[0]/btn[0]"
+
+
+def aguardar_condicao(condicao, timeout, deve_continuar=None):
+    """Chama condicao() com backoff até ela retornar algo verdadeiro ou estourar o timeout."""
+    with rastreamento.span('aguardar', tipo='espera'):
+        return _aguardar_condicao(condicao, timeout, deve_continuar)
+
+
+def _aguardar_condicao(condicao, timeout, deve_continuar):
+    inicio = time.monotonic()
+    intervalo = INTERVALO_INICIAL
+    while True:
+        resultado = condicao()
+        if resultado:
+            return resultado
+        if deve_continuar is not None and not deve_continuar():
+            return None
+        if time.monotonic() - inicio > timeout:
+            return None
+        time.sleep(intervalo)
+        intervalo = min(intervalo * 2, INTERVALO_MAXIMO)
+
+
+def aguardar_sap(session, timeout=30, deve_continuar=None, avisar=None):
+    """
+    Espera a sessão sair de Busy. Retorna True quando o SAP está livre,
+    False em timeout, cancelamento (deve_continuar() falso) ou sessão caída.
+    avisar recebe a mensagem de timeout (padrão: logger.warning).
+    """
+    if session is None:
+        return False
+    estado = {'erro': False}
+
+    def livre():
+        try:
+            return not session.Busy
+        except Exception:
+            estado['erro'] = True
+            return True
+
+    ok = aguardar_condicao(livre, timeout, deve_continuar)
+    if ok and not estado['erro']:
+        return True
+    if not ok and not estado['erro'] and (deve_continuar is None or deve_continuar()):
+        (avisar or logger.warning)(f"Timeout ao aguardar SAP após {timeout} segundos")
+    return False
+
+
+def aguardar_controle(session, id_controle, timeout=10, deve_continuar=None):
+    """
+    Espera o SAP ficar livre e o controle existir na tela. Retorna o
+    controle (já resolvido pelo findById) ou None.
+    """
+    def buscar():
+        try:
+            if session.Busy:
+                return None
+            return session.findById(id_controle, False)
+        except Exception:
+            return None
+
+    return aguardar_condicao(buscar, timeout, deve_continuar)
+
+
+def fechar_popup(session, id_botao=ID_BOTAO_POPUP_OK, timeout=10, alternativas=()):
+    """
+    Após o SAP terminar de processar, confirma o popup (wnd[1]) se houver.
+    Com o SAP livre a janela já existe ou não vai existir, então não há
+    espera fixa. Tenta id_botao e depois cada id em alternativas.
+    Retorna True se um popup foi confirmado.
+    """
+    if not aguardar_sap(session, timeout):
+        return False
+    try:
+        if not session.findById(ID_POPUP, False):
+            return False
+    except Exception:
+        return False
+
+    for id_b in (id_botao,) + tuple(alternativas):
+        try:
+            session.findById(id_b).press()
+            aguardar_sap(session, timeout)
+            return True
+        except Exception:
+            continue
+    return False
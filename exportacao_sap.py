@@ -0,0 +1,131 @@
+import os
+import re
+import unicodedata
+
+from espera_sap import aguardar_sap
+
+
+# ==========================================
+# EXPORTAÇÕES DE RELATÓRIOS SAP (ARQUIVO LOCAL)
+# ==========================================
+# Partes comuns às pré-verificações em massa (ME5A, COOIS): importar uma
+# seleção múltipla de um arquivo texto, salvar a lista como arquivo "não
+# convertido" e ler esse arquivo (ou um download da SE16N, com tabulação)
+# sem depender do SAP, para poder testar com um arquivo de exemplo.
+
+ID_SELECAO_IMPORTAR_ARQUIVO = "wnd[1]/tbar[0]/btn[23]"
+ID_SELECAO_CONFIRMAR = "wnd[1]/tbar[0]/btn[8]"
+ID_LISTA_NAO_CONVERTIDO = "wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[0,0]"
+
+
+def normalizar_cabecalho(texto):
+    """'Dt.remessa' → 'dtremessa' (sem acento, pontuação e espaços)."""
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]', '', texto.lower())
+
+
+def sem_zeros(numero):
+    """SAP exporta com zeros à esquerda (000000000090801586 → 90801586)."""
+    numero = str(numero or '').strip()
+    return numero.lstrip('0') or numero
+
+
+def ler_texto(caminho):
+    with open(caminho, 'rb') as f:
+        bruto = f.read()
+    if bruto.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return bruto.decode('utf-16')
+    for codificacao in ('utf-8-sig', 'cp1252'):
+        try:
+            return bruto.decode(codificacao)
+        except UnicodeDecodeError:
+            continue
+    return bruto.decode('latin-1')
+
+
+def ler_tabela(caminho, colunas, obrigatorias):
+    """
+    Lê uma lista exportada (não convertida, com '|', ou texto com tabulação)
+    e retorna [{campo: texto}] para os campos de colunas ({campo: nomes de
+    cabeçalho aceitos, já normalizados}). O cabeçalho é a primeira linha que
+    tem todos os campos obrigatorias; títulos, traços e cabeçalhos repetidos
+    a cada página são ignorados.
+    """
+    linhas = ler_texto(caminho).splitlines()
+    separador = '|' if sum('|' in l for l in linhas) >= sum('\t' in l for l in linhas) else '\t'
+
+    posicoes = None
+    registros = []
+    for linha in linhas:
+        if separador not in linha or set(linha.strip()) <= set('-|'):
+            continue
+        if separador == '|':
+            celulas = [c.strip() for c in linha.strip().strip('|').split('|')]
+        else:
+            celulas = [c.strip() for c in linha.split('\t')]
+        normalizados = [normalizar_cabecalho(c) for c in celulas]
+
+        if posicoes is None:
+            encontrados = {}
+            for campo, nomes in colunas.items():
+                for i, nome in enumerate(normalizados):
+                    if nome in nomes and i not in encontrados.values():
+                        encontrados[campo] = i
+                        break
+            if all(campo in encontrados for campo in obrigatorias):
+                posicoes = encontrados
+            continue
+
+        primeira = posicoes[obrigatorias[0]]
+        if primeira < len(normalizados) and normalizados[primeira] in colunas[obrigatorias[0]]:
+            continue  # cabeçalho repetido
+        registros.append({campo: celulas[i] if i < len(celulas) else '' for campo, i in posicoes.items()})
+
+    if posicoes is None:
+        raise ValueError(f"Cabeçalho com {', '.join(obrigatorias)} não encontrado em {caminho}")
+    return registros
+
+
+# ------------------------------------------
+# PASSOS NO SAP GUI
+# ------------------------------------------
+def importar_selecao_multipla(session, id_botao, valores, pasta, arquivo):
+    """Preenche a seleção múltipla de um campo importando um arquivo texto."""
+    with open(os.path.join(pasta, arquivo), 'w', encoding='cp1252') as f:
+        f.write("\r\n".join(sorted({str(v).strip() for v in valores if str(v).strip()})))
+    session.findById(id_botao).press()
+    session.findById(ID_SELECAO_IMPORTAR_ARQUIVO).press()
+    session.findById("wnd[2]/usr/ctxtDY_PATH").Text = pasta
+    session.findById("wnd[2]/usr/ctxtDY_FILENAME").Text = arquivo
+    session.findById("wnd[2]/tbar[0]/btn[0]").press()
+    session.findById(ID_SELECAO_CONFIRMAR).press()
+
+
+def salvar_lista(session, pasta, arquivo, id_grid=None, timeout=60):
+    """
+    Salva o resultado do relatório como arquivo local não convertido: pela
+    exportação do ALV (id_grid) ou, em listas clássicas, pelo comando %PC.
+    Retorna o caminho do arquivo.
+    """
+    if id_grid:
+        grid = session.findById(id_grid)
+        grid.pressToolbarContextButton("&MB_EXPORT")
+        grid.selectContextMenuItem("&PC")
+    else:
+        session.findById("wnd[0]/tbar[0]/okcd").Text = "%PC"
+        session.findById("wnd[0]").sendVKey(0)
+    session.findById(ID_LISTA_NAO_CONVERTIDO).Select()
+    session.findById("wnd[1]/tbar[0]/btn[0]").press()
+    session.findById("wnd[1]/usr/ctxtDY_PATH").Text = pasta
+    session.findById("wnd[1]/usr/ctxtDY_FILENAME").Text = arquivo
+    session.findById("wnd[1]/tbar[0]/btn[11]").press()  # Substituir
+    aguardar_sap(session, timeout)
+    return os.path.join(pasta, arquivo)
+
+
+def voltar_ao_menu(session):
+    try:
+        session.findById("wnd[0]/tbar[0]/okcd").Text = "/N"
+        session.findById("wnd[0]").sendVKey(0)
+    except Exception:
+        pass
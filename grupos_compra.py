@@ -0,0 +1,55 @@
+import logging
+
+
+# ==========================================
+# GRUPO DE COMPRAS POR EXECUÇÃO OU POR LINHA
+# ==========================================
+# Usado pelos scripts da ME51N (automacao_me51n.py). O grupo vem da pergunta inicial,
+# de --grupo/FC_GRUPO ('P04', '4', 'MRP' ou 'coluna') ou, linha a linha, da
+# coluna Grupo da planilha. opcoes é o Config.OPCOES_GRUPO do script
+# ({'1': {'codigo': 'P01', 'desc': ...}, ..., '0': sair}).
+
+def resolver_grupo(valor, opcoes):
+    """'P04', '4' ou 'MRP' → item de opcoes; None se não reconhecer."""
+    valor = str(valor or '').strip().upper()
+    for chave, info in opcoes.items():
+        if chave != '0' and valor in (chave, info['codigo'].upper(), info['desc'].upper()):
+            return info
+    return None
+
+
+def definir_grupo(grupo, opcoes, coluna_grupo='Grupo', logger=None):
+    """
+    Grupo vindo da linha de comando/FC_GRUPO (sem input()). Retorna
+    (codigo, descricao); 'coluna' → (None, None), grupo só pela coluna.
+    ValueError se o grupo não for reconhecido.
+    """
+    logger = logger or logging.getLogger(__name__)
+    if str(grupo).strip().lower() == 'coluna':
+        logger.info(" Grupo: por linha (coluna '%s').", coluna_grupo)
+        return None, None
+    selecao = resolver_grupo(grupo, opcoes)
+    if selecao is None:
+        raise ValueError(f"Grupo inválido: {grupo}")
+    logger.info(" Grupo selecionado: %s (%s)", selecao['codigo'], selecao['desc'])
+    return selecao['codigo'], selecao['desc']
+
+
+def atribuir_grupos(itens, opcoes, coluna_grupo='Grupo', grupo_padrao=None):
+    """
+    Marca '_grupo' em cada item: coluna Grupo da linha ou, vazia, o grupo
+    da execução. Retorna (validos, rejeitados) como preparar_pendentes().
+    """
+    chave_grupo = coluna_grupo.lower()
+    validos, rejeitados = [], []
+    for item in itens:
+        valor = next((str(v).strip() for k, v in item.items() if str(k).strip().lower() == chave_grupo), '')
+        selecao = resolver_grupo(valor, opcoes) if valor else None
+        if valor and selecao is None:
+            rejeitados.append((item, f"Erro Validação: Grupo inválido ('{valor}')"))
+        elif selecao is None and not grupo_padrao:
+            rejeitados.append((item, "Erro Validação: Grupo de compras vazio"))
+        else:
+            item['_grupo'] = selecao['codigo'] if selecao else grupo_padrao
+            validos.append(item)
+    return validos, rejeitados
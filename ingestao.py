@@ -0,0 +1,95 @@
+import logging
+from datetime import datetime
+
+
+# ==========================================
+# INGESTÃO COLUNAR E PRÉ-VALIDAÇÃO LOCAL
+# ==========================================
+# Normaliza todos os pendentes de uma vez, coluna por coluna, antes de abrir
+# a ME51N: números no formato BR ("1.234,56", "R$ 0,27") viram float e a
+# string SAP ("1234,56"), LT vira data de remessa. Linhas que não passam nas
+# regras locais voltam como rejeitadas para irem direto para a planilha.
+#
+# Campos acrescentados em cada item válido:
+#   _material, _qtd, _preco (strings prontas para o grid), _valor (float do
+#   preço, usado no planejamento dos lotes) e _data_remessa (se houver LT).
+#
+# pandas só é importado na primeira chamada, não na carga dos scripts.
+
+def _numero_br(serie):
+    """Série de textos BR → float (NaN onde não converte)."""
+    import pandas as pd
+    texto = serie.fillna('').astype(str).str.replace(r'R\$|\$', '', regex=True).str.strip()
+    # Ponto só é milhar quando também há vírgula ("1.000,00"); sozinho é decimal
+    milhar = texto.str.contains(',', regex=False) & texto.str.contains('.', regex=False)
+    texto = texto.where(~milhar, texto.str.replace('.', '', regex=False))
+    return pd.to_numeric(texto.str.replace(',', '.', regex=False), errors='coerce')
+
+
+def _formatar_sap(numeros):
+    """float → '1234,56' (duas casas, vírgula decimal)."""
+    return numeros.map('{:.2f}'.format).str.replace('.', ',', regex=False)
+
+
+def preparar_pendentes(itens, coluna_material='Material', coluna_qtd='Qtd', coluna_preco='Preço',
+                       coluna_lt=None, dias_lt_padrao=0, hoje=None, logger=None):
+    """
+    Retorna (validos, rejeitados); rejeitados = [(item, mensagem)].
+
+    Regras locais: material preenchido, quantidade numérica > 0 e preço
+    numérico (preço vazio continua valendo 0,00, como no envio antigo).
+    LT vazio ou inválido usa dias_lt_padrao.
+    """
+    logger = logger or logging.getLogger(__name__)
+    if not itens:
+        return [], []
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(itens)
+    for coluna in (coluna_material, coluna_qtd, coluna_preco):
+        if coluna not in df:
+            df[coluna] = ''
+
+    material = df[coluna_material].fillna('').astype(str).str.strip()
+    qtd = _numero_br(df[coluna_qtd])
+    preco_vazio = df[coluna_preco].fillna('').astype(str).str.strip() == ''
+    preco = _numero_br(df[coluna_preco]).where(~preco_vazio, 0.0)
+
+    motivo = pd.Series('', index=df.index)
+    motivo = motivo.mask(preco.isna(), 'Preço inválido')
+    motivo = motivo.mask(qtd.isna() | (qtd <= 0), 'Qtd inválida')
+    motivo = motivo.mask(material == '', 'Material vazio')
+
+    colunas = {
+        '_material': material,
+        '_qtd': _formatar_sap(qtd.fillna(0)),
+        '_preco': _formatar_sap(preco.fillna(0)),
+        '_valor': preco.fillna(0.0),
+    }
+    if coluna_lt:
+        lt = df[coluna_lt] if coluna_lt in df else pd.Series('', index=df.index)
+        dias = pd.to_numeric(lt.fillna('').astype(str).str.strip(), errors='coerce')
+        dias = dias.fillna(dias_lt_padrao).astype(int)
+        base = pd.Timestamp((hoje or datetime.now()).date())
+        colunas['_data_remessa'] = (base + pd.to_timedelta(dias, unit='D')).dt.strftime('%d.%m.%Y')
+
+    # Volta para listas Python uma vez só (evita .loc por linha)
+    normalizados = {nome: serie.tolist() for nome, serie in colunas.items()}
+    motivos = motivo.tolist()
+    brutos = {coluna_qtd: df[coluna_qtd].tolist(), coluna_preco: df[coluna_preco].tolist()}
+
+    validos, rejeitados = [], []
+    for pos, item in enumerate(itens):
+        if motivos[pos]:
+            coluna = coluna_qtd if motivos[pos].startswith('Qtd') else coluna_preco
+            detalhe = f" ('{brutos[coluna][pos]}')" if not motivos[pos].startswith('Material') else ''
+            rejeitados.append((item, f"Erro Validação: {motivos[pos]}{detalhe}"))
+            continue
+        item = dict(item)
+        for nome, valores in normalizados.items():
+            item[nome] = valores[pos]
+        validos.append(item)
+
+    if rejeitados:
+        logger.info("Pré-validação local: %s linha(s) rejeitada(s) antes do SAP.", len(rejeitados))
+    return validos, rejeitados
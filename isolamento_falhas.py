@@ -0,0 +1,113 @@
+import logging
+import re
+import threading
+
+
+class OrcamentoTransacoes:
+    """Limite de transações extras (retentativas) por execução, seguro entre threads."""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self.usadas = 0
+        self._lock = threading.Lock()
+
+    def consumir(self):
+        with self._lock:
+            if self.usadas >= self.maximo:
+                return False
+            self.usadas += 1
+            return True
+
+    @property
+    def restantes(self):
+        return max(0, self.maximo - self.usadas)
+
+
+# Ex.: "Item 00020: ...", "Item 20 ...", "Posição 00030", "Pos. 10"
+_RE_ITEM = re.compile(r'\b(?:item|posi[cç][aã]o|pos\.?)\s*0*(\d{1,5})\b', re.IGNORECASE)
+
+
+def localizar_item_com_erro(mensagem, itens, campo_material='Material'):
+    """
+    Tenta descobrir, pela mensagem do SAP, qual item do lote causou o erro.
+    Retorna o índice no lote ou None.
+
+    1. Material citado na mensagem (se só um item do lote bater).
+    2. Número do item (ME51N numera 10, 20, 30... na ordem do grid).
+    """
+    if not mensagem:
+        return None
+
+    candidatos = []
+    for i, item in enumerate(itens):
+        material = str(item.get(campo_material, '')).strip()
+        # SAP pode exibir o material com ou sem zeros à esquerda
+        nucleo = material.lstrip('0') or material
+        if nucleo and re.search(r'\b0*' + re.escape(nucleo) + r'\b', mensagem):
+            candidatos.append(i)
+    if len(candidatos) == 1:
+        return candidatos[0]
+
+    m = _RE_ITEM.search(mensagem)
+    if m:
+        numero = int(m.group(1))
+        if numero % 10 == 0 and 0 < numero // 10 <= len(itens):
+            return numero // 10 - 1
+    return None
+
+
+# ==========================================
+# ISOLAMENTO DE FALHAS DE LOTE
+# ==========================================
+class IsoladorFalhas:
+    """
+    Quando um lote falha, isola os itens problemáticos sem recriar todos
+    um a um:
+
+    - se a mensagem do SAP aponta o item (material ou número da posição),
+      só ele é descartado e o restante é reenviado em um único documento;
+    - senão o lote é dividido ao meio e cada metade é reenviada (bissecção).
+
+    Cada reenvio consome uma unidade do OrcamentoTransacoes da execução.
+    Sem orçamento, os itens restantes ficam com a mensagem da última falha.
+    """
+
+    def __init__(self, criar, sucesso, orcamento, localizar=localizar_item_com_erro, logger=None):
+        self.criar = criar
+        self.sucesso = sucesso
+        self.orcamento = orcamento
+        self.localizar = localizar
+        self.logger = logger or logging.getLogger(__name__)
+
+    def processar(self, itens):
+        """Retorna [(item, resultado)] para todos os itens do lote."""
+        resultado = self.criar(itens)
+        if self.sucesso(resultado):
+            return [(item, resultado) for item in itens]
+        return self._isolar(itens, resultado)
+
+    def _isolar(self, itens, resultado):
+        if len(itens) == 1:
+            return [(itens[0], resultado)]
+
+        idx = self.localizar(resultado, itens) if self.localizar else None
+        if idx is not None:
+            self.logger.info("   -> Item %s apontado pelo SAP como causa; reenviando os demais.", idx + 1)
+            resto = itens[:idx] + itens[idx + 1:]
+            return [(itens[idx], resultado)] + self._tentar(resto, resultado)
+
+        meio = len(itens) // 2
+        self.logger.info("   -> Dividindo lote com falha em %s + %s itens.", meio, len(itens) - meio)
+        return self._tentar(itens[:meio], resultado) + self._tentar(itens[meio:], resultado)
+
+    def _tentar(self, itens, resultado_anterior):
+        if not self.orcamento.consumir():
+            self.logger.warning(
+                "   -> Limite de transações extras atingido; %s item(ns) ficam com o erro do lote.", len(itens)
+            )
+            return [(item, resultado_anterior) for item in itens]
+
+        resultado = self.criar(itens)
+        if self.sucesso(resultado):
+            return [(item, resultado) for item in itens]
+        return self._isolar(itens, resultado)
@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+
+
+def status_pendente(status):
+    """Mesma regra usada nos scripts: Status vazio ou contendo 'NAO'."""
+    status = str(status).strip()
+    return status == '' or 'NAO' in status.upper()
+
+
+def linha_pendente(valor_a, status, filtro=status_pendente):
+    """
+    Linha a processar: coluna A preenchida e Status pendente pelo filtro.
+    Mesma regra no LeitorPendentes e no orquestrador (ler_pendentes), para
+    o orquestrador pré-carregar inteira toda linha que os robôs vão ler.
+    """
+    return bool(str(valor_a).strip()) and filtro(status)
+
+
+def _letra_coluna(col_idx):
+    from gspread.utils import rowcol_to_a1
+    return rowcol_to_a1(1, col_idx)[:-1]
+
+
+# ==========================================
+# LEITURA INCREMENTAL DE LINHAS PENDENTES
+# ==========================================
+class LeitorPendentes:
+    """
+    Substitui o get_all_values() da aba inteira por uma leitura em duas etapas:
+
+    1. Baixa só a coluna A e a coluna Status e calcula as faixas de linhas
+       pendentes (linha_pendente: A preenchida e Status pelo filtro).
+    2. Baixa apenas essas faixas com um único batch_get.
+
+    O snapshot local guarda o resultado da última leitura junto com o
+    modifiedTime da planilha no Drive (get_lastUpdateTime, uma chamada leve).
+    Se a planilha não mudou desde então, ler() devolve os pendentes do
+    snapshot sem nenhuma leitura da aba. O snapshot fica em memória e, se
+    snapshot_path for informado, também em disco.
+    """
+
+    # Linhas concluídas entre duas pendentes que ainda compensa baixar junto
+    # para economizar faixas no batch_get
+    MAX_BURACO = 5
+    # Limite de faixas por chamada (a API usa GET e a URL tem tamanho máximo)
+    MAX_FAIXAS_POR_CHAMADA = 100
+
+    def __init__(self, worksheet, coluna_status='Status', snapshot_path=None,
+                 filtro=status_pendente, logger=None):
+        self.worksheet = worksheet
+        self.coluna_status = coluna_status
+        self.snapshot_path = snapshot_path
+        self.filtro = filtro
+        self.logger = logger or logging.getLogger(__name__)
+        self.headers = []
+        self._col_status = None
+        self._snapshot = {}
+        self._carregar_snapshot()
+
+    # --- SNAPSHOT ---
+    def _carregar_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            if dados.get('aba') == self.worksheet.title:
+                self._snapshot = dados
+        except Exception as e:
+            self.logger.warning("Snapshot local ignorado (%s): %s", self.snapshot_path, e)
+
+    def _salvar_snapshot(self, versao, headers, itens):
+        self._snapshot = {'aba': self.worksheet.title, 'versao': versao, 'headers': headers, 'itens': itens}
+        if not self.snapshot_path:
+            return
+        try:
+            tmp = self.snapshot_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._snapshot, f, ensure_ascii=False)
+            os.replace(tmp, self.snapshot_path)
+        except Exception as e:
+            self.logger.warning("Não foi possível gravar o snapshot local: %s", e)
+
+    def _versao(self):
+        """modifiedTime da planilha, ou None se não der para consultar (sem atalho)."""
+        planilha = getattr(self.worksheet, 'spreadsheet', None)
+        if planilha is None:
+            return None
+        try:
+            return planilha.get_lastUpdateTime()
+        except Exception as e:
+            self.logger.warning("modifiedTime da planilha indisponível; leitura completa: %s", e)
+            return None
+
+    # --- LEITURA ---
+    def _indice_status(self):
+        alvo = self.coluna_status.lower()
+        for i, h in enumerate(self.headers):
+            if h.strip().lower() == alvo:
+                return i + 1
+        return None
+
+    def _faixas(self, linhas):
+        """Agrupa linhas ordenadas em faixas contíguas (tolerando buracos pequenos)."""
+        faixas = []
+        for linha in linhas:
+            if faixas and linha - faixas[-1][1] <= self.MAX_BURACO + 1:
+                faixas[-1][1] = linha
+            else:
+                faixas.append([linha, linha])
+        return faixas
+
+    def linhas_pendentes(self):
+        """Retorna (headers, lista de números de linha pendentes) sem baixar a aba."""
+        self.headers = self.worksheet.row_values(1)
+        if not self.headers:
+            return [], []
+
+        col_status = self._col_status = self._indice_status()
+        if col_status is None:
+            # Sem coluna Status toda linha com coluna A é pendente
+            coluna_a = self.worksheet.col_values(1)
+            return self.headers, [i for i, valor in enumerate(coluna_a[1:], start=2) if str(valor).strip()]
+
+        letra = _letra_coluna(col_status)
+        col_a, col_st = self.worksheet.batch_get(["A2:A", f"{letra}2:{letra}"])
+        total = max(len(col_a), len(col_st))
+
+        pendentes = []
+        for i in range(total):
+            valor_a = col_a[i][0] if i < len(col_a) and col_a[i] else ''
+            status = col_st[i][0] if i < len(col_st) and col_st[i] else ''
+            if linha_pendente(valor_a, status, self.filtro):
+                pendentes.append(i + 2)
+        return self.headers, pendentes
+
+    def ler(self):
+        """
+        Retorna (headers, itens) onde cada item é o dicionário da linha com
+        'sheet_row_index', no mesmo formato que run() montava antes.
+        """
+        # A versão é consultada antes de ler: uma edição feita durante a
+        # leitura muda o modifiedTime e força a leitura completa na próxima
+        versao = self._versao()
+        if versao is not None and versao == self._snapshot.get('versao') and self._snapshot.get('headers'):
+            self.headers = self._snapshot['headers']
+            itens = [dict(item) for item in self._snapshot.get('itens', [])]
+            self.logger.info("Planilha sem alterações desde a última leitura: %s pendente(s) do snapshot local.",
+                             len(itens))
+            return self.headers, itens
+
+        headers, itens = self._ler_da_aba()
+        self._salvar_snapshot(versao, headers, itens)
+        return headers, [dict(item) for item in itens]
+
+    def _ler_da_aba(self):
+        headers, pendentes = self.linhas_pendentes()
+        if not pendentes:
+            return headers, []
+
+        ultima_coluna = _letra_coluna(len(headers))
+        faixas = self._faixas(pendentes)
+        self.logger.info(
+            "Leitura incremental: %s linha(s) pendente(s) em %s faixa(s).", len(pendentes), len(faixas)
+        )
+
+        linhas_brutas = {}
+        for ini in range(0, len(faixas), self.MAX_FAIXAS_POR_CHAMADA):
+            bloco = faixas[ini:ini + self.MAX_FAIXAS_POR_CHAMADA]
+            ranges = [f"A{a}:{ultima_coluna}{b}" for a, b in bloco]
+            valores = self.worksheet.batch_get(ranges)
+            for (a, b), faixa_vals in zip(bloco, valores):
+                for offset in range(b - a + 1):
+                    linhas_brutas[a + offset] = faixa_vals[offset] if offset < len(faixa_vals) else []
+
+        chave_status = headers[self._col_status - 1] if self._col_status else None
+        itens = []
+        for linha in pendentes:
+            row_vals = [str(v) for v in linhas_brutas.get(linha, [])]
+            row_vals += [''] * (len(headers) - len(row_vals))
+            row_dict = {header: row_vals[i] for i, header in enumerate(headers)}
+
+            # Faixas incluem linhas vizinhas e o Status pode ter mudado entre as
+            # duas leituras; confirma a pendência com a linha completa
+            status = row_dict.get(chave_status, '') if chave_status else ''
+            if not linha_pendente(row_vals[0] if row_vals else '', status, self.filtro):
+                continue
+            row_dict['sheet_row_index'] = linha
+            itens.append(row_dict)
+        return headers, itens
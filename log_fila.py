@@ -0,0 +1,80 @@
+import atexit
+import json
+import logging
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+# ==========================================
+# LOG EM FILA (THREAD DE ESCRITA SEPARADA)
+# ==========================================
+# O logger só enfileira o registro (QueueHandler); formatação e escrita em
+# console/arquivo acontecem na thread do QueueListener, fora do caminho entre
+# um passo e outro do SAP. O arquivo é rotativo como o fc_planning.log do
+# automacao_me51n.py (setup_logging) e pode ter uma cópia em JSON lines.
+#
+# Campos estruturados vão em extra={'campos': {...}} (ex.: lote, item,
+# material, rc) e aparecem como chaves próprias no JSON.
+
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 5
+
+_listeners = {}
+
+
+class FormatoJSON(logging.Formatter):
+    """Uma linha JSON por registro: momento, nivel, tipo, mensagem + campos."""
+
+    def format(self, record):
+        registro = {
+            'momento': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'tipo': getattr(record, 'estilo', None) or record.levelname.lower(),
+            'mensagem': record.getMessage().strip(),
+        }
+        registro.update(getattr(record, 'campos', None) or {})
+        if record.exc_info:
+            registro['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+def arquivo_rotativo(caminho, formatter):
+    handler = RotatingFileHandler(caminho, maxBytes=MAX_BYTES, backupCount=BACKUPS, encoding='utf-8')
+    handler.setFormatter(formatter)
+    return handler
+
+
+def iniciar_log_em_fila(logger, handlers):
+    """
+    Liga logger a uma fila servida por um QueueListener com os handlers
+    dados. Chamado de novo para o mesmo logger, troca os handlers (o
+    listener anterior é parado depois de esvaziar a fila).
+    """
+    parar_log_em_fila(logger)
+    fila = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(fila))
+    logger.propagate = False
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    listener = QueueListener(fila, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners[logger.name] = listener
+    return listener
+
+
+def parar_log_em_fila(logger):
+    """Esvazia a fila, para a thread e fecha os arquivos."""
+    listener = _listeners.pop(logger.name, None)
+    for handler in [h for h in logger.handlers if isinstance(h, QueueHandler)]:
+        logger.removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+@atexit.register
+def _parar_todos():
+    for nome in list(_listeners):
+        parar_log_em_fila(logging.getLogger(nome))
@@ -0,0 +1,444 @@
+import argparse
+import logging
+import os
+
+from sap_conexao import obter_sapgui
+from pool_sessoes import PoolSessoesSAP
+from leitura_incremental import linha_pendente
+from rastreamento import span, dormir, instrumentar_sessao
+from cliente_planilhas import com_cota, conectar_google, em_segundo_plano
+
+# ==========================================
+# CONFIGURAÇÕES DO ORQUESTRADOR
+# ==========================================
+class Config:
+    GOOGLE_CREDENTIALS_FILE = 'credentials.json'
+    SHEET_NAME = 'MAPEAMENTO PLANNING'
+    # ID da planilha (trecho da URL entre /d/ e /edit). Com ele a abertura é
+    # direta; sem ele cai no open() por nome, que faz uma busca no Drive.
+    CHAVE_PLANILHA = os.getenv('FC_PLANILHA_KEY', '')
+
+    # Aba → robô que processa; executadas nesta ordem
+    TAREFAS = {
+        'BD GERAL': 'main',
+        'DANTAS': 'consumo',
+        'REQ INTERNA': 'transferencia',
+        'CANCELAR OF': 'ofs',
+    }
+
+    # --- SESSÕES SAP EM PARALELO (pool único para todas as abas ME51N) ---
+    SESSOES_PARALELAS = 1
+
+    # --- MODO VIGIA (segundos entre consultas ao modifiedTime do Drive) ---
+    INTERVALO_VIGIA = 60
+    INTERVALO_VIGIA_MAX = 900   # teto do backoff enquanto nada muda
+
+
+# ==========================================
+# ABA PRÉ-CARREGADA
+# ==========================================
+class AbaPreCarregada:
+    """
+    Aba do gspread cujas leituras (row_values, col_values, batch_get,
+    get_all_values, get_all_records) são servidas dos valores baixados no
+    batch_get do orquestrador. Escritas vão para a aba real e também
+    atualizam a cópia local, para a leitura seguinte enxergar o novo status.
+    """
+
+    # Leituras são locais e escritas vão para a aba real, que já tem controle
+    # de cota (cliente_planilhas): com_cota() não embrulha de novo
+    COM_COTA = True
+    # Leituras já são locais: o LeitorPendentes não precisa consultar o
+    # modifiedTime da planilha para evitá-las
+    spreadsheet = None
+
+    def __init__(self, worksheet, valores):
+        self._worksheet = worksheet
+        self._linhas = [list(l) for l in valores]
+
+    def __getattr__(self, nome):
+        return getattr(self._worksheet, nome)
+
+    @property
+    def title(self):
+        return self._worksheet.title
+
+    # --- LEITURAS LOCAIS ---
+    @staticmethod
+    def _sem_vazios_finais(valores):
+        valores = list(valores)
+        while valores and valores[-1] in ('', []):
+            valores.pop()
+        return valores
+
+    def _faixa(self, faixa):
+        from gspread.utils import a1_range_to_grid_range
+        grade = a1_range_to_grid_range(faixa.split('!')[-1])
+        lin_ini = grade.get('startRowIndex', 0)
+        lin_fim = grade.get('endRowIndex', len(self._linhas))
+        col_ini = grade.get('startColumnIndex', 0)
+        col_fim = grade.get('endColumnIndex')
+        return self._sem_vazios_finais(
+            self._sem_vazios_finais(linha[col_ini:col_fim]) for linha in self._linhas[lin_ini:lin_fim]
+        )
+
+    def row_values(self, linha, **kwargs):
+        if linha - 1 >= len(self._linhas):
+            return []
+        return self._sem_vazios_finais(self._linhas[linha - 1])
+
+    def col_values(self, coluna, **kwargs):
+        return self._sem_vazios_finais(l[coluna - 1] if coluna - 1 < len(l) else '' for l in self._linhas)
+
+    def batch_get(self, faixas, **kwargs):
+        return [self._faixa(f) for f in faixas]
+
+    def get_all_values(self, **kwargs):
+        from gspread.utils import fill_gaps
+        return fill_gaps([list(l) for l in self._linhas])
+
+    def get_all_records(self, **kwargs):
+        # Mesmo padrão do gspread: números viram int/float, vazio fica ''
+        from gspread.utils import numericise_all
+        valores = self.get_all_values()
+        if not valores:
+            return []
+        cabecalho = valores[0]
+        return [dict(zip(cabecalho, numericise_all(linha))) for linha in valores[1:]]
+
+    # --- ESCRITAS (REPASSADAS) ---
+    def _gravar_local(self, linha, coluna, valor):
+        while len(self._linhas) < linha:
+            self._linhas.append([])
+        registro = self._linhas[linha - 1]
+        while len(registro) < coluna:
+            registro.append('')
+        registro[coluna - 1] = str(valor)
+
+    def update_cell(self, linha, coluna, valor):
+        resultado = self._worksheet.update_cell(linha, coluna, valor)
+        self._gravar_local(linha, coluna, valor)
+        return resultado
+
+    def batch_update(self, dados, **kwargs):
+        from gspread.utils import a1_range_to_grid_range
+        resultado = self._worksheet.batch_update(dados, **kwargs)
+        for bloco in dados:
+            grade = a1_range_to_grid_range(bloco['range'].split('!')[-1])
+            for dl, linha in enumerate(bloco['values']):
+                for dc, valor in enumerate(linha):
+                    self._gravar_local(grade.get('startRowIndex', 0) + dl + 1,
+                                       grade.get('startColumnIndex', 0) + dc + 1, valor)
+        return resultado
+
+
+# ==========================================
+# ORQUESTRADOR
+# ==========================================
+class Orquestrador:
+    """
+    Executa todas as abas de planejamento em um único processo:
+    autentica no Google uma vez, abre a planilha pela chave, lê as linhas
+    pendentes de todas as abas com poucos batch_get de várias faixas e roda
+    cada robô sobre a mesma sessão SAP (e o mesmo pool de sessões, se
+    SESSOES_PARALELAS > 1).
+
+    planilha/session opcionais: quando informados (ex.: benchmark_e2e.py),
+    pula a conexão com o Google e/ou com o SAP.
+    """
+
+    def __init__(self, tarefas=None, planilha=None, session=None, base_path=None, grupo=None):
+        self.tarefas = dict(tarefas or Config.TAREFAS)
+        self.grupo = grupo  # None = pergunta (ou FC_GRUPO); ver configurar_parametros_execucao()
+        self.planilha = com_cota(planilha)
+        self.session = instrumentar_sessao(session)
+        self.base_path = base_path or os.path.dirname(os.path.abspath(__file__))
+        self.pool = None
+        self.robos = {}
+        self._abas_reais = None
+        self._cabecalhos = {}
+        self.logger = logging.getLogger(__name__)
+
+    # --- CONEXÕES ---
+    def connect_google(self):
+        if self.planilha is not None:
+            return True
+        try:
+            # Sem FC_PLANILHA_KEY, o ID resolvido pelo nome fica em cache_google.json
+            _, self.planilha = conectar_google(
+                os.path.join(self.base_path, Config.GOOGLE_CREDENTIALS_FILE),
+                nome=Config.SHEET_NAME, chave=Config.CHAVE_PLANILHA,
+            )
+            self.logger.info("Planilha '%s' conectada.", self.planilha.title)
+            return True
+        except Exception as e:
+            self.logger.exception("Erro Google Sheets: %s", e)
+            return False
+
+    def connect_sap(self):
+        if self.session is None:
+            try:
+                application = obter_sapgui().GetScriptingEngine
+                self.session = instrumentar_sessao(application.Children(0).Children(0))
+                self.logger.info("Conectado ao SAP.")
+            except Exception as e:
+                self.logger.exception("Erro SAP: %s", e)
+                return False
+        if Config.SESSOES_PARALELAS > 1:
+            self.pool = PoolSessoesSAP(self.session, Config.SESSOES_PARALELAS, logger=self.logger)
+            self.pool.preparar()
+        return True
+
+    # --- LEITURA ÚNICA ---
+    def _abas_existentes(self):
+        if self._abas_reais is None:
+            abas_reais = {ws.title: ws for ws in self.planilha.worksheets()}
+            for nome in self.tarefas:
+                if nome not in abas_reais:
+                    self.logger.warning("Aba '%s' não existe na planilha; ignorada.", nome)
+            self._abas_reais = abas_reais
+        return [nome for nome in self.tarefas if nome in self._abas_reais]
+
+    def ler_abas(self):
+        """
+        Retorna {nome da aba: AbaPreCarregada} só com as abas que têm
+        pendentes. Na primeira vez os cabeçalhos vêm de um batch_get de 1:1
+        (para achar a coluna Status); o resto é o ler_pendentes(), sem baixar
+        o histórico das abas.
+        """
+        nomes = [nome for nome in self._abas_existentes() if nome not in self._cabecalhos]
+        if nomes:
+            # Aspas simples: nomes com espaço ('BD GERAL') precisam delas na notação A1
+            resposta = self.planilha.values_batch_get([f"'{nome}'!1:1" for nome in nomes])
+            for nome, faixa in zip(nomes, resposta.get('valueRanges', [])):
+                valores = faixa.get('values', [])
+                self._cabecalhos[nome] = list(valores[0]) if valores else []
+                if not self._coluna_status(nome):
+                    self.logger.warning("Aba '%s' sem coluna Status; ignorada.", nome)
+                elif self.tarefas[nome] == 'ofs' and not self._coluna_status(nome, padrao=False):
+                    self.logger.warning("Aba '%s' sem coluna Status; usando a coluna B.", nome)
+        return self.ler_pendentes()
+
+    def _coluna_status(self, nome, padrao=True):
+        for i, cabecalho in enumerate(self._cabecalhos.get(nome, [])):
+            if cabecalho.strip().lower() == 'status':
+                return i + 1
+        if padrao and self.tarefas[nome] == 'ofs' and self._cabecalhos.get(nome):
+            return 2  # cancelar_of grava o status na coluna B
+        return None
+
+    def ler_pendentes(self):
+        """
+        Leitura das abas em dois batch_get para todas elas:
+        1. cabeçalho, coluna A e coluna Status de cada aba;
+        2. só as linhas pendentes (linha_pendente: coluna A preenchida e
+           Status vazio ou com 'NAO'), a mesma regra do LeitorPendentes.
+        As demais linhas entram na aba pré-carregada só com coluna A e
+        Status, o suficiente para os robôs as pularem. Abas sem pendentes
+        não são devolvidas: linhas em branco sozinhas não disparam um robô.
+        Na CANCELAR OF, como no cancelar_of, a primeira coluna A vazia
+        encerra a aba.
+        """
+        from gspread.utils import rowcol_to_a1
+        nomes = [nome for nome in self._abas_existentes() if self._coluna_status(nome)]
+        if not nomes:
+            return {}
+
+        faixas = []
+        for nome in nomes:
+            letra = rowcol_to_a1(1, self._coluna_status(nome))[:-1]
+            faixas += [f"'{nome}'!1:1", f"'{nome}'!A2:A", f"'{nome}'!{letra}2:{letra}"]
+        resposta = self.planilha.values_batch_get(faixas).get('valueRanges', [])
+
+        parciais, faixas_pendentes = {}, []
+        for pos, nome in enumerate(nomes):
+            cab, col_a, col_st = (resposta[pos * 3 + k].get('values', []) for k in range(3))
+            cabecalhos = list(cab[0]) if cab else []
+            if cabecalhos != self._cabecalhos[nome]:
+                self._cabecalhos[nome] = cabecalhos
+            col_status = self._coluna_status(nome)
+            if not col_status:
+                continue
+
+            linhas = [cabecalhos]
+            pendentes = []
+            para_no_vazio = self.tarefas[nome] == 'ofs'
+            for i in range(max(len(col_a), len(col_st))):
+                valor_a = col_a[i][0] if i < len(col_a) and col_a[i] else ''
+                status = col_st[i][0] if i < len(col_st) and col_st[i] else ''
+                if para_no_vazio and not str(valor_a).strip():
+                    break
+                linha = [''] * max(len(cabecalhos), col_status)
+                linha[0], linha[col_status - 1] = valor_a, status
+                linhas.append(linha)
+                if linha_pendente(valor_a, status):
+                    pendentes.append(i + 2)
+            if not pendentes:
+                continue
+
+            # Linhas pendentes consecutivas viram uma faixa só
+            ultima = rowcol_to_a1(1, max(len(cabecalhos), 1))[:-1]
+            inicio = anterior = pendentes[0]
+            for linha in pendentes[1:] + [None]:
+                if linha != anterior + 1:
+                    faixas_pendentes.append((nome, inicio, anterior, f"'{nome}'!A{inicio}:{ultima}{anterior}"))
+                    inicio = linha
+                anterior = linha
+            parciais[nome] = linhas
+
+        if faixas_pendentes:
+            resposta = self.planilha.values_batch_get([f for _, _, _, f in faixas_pendentes]).get('valueRanges', [])
+            for (nome, inicio, fim, _), faixa in zip(faixas_pendentes, resposta):
+                valores = faixa.get('values', [])
+                for offset in range(fim - inicio + 1):
+                    parciais[nome][inicio - 1 + offset] = valores[offset] if offset < len(valores) else []
+
+        total = sum(len(linhas) for linhas in parciais.values())
+        self.logger.info("Leitura: %s aba(s) com pendentes (%s linha(s) lidas no total).", len(parciais), total)
+        return {nome: AbaPreCarregada(self._abas_reais[nome], linhas) for nome, linhas in parciais.items()}
+
+    # --- ROBÔS ---
+    def preparar_robos(self):
+        """Cria os robôs e faz as perguntas interativas antes de qualquer transação."""
+        for nome, tipo in self.tarefas.items():
+            if tipo == 'main':
+                import main
+                robo = main.SAPAutomation()
+                robo.configurar_parametros_execucao(self.grupo)
+            elif tipo == 'consumo':
+                import criar_rc_consumo
+                robo = criar_rc_consumo.SAPAutomation()
+                robo.configurar_parametros_execucao(self.grupo)
+            elif tipo == 'transferencia':
+                import REQ_TRANSF_INTERNA
+                robo = REQ_TRANSF_INTERNA.SAPBotCLI(base_path=self.base_path)
+            elif tipo == 'ofs':
+                robo = None  # cancelar_of é uma função
+            else:
+                raise ValueError(f"Tarefa desconhecida para a aba '{nome}': {tipo}")
+            self.robos[nome] = robo
+
+    def _executar_aba(self, nome, aba):
+        tipo = self.tarefas[nome]
+        robo = self.robos.get(nome)
+        if tipo in ('main', 'consumo'):
+            robo.session = self.session
+            robo.pool = self.pool
+            robo.processar_aba(aba)
+        elif tipo == 'transferencia':
+            robo.session = self.session
+            robo.processar_aba(aba)
+        elif tipo == 'ofs':
+            import cancelar_of
+            cancelar_of.concluir_ofs(aba=aba, session=self.session, pool=self.pool)
+
+    def _executar_abas(self, abas):
+        with span('orquestrador', abas=len(abas)):
+            for nome, aba in abas.items():
+                self.logger.info("\n>>> ABA: %s (%s)", nome, self.tarefas[nome])
+                try:
+                    self._executar_aba(nome, aba)
+                except Exception as e:
+                    # Uma aba com problema não impede as seguintes
+                    self.logger.exception("Erro na aba '%s': %s", nome, e)
+
+    def executar(self):
+        if not self.robos:
+            self.preparar_robos()
+        self._executar_abas(self.ler_abas())
+
+    def _sessao_valida(self):
+        try:
+            self.session.findById("wnd[0]")
+            return True
+        except Exception:
+            return False
+
+    def vigiar(self, intervalo=None, intervalo_max=None):
+        """
+        Modo contínuo: consulta o modifiedTime da planilha no Drive (uma
+        chamada leve) e só lê/processa as linhas pendentes quando ele muda.
+        Sem mudança, o intervalo dobra até intervalo_max; qualquer mudança
+        volta ao início. Uma rodada que falha (cota esgotada, 5xx, rede) é
+        registrada e repetida depois da espera, sem derrubar o vigia.
+
+        A versão é lida antes de processar: as escritas do próprio robô mudam
+        o modifiedTime e geram uma releitura barata (sem pendentes) na rodada
+        seguinte, em troca de nunca perder uma edição feita durante o processamento.
+        """
+        intervalo = intervalo or Config.INTERVALO_VIGIA
+        intervalo_max = max(intervalo_max or Config.INTERVALO_VIGIA_MAX, intervalo)
+        if not self.robos:
+            self.preparar_robos()
+
+        versao_anterior = None
+        espera = intervalo
+        self.logger.info("Modo vigia: consultando a planilha a cada %ss (até %ss sem mudanças). Ctrl+C encerra.",
+                         intervalo, intervalo_max)
+        try:
+            while True:
+                try:
+                    versao = self.planilha.get_lastUpdateTime()
+                except Exception as e:
+                    self.logger.warning("Falha ao consultar modifiedTime: %s", e)
+                    versao = None
+
+                if versao is None or versao != versao_anterior:
+                    versao_anterior = versao
+                    try:
+                        abas = self.ler_abas()
+                        if abas:
+                            if not self._sessao_valida():
+                                self.logger.warning("Sessão SAP perdida. Reconectando...")
+                                self.session = None
+                                if not self.connect_sap():
+                                    versao_anterior = None  # tenta de novo na próxima rodada
+                                    abas = {}
+                            self._executar_abas(abas)
+                        espera = intervalo
+                    except Exception as e:
+                        versao_anterior = None
+                        espera = min(espera * 2, intervalo_max)
+                        self.logger.exception("Vigia: rodada falhou (%s). Nova tentativa em %ss.", e, espera)
+                else:
+                    espera = min(espera * 2, intervalo_max)
+                dormir(espera)
+        except KeyboardInterrupt:
+            self.logger.warning("Modo vigia encerrado pelo usuário (Ctrl+C).")
+
+    def run(self, vigiar=False):
+        # Google em segundo plano enquanto o SAP conecta e os robôs perguntam o grupo
+        google = em_segundo_plano(self.connect_google)
+        if not self.connect_sap(): return
+        self.preparar_robos()
+        if not google.result(): return
+        if vigiar:
+            self.vigiar()
+        else:
+            self.executar()
+        self.logger.info("\nOrquestrador: fim.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa todas as abas de planejamento com clientes compartilhados.")
+    parser.add_argument('--abas', nargs='+', choices=sorted(Config.TAREFAS), help="Abas a executar (padrão: todas)")
+    parser.add_argument('--chave', help="ID da planilha (padrão: FC_PLANILHA_KEY)")
+    parser.add_argument('--sessoes', type=int, help="Sessões SAP paralelas para as abas ME51N")
+    parser.add_argument('--grupo', help="Grupo das abas ME51N sem pergunta: P01..P07 ou 'coluna' (grupo por linha)")
+    parser.add_argument('--vigiar', action='store_true', help="Fica rodando e processa novas linhas pendentes")
+    parser.add_argument('--intervalo', type=int, help=f"Segundos entre consultas no modo vigia (padrão: {Config.INTERVALO_VIGIA})")
+    parser.add_argument('--intervalo-max', type=int, help=f"Teto do backoff sem mudanças (padrão: {Config.INTERVALO_VIGIA_MAX})")
+    args = parser.parse_args()
+
+    from automacao_me51n import setup_logging
+    setup_logging()
+    if args.chave:
+        Config.CHAVE_PLANILHA = args.chave
+    if args.sessoes:
+        Config.SESSOES_PARALELAS = args.sessoes
+    if args.intervalo:
+        Config.INTERVALO_VIGIA = args.intervalo
+    if args.intervalo_max:
+        Config.INTERVALO_VIGIA_MAX = args.intervalo_max
+    tarefas = {nome: Config.TAREFAS[nome] for nome in args.abas} if args.abas else None
+    Orquestrador(tarefas, grupo=args.grupo).run(vigiar=args.vigiar)
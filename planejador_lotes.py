@@ -0,0 +1,82 @@
+import logging
+import math
+
+
+# ==========================================
+# PLANEJADOR DE LOTES (DOCUMENTOS ME51N)
+# ==========================================
+class PlanejadorLotes:
+    """
+    Empacota os itens pendentes no menor número de requisições respeitando:
+
+    - max_itens por documento;
+    - valor_max_documento: teto da soma dos valores dos itens de uma RC;
+    - itens "individuais" (alto valor, ou qualquer regra passada em
+      item_individual) sempre sozinhos em uma RC.
+
+    Usa First-Fit Decreasing: itens ordenados por valor decrescente entram no
+    primeiro documento que ainda comporta quantidade e valor. Diferente das
+    faixas fixas, sobras de faixas diferentes dividem o mesmo documento.
+
+    planejar() devolve uma lista de (rotulo, numero, itens), o mesmo formato
+    de lote consumido por _processar_lote.
+    """
+
+    def __init__(self, valor_item, item_individual=None, max_itens=10,
+                 valor_max_documento=100000.0, logger=None):
+        self.valor_item = valor_item
+        self.item_individual = item_individual or (lambda item: False)
+        self.max_itens = max(1, int(max_itens))
+        self.valor_max_documento = float(valor_max_documento)
+        self.logger = logger or logging.getLogger(__name__)
+
+    def planejar(self, itens):
+        individuais = []
+        empacotaveis = []
+        for item in itens:
+            valor = self.valor_item(item)
+            if self.item_individual(item) or valor > self.valor_max_documento:
+                individuais.append(item)
+            else:
+                empacotaveis.append((valor, item))
+
+        # FFD: [total, [itens]] por documento
+        documentos = []
+        for valor, item in sorted(empacotaveis, key=lambda par: par[0], reverse=True):
+            for doc in documentos:
+                if len(doc[1]) < self.max_itens and doc[0] + valor <= self.valor_max_documento:
+                    doc[0] += valor
+                    doc[1].append(item)
+                    break
+            else:
+                documentos.append([valor, [item]])
+
+        ordem = lambda item: item.get('sheet_row_index', 0)
+        plano = []
+        for n, (_, doc_itens) in enumerate(documentos, start=1):
+            plano.append(('Lote', n, sorted(doc_itens, key=ordem)))
+        for n, item in enumerate(sorted(individuais, key=ordem), start=1):
+            plano.append(('Individual', n, [item]))
+        return plano
+
+    def limite_inferior(self, itens):
+        """Mínimo teórico de documentos (para comparar com o plano)."""
+        empacotaveis = [self.valor_item(i) for i in itens
+                        if not self.item_individual(i) and self.valor_item(i) <= self.valor_max_documento]
+        n_ind = len(itens) - len(empacotaveis)
+        if not empacotaveis:
+            return n_ind
+        por_qtd = math.ceil(len(empacotaveis) / self.max_itens)
+        por_valor = math.ceil(sum(empacotaveis) / self.valor_max_documento) if self.valor_max_documento else 0
+        return n_ind + max(por_qtd, por_valor)
+
+    def imprimir(self, plano, itens):
+        total_itens = sum(len(lote) for _, _, lote in plano)
+        self.logger.info("%s", "\n" + "=" * 40)
+        self.logger.info(" PLANO DE LOTES: %s item(ns) em %s documento(s) ME51N", total_itens, len(plano))
+        self.logger.info(" (mínimo teórico: %s documento(s))", self.limite_inferior(itens))
+        self.logger.info("%s", "=" * 40)
+        for rotulo, n, lote in plano:
+            valor = sum(self.valor_item(i) for i in lote)
+            linhas = ", ".join(str(i.get('sheet_row_index', '?')) for i in lote)
+            self.logger.info(" %s %s: %s item(ns) | valor %.2f | linhas %s", rotulo, n, len(lote), valor, linhas)
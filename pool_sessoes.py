@@ -0,0 +1,132 @@
+import logging
+import queue
+import threading
+import time
+
+from sap_conexao import obter_sapgui, inicializar_com, finalizar_com
+from rastreamento import dormir, instrumentar_sessao
+
+
+# ==========================================
+# POOL DE SESSÕES SAP GUI
+# ==========================================
+class PoolSessoesSAP:
+    """
+    Abre (ou reaproveita) até N sessões na mesma conexão SAP e distribui
+    tarefas entre elas, uma thread por sessão.
+
+    Objetos COM não podem ser compartilhados entre threads sem marshalling,
+    então cada thread inicializa o próprio apartment (CoInitialize) e se
+    conecta de novo à sua sessão pelo Id ("/app/con[0]/ses[N]"). A sessão
+    original nunca sai da thread principal.
+
+    mapear() devolve os resultados na mesma ordem das tarefas, à medida que
+    ficam prontos, para que a escrita na planilha continue ordenada.
+    """
+
+    MAX_SESSOES = 6  # limite padrão do SAP por conexão
+
+    def __init__(self, session, n_sessoes, timeout_abertura=30, logger=None):
+        self.session = session
+        self.n_sessoes = max(1, min(int(n_sessoes), self.MAX_SESSOES))
+        self.timeout_abertura = timeout_abertura
+        self.logger = logger or logging.getLogger(__name__)
+        self.ids_sessoes = []
+
+    def preparar(self):
+        """Garante as sessões abertas e retorna quantas estão disponíveis."""
+        connection = self.session.Parent
+        ids = [connection.Children(i).Id for i in range(connection.Children.Count)]
+
+        while len(ids) < self.n_sessoes:
+            antes = connection.Children.Count
+            try:
+                self.session.createSession()
+            except Exception as e:
+                self.logger.warning("Não foi possível abrir nova sessão SAP: %s", e)
+                break
+
+            inicio = time.time()
+            while connection.Children.Count <= antes:
+                if time.time() - inicio > self.timeout_abertura:
+                    break
+                dormir(0.2)
+            if connection.Children.Count <= antes:
+                self.logger.warning("Timeout aguardando abertura de nova sessão SAP.")
+                break
+            ids = [connection.Children(i).Id for i in range(connection.Children.Count)]
+
+        self.ids_sessoes = ids[:self.n_sessoes]
+        self.logger.info("Pool SAP: %s sessão(ões) disponível(is).", len(self.ids_sessoes))
+        return len(self.ids_sessoes)
+
+    @staticmethod
+    def _anexar(id_sessao):
+        application = obter_sapgui().GetScriptingEngine
+        return instrumentar_sessao(application.findById(id_sessao))
+
+    def _trabalhador(self, id_sessao, fila, resultados, prontos, funcao):
+        inicializar_com()
+        try:
+            try:
+                session = self._anexar(id_sessao)
+            except Exception as e:
+                self.logger.error("Falha ao anexar na sessão %s: %s", id_sessao, e)
+                session = None
+
+            while True:
+                try:
+                    idx, tarefa = fila.get_nowait()
+                except queue.Empty:
+                    return
+                if session is None:
+                    # Devolve a tarefa para outra sessão e encerra esta thread
+                    fila.put((idx, tarefa))
+                    return
+                try:
+                    resultados[idx] = funcao(session, tarefa)
+                except Exception as e:
+                    self.logger.exception("Erro na sessão %s: %s", id_sessao, e)
+                    resultados[idx] = e
+                finally:
+                    prontos[idx].set()
+        finally:
+            finalizar_com()
+
+    def mapear(self, funcao, tarefas):
+        """
+        Executa funcao(session, tarefa) para cada tarefa e produz os resultados
+        em ordem. Exceções da tarefa são devolvidas como valor, não propagadas.
+        """
+        tarefas = list(tarefas)
+        if not self.ids_sessoes:
+            self.preparar()
+
+        fila = queue.Queue()
+        for idx, tarefa in enumerate(tarefas):
+            fila.put((idx, tarefa))
+        resultados = [None] * len(tarefas)
+        prontos = [threading.Event() for _ in tarefas]
+
+        threads = [
+            threading.Thread(
+                target=self._trabalhador,
+                args=(id_sessao, fila, resultados, prontos, funcao),
+                name=f"sap-{id_sessao}",
+                daemon=True,
+            )
+            for id_sessao in self.ids_sessoes
+        ]
+        for t in threads:
+            t.start()
+
+        for idx in range(len(tarefas)):
+            while not prontos[idx].wait(timeout=1.0):
+                if not any(t.is_alive() for t in threads):
+                    # Todas as sessões caíram: o restante fica sem resultado
+                    resultados[idx] = RuntimeError("Nenhuma sessão SAP disponível no pool.")
+                    prontos[idx].set()
+            yield resultados[idx]
+
+        for t in threads:
+            t.join()
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+import argparse
+import atexit
+import contextlib
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+
+# ==========================================
+# RASTREAMENTO DE TEMPOS (OPCIONAL)
+# ==========================================
+# Grava spans hierárquicos (execucao → lote → documento → item → chamada)
+# em um arquivo JSONL, uma linha por span finalizado. Desligado por padrão:
+# ative com a variável de ambiente FC_RASTREIO=caminho.jsonl ou ativar().
+# Desligado, instrumentar_*() devolve o próprio objeto e span() não grava
+# nada, então o custo é só o de um if.
+#
+# Resumo:  python rastreamento.py rastreio.jsonl
+
+# Métodos COM/gspread cronometrados quando o rastreio está ativo
+METODOS_SAP = (
+    'findById', 'modifyCell', 'sendVKey', 'press', 'pressEnter', 'select', 'Select',
+    'pressToolbarButton', 'setCurrentCell', 'getCellValue', 'maximize', 'createSession',
+)
+METODOS_PLANILHA = (
+    'update_cell', 'batch_update', 'batch_get', 'row_values', 'col_values',
+    'get_all_records', 'get_all_values', 'update',
+)
+
+_arquivo = None
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_local = threading.local()
+_raiz = None  # span mais externo: pai dos spans abertos em threads do pool (protegido por _lock)
+
+
+def ativar(caminho):
+    """Liga o rastreio gravando em caminho (modo append)."""
+    global _arquivo
+    desativar()
+    _arquivo = open(caminho, 'a', encoding='utf-8', buffering=1024 * 64)
+
+
+def desativar():
+    global _arquivo, _raiz
+    with _lock:
+        if _arquivo is not None:
+            _arquivo.close()
+        _arquivo = None
+        _raiz = None
+
+
+def ativo():
+    return _arquivo is not None
+
+
+def _pilha():
+    pilha = getattr(_local, 'pilha', None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    return pilha
+
+
+def _gravar(registro):
+    with _lock:
+        if _arquivo is not None:
+            _arquivo.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+
+
+@contextlib.contextmanager
+def _span_ativo(nome, tipo, atributos):
+    global _raiz
+    pilha = _pilha()
+    # pid no id: várias execuções podem gravar no mesmo arquivo
+    id_span = f"{os.getpid()}-{next(_ids)}"
+    with _lock:
+        pai = pilha[-1] if pilha else _raiz
+        if _raiz is None:
+            _raiz = id_span
+    pilha.append(id_span)
+    inicio = time.time()
+    t0 = time.perf_counter()
+    erro = None
+    try:
+        yield atributos
+    except BaseException as e:
+        erro = type(e).__name__
+        raise
+    finally:
+        pilha.pop()
+        with _lock:
+            if _raiz == id_span:
+                _raiz = None
+        registro = {
+            'id': id_span, 'pai': pai, 'nome': nome, 'tipo': tipo,
+            'inicio': round(inicio, 6), 'dur': round(time.perf_counter() - t0, 6),
+            'thread': threading.current_thread().name,
+        }
+        if atributos:
+            registro['attrs'] = atributos
+        if erro:
+            registro['erro'] = erro
+        _gravar(registro)
+
+
+def span(nome, tipo=None, **atributos):
+    """
+    Context manager de um span. tipo agrupa no resumo ('execucao', 'lote',
+    'documento', 'item', 'sap', 'planilha', 'espera'); padrão = nome.
+    O dicionário de atributos é devolvido no with para complementar depois.
+    """
+    if _arquivo is None:
+        return contextlib.nullcontext(atributos)
+    return _span_ativo(nome, tipo or nome, atributos)
+
+
+def rastrear(nome, tipo=None, atributos=None):
+    """
+    Decorador: executa a função dentro de um span. atributos(*args, **kwargs)
+    opcional monta os atributos a partir dos argumentos da chamada.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if _arquivo is None:
+                return funcao(*args, **kwargs)
+            attrs = atributos(*args, **kwargs) if atributos else {}
+            with _span_ativo(nome, tipo or nome, attrs):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def dormir(segundos):
+    """time.sleep() que aparece no rastreio como tipo 'espera'."""
+    if _arquivo is None:
+        time.sleep(segundos)
+        return
+    with _span_ativo('sleep', 'espera', {'segundos': segundos}):
+        time.sleep(segundos)
+
+
+# ------------------------------------------
+# PROXIES
+# ------------------------------------------
+class _Proxy:
+    """Repassa tudo ao objeto real e cronometra os métodos listados."""
+
+    __slots__ = ('_alvo', '_tipo', '_metodos')
+
+    def __init__(self, alvo, tipo, metodos):
+        object.__setattr__(self, '_alvo', alvo)
+        object.__setattr__(self, '_tipo', tipo)
+        object.__setattr__(self, '_metodos', metodos)
+
+    def __getattr__(self, nome):
+        valor = getattr(self._alvo, nome)
+        if nome not in self._metodos or _arquivo is None:
+            return valor
+        tipo = self._tipo
+
+        def cronometrado(*args, **kwargs):
+            atributos = {'args': [str(a)[:80] for a in args]} if args else {}
+            with _span_ativo(nome, tipo, atributos):
+                resultado = valor(*args, **kwargs)
+            if tipo == 'sap' and nome == 'findById' and resultado is not None:
+                return _Proxy(resultado, tipo, self._metodos)
+            return resultado
+
+        return cronometrado
+
+    def __setattr__(self, nome, valor):
+        setattr(self._alvo, nome, valor)
+
+    def __eq__(self, outro):
+        if isinstance(outro, _Proxy):
+            outro = outro._alvo
+        return self._alvo == outro
+
+    def __hash__(self):
+        return hash(self._alvo)
+
+    def __bool__(self):
+        return self._alvo is not None
+
+
+def instrumentar_sessao(session):
+    """Sessão SAP cujos findById/controles são cronometrados (se ativo)."""
+    if _arquivo is None or session is None or isinstance(session, _Proxy):
+        return session
+    return _Proxy(session, 'sap', METODOS_SAP)
+
+
+def instrumentar_planilha(worksheet):
+    if _arquivo is None or worksheet is None or isinstance(worksheet, _Proxy):
+        return worksheet
+    return _Proxy(worksheet, 'planilha', METODOS_PLANILHA)
+
+
+if os.getenv('FC_RASTREIO'):
+    ativar(os.getenv('FC_RASTREIO'))
+atexit.register(desativar)
+
+
+# ------------------------------------------
+# RESUMO
+# ------------------------------------------
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    baixo = int(k)
+    alto = min(baixo + 1, len(ordenados) - 1)
+    return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (k - baixo)
+
+
+def resumir(caminho, top_documentos=20):
+    spans = {}
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            linha = linha.strip()
+            if linha:
+                registro = json.loads(linha)
+                spans[registro['id']] = registro
+
+    # Percentis por tipo de chamada (spans folha: sap/planilha/espera)
+    por_chamada = defaultdict(list)
+    for s in spans.values():
+        if s['tipo'] in ('sap', 'planilha', 'espera'):
+            por_chamada[f"{s['tipo']}.{s['nome']}"].append(s['dur'] * 1000)
+
+    print(f"\n{'chamada':<28}{'n':>7}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for nome, duracoes in sorted(por_chamada.items(), key=lambda kv: -sum(kv[1])):
+        print(f"{nome:<28}{len(duracoes):>7}{sum(duracoes) / 1000:>10.2f}"
+              f"{_percentil(duracoes, 50):>10.1f}{_percentil(duracoes, 95):>10.1f}{_percentil(duracoes, 99):>10.1f}")
+
+    # Quebra por documento: tempo em SAP / planilha / espera / resto
+    filhos = defaultdict(list)
+    for s in spans.values():
+        filhos[s['pai']].append(s['id'])
+
+    def somar_folhas(id_span, acumulado):
+        for id_filho in filhos.get(id_span, ()):
+            filho = spans[id_filho]
+            if filho['tipo'] in ('sap', 'planilha', 'espera'):
+                # Chamadas dentro de chamadas (ex.: findById em uma espera) não contam duas vezes
+                acumulado[filho['tipo']] += filho['dur']
+            else:
+                somar_folhas(id_filho, acumulado)
+
+    documentos = sorted((s for s in spans.values() if s['tipo'] == 'documento'), key=lambda s: s['inicio'])
+    if not documentos:
+        return
+    print(f"\n{'documento':<36}{'total s':>9}{'sap':>8}{'planilha':>10}{'espera':>8}{'outros':>8}")
+    for doc in documentos[:top_documentos] if top_documentos else documentos:
+        acumulado = defaultdict(float)
+        somar_folhas(doc['id'], acumulado)
+        outros = doc['dur'] - sum(acumulado.values())
+        attrs = doc.get('attrs', {})
+        rotulo = f"{doc['nome']} " + " ".join(f"{k}={v}" for k, v in attrs.items())
+        print(f"{rotulo[:35]:<36}{doc['dur']:>9.2f}{acumulado['sap']:>8.2f}"
+              f"{acumulado['planilha']:>10.2f}{acumulado['espera']:>8.2f}{max(outros, 0):>8.2f}")
+    if top_documentos and len(documentos) > top_documentos:
+        print(f"... {len(documentos) - top_documentos} documento(s) omitido(s) (use --todos)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumo de um arquivo de rastreio (JSONL).")
+    parser.add_argument('arquivo')
+    parser.add_argument('--todos', action='store_true', help="Lista todos os documentos")
+    args = parser.parse_args()
+    resumir(args.arquivo, top_documentos=0 if args.todos else 20)
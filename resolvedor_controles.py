@@ -0,0 +1,146 @@
+import logging
+import re
+
+from espera_sap import aguardar_sap, aguardar_condicao
+
+
+# ==========================================
+# IDs DOS CONTROLES DA ME51N (MODELOS)
+# ==========================================
+# O número da subtela principal (subSUB0:SAPLMEGUI:00xx) muda conforme o
+# layout: cabeçalho aberto/recolhido, detalhe do item aberto, tipo de
+# documento... ({tela}). A área do detalhe do item alterna entre subSUB2 e
+# subSUB3 ({sub}). Os modelos abaixo cobrem as variantes usadas pelos scripts.
+_BASE = "wnd[0]/usr/subSUB0:SAPLMEGUI:{tela}"
+_DETALHE_ITEM = _BASE + "/{sub}:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301"
+_ABAS_ITEM = _DETALHE_ITEM + "/subSUB2:SAPLMEGUI:3303/tabsREQ_ITEM_DETAIL"
+_ABA_TRANSPORTE = (
+    _ABAS_ITEM + "/tabpTABREQDT16/ssubTABSTRIPCONTROL1SUB:SAPLMEGUI:1318"
+    "/ssubCUSTOMER_DATA_ITEM:SAPLXM02:0111/tabsTABREITER1/tabpTRANS"
+)
+
+CONTROLES_ME51N = {
+    'grid': _BASE + "/subSUB2:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:3212/cntlGRIDCONTROL/shellcont/shell",
+    'editor_cabecalho': (
+        _BASE + "/subSUB1:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:3102"
+        "/tabsREQ_HEADER_DETAIL/tabpTABREQHDT1/ssubTABSTRIPCONTROL3SUB:SAPLMEGUI:1230"
+        "/subTEXTS:SAPLMMTE:0100/subEDITOR:SAPLMMTE:0101/cntlTEXT_EDITOR_0101/shellcont/shell"
+    ),
+    'tipo_documento': _BASE + "/subSUB0:SAPLMEGUI:0030/subSUB1:SAPLMEGUI:3327/cmbMEREQ_TOPLINE-BSART",
+    'proximo_item': _DETALHE_ITEM + "/subSUB1:SAPLMEGUI:6000/btn%#AUTOTEXT002",
+    'aba_dados_cliente': _ABAS_ITEM + "/tabpTABREQDT16",
+    'aba_transporte': _ABA_TRANSPORTE,
+    'deposito_fornecedor': _ABA_TRANSPORTE + "/ssubSUBBILD1:SAPLXM02:0114/ctxtEBAN-ZZDEP_FORNEC",
+    'aba_classcont': _ABAS_ITEM + "/tabpTABREQDT7",
+    'pep': (
+        _ABAS_ITEM + "/tabpTABREQDT7/ssubTABSTRIPCONTROL1SUB:SAPLMEVIEWS:1101"
+        "/subSUB2:SAPLMEACCTVI:0100/subSUB1:SAPLMEACCTVI:1100/subKONTBLOCK:SAPLKACB:1101/ctxtCOBL-PS_POSID"
+    ),
+}
+
+# Ordem de tentativa quando a subtela atual não pôde ser lida
+TELAS_CONHECIDAS = ('0013', '0016', '0015', '0019', '0014', '0010')
+SUBS_CONHECIDOS = ('subSUB3', 'subSUB2')
+
+_RE_SUBTELA = re.compile(r'subSUB0:SAPLMEGUI:(\d{4})')
+
+
+# ==========================================
+# RESOLVEDOR DE CONTROLES
+# ==========================================
+class ResolvedorControles:
+    """
+    Localiza controles da ME51N por nome lógico ('grid', 'pep', ...) e
+    guarda o handle encontrado.
+
+    - Handle em cache é validado com uma leitura de propriedade (Id); se o
+      controle foi destruído, o cache é descartado.
+    - Em cache miss a subtela atual é lida do contêiner wnd[0]/usr e o Id
+      é montado direto com o número certo, sem tentar variante por variante.
+      Se a subtela mudou, todos os handles são invalidados.
+    - Id que funcionou para (nome, subtela) é lembrado e tentado primeiro
+      quando aquela subtela voltar.
+    """
+
+    def __init__(self, session, controles=CONTROLES_ME51N, logger=None):
+        self.session = session
+        self.controles = controles
+        self.logger = logger or logging.getLogger(__name__)
+        self._subtela = None
+        self._handles = {}
+        self._aprendidos = {}
+
+    def subtela_atual(self):
+        """Número da subtela principal da ME51N (ex.: '0015') ou None."""
+        try:
+            usr = self.session.findById("wnd[0]/usr", False)
+            if usr is None or not usr.Children.Count:
+                return None
+            m = _RE_SUBTELA.search(str(usr.Children(0).Id))
+            return m.group(1) if m else None
+        except Exception:
+            return None
+
+    def invalidar(self):
+        self._handles.clear()
+        self._subtela = None
+
+    def _candidatos(self, nome, subtela):
+        modelo = self.controles[nome]
+        vistos = set()
+        if (nome, subtela) in self._aprendidos:
+            vistos.add(self._aprendidos[(nome, subtela)])
+            yield self._aprendidos[(nome, subtela)]
+        telas = (subtela,) if subtela else TELAS_CONHECIDAS
+        for tela in telas:
+            for sub in SUBS_CONHECIDOS if '{sub}' in modelo else ('',):
+                id_controle = modelo.format(tela=tela, sub=sub)
+                if id_controle not in vistos:
+                    vistos.add(id_controle)
+                    yield id_controle
+
+    def _handle_valido(self, nome):
+        handle = self._handles.get(nome)
+        if handle is None:
+            return None
+        try:
+            handle.Id
+            return handle
+        except Exception:
+            del self._handles[nome]
+            return None
+
+    def localizar(self, nome):
+        """Retorna o handle do controle ou None (sem exceção)."""
+        handle = self._handle_valido(nome)
+        if handle is not None:
+            return handle
+
+        subtela = self.subtela_atual()
+        if subtela != self._subtela:
+            self._handles.clear()
+            self._subtela = subtela
+
+        for id_controle in self._candidatos(nome, subtela):
+            try:
+                handle = self.session.findById(id_controle, False)
+            except Exception:
+                handle = None
+            if handle is not None:
+                self._handles[nome] = handle
+                self._aprendidos[(nome, subtela)] = id_controle
+                return handle
+        return None
+
+    def controle(self, nome):
+        """Como localizar(), mas levanta LookupError se o controle não existir."""
+        handle = self.localizar(nome)
+        if handle is None:
+            raise LookupError(f"Controle '{nome}' não encontrado (subtela {self._subtela or '?'}).")
+        return handle
+
+    def aguardar(self, nome, timeout=10, deve_continuar=None):
+        """Espera o SAP ficar livre e o controle aparecer. Retorna o handle ou None."""
+        if not aguardar_sap(self.session, timeout, deve_continuar):
+            return None
+        return aguardar_condicao(lambda: self.localizar(nome), timeout, deve_continuar)
@@ -0,0 +1,53 @@
+import os
+
+# ==========================================
+# PONTO ÚNICO DE ACESSO AO SAP GUI SCRIPTING
+# ==========================================
+# Todos os scripts obtêm o objeto "SAPGUI" por aqui. Em produção é o
+# GetObject do win32com; em testes/benchmark um simulador pode ser instalado
+# com instalar_simulador() ou pela variável de ambiente FC_SAP_SIMULADOR=1.
+
+_simulador = None
+
+try:
+    import pywintypes
+    ErroCOM = pywintypes.com_error
+except ImportError:  # fora do Windows (simulador)
+    ErroCOM = Exception
+
+
+def instalar_simulador(simulador):
+    """Faz obter_sapgui() devolver o simulador em vez do SAP real."""
+    global _simulador
+    _simulador = simulador
+
+
+def remover_simulador():
+    global _simulador
+    _simulador = None
+
+
+def obter_sapgui():
+    """Equivalente a win32com.client.GetObject("SAPGUI")."""
+    global _simulador
+    if _simulador is None and os.getenv("FC_SAP_SIMULADOR") == "1":
+        from sap_simulador import SimuladorSAPGUI
+        _simulador = SimuladorSAPGUI()
+    if _simulador is not None:
+        return _simulador
+
+    import win32com.client
+    return win32com.client.GetObject("SAPGUI")
+
+
+def inicializar_com():
+    """CoInitialize para threads que vão falar com o SAP (no-op no simulador)."""
+    if _simulador is None:
+        import pythoncom
+        pythoncom.CoInitialize()
+
+
+def finalizar_com():
+    if _simulador is None:
+        import pythoncom
+        pythoncom.CoUninitialize()
@@ -0,0 +1,713 @@
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+# ==========================================
+# SIMULADOR DO SAP GUI SCRIPTING (COM)
+# ==========================================
+# Modelo em processo do objeto "SAPGUI" para rodar os robôs fora do Windows:
+# aplicação → conexões → sessões → janelas/controles, com a ME51N (grid,
+# texto de cabeçalho, detalhe do item), a CO02, barra de status, popups e
+# a flag Busy. Latências são configuráveis por distribuição.
+#
+# Uso:
+#     sim = SimuladorSAPGUI(latencias=Latencias(roundtrip=Latencia.uniforme(0.02, 0.08)))
+#     sap_conexao.instalar_simulador(sim)
+
+
+class ErroSimulado(Exception):
+    """Equivalente ao com_error do SAP GUI (controle não encontrado, etc.)."""
+
+
+class Latencia:
+    """Distribuição de tempo em segundos; chamar a instância sorteia um valor."""
+
+    _rng = random.Random(42)
+    _lock = threading.Lock()
+
+    def __init__(self, amostrar):
+        self._amostrar = amostrar
+
+    def __call__(self):
+        with Latencia._lock:
+            return max(0.0, self._amostrar(Latencia._rng))
+
+    @classmethod
+    def constante(cls, segundos):
+        return cls(lambda rng: segundos)
+
+    @classmethod
+    def uniforme(cls, minimo, maximo):
+        return cls(lambda rng: rng.uniform(minimo, maximo))
+
+    @classmethod
+    def lognormal(cls, mediana, dispersao=0.5):
+        import math
+        mu = math.log(mediana) if mediana > 0 else 0.0
+        return cls(lambda rng: rng.lognormvariate(mu, dispersao) if mediana > 0 else 0.0)
+
+    @classmethod
+    def semear(cls, semente):
+        with cls._lock:
+            cls._rng.seed(semente)
+
+
+class Latencias:
+    """
+    com:        custo de qualquer chamada COM (findById, modifyCell, ...).
+    roundtrip:  bloqueio síncrono de Enter/botões (ida e volta ao servidor).
+    busy:       cauda assíncrona após o roundtrip em que session.Busy fica True.
+    gravar:     roundtrip extra da gravação de um documento.
+    """
+
+    def __init__(self, com=None, roundtrip=None, busy=None, gravar=None):
+        self.com = com or Latencia.constante(0.0)
+        self.roundtrip = roundtrip or Latencia.constante(0.0)
+        self.busy = busy or Latencia.constante(0.0)
+        self.gravar = gravar or Latencia.constante(0.0)
+
+
+def _normalizar(id_controle):
+    """
+    Normaliza o Id para comparação: remove o prefixo /app/con[n]/ses[n]/ e
+    índices [0] ("wnd[0]/tbar[0]/okcd" == "wnd/tbar/okcd"). O botão "wnd/tbar/btn"
+    sem índice (forma usada no REQ_TRANSF_INTERNA) é tratado como Gravar.
+    """
+    id_controle = str(id_controle).strip()
+    id_controle = re.sub(r'^/app/con\[\d+\]/ses\[\d+\]/?', '', id_controle)
+    return id_controle.replace('[0]', '')
+
+
+# ------------------------------------------
+# CONTROLES
+# ------------------------------------------
+class _Controle:
+    def __init__(self, sessao, id_controle):
+        object.__setattr__(self, '_sessao', sessao)
+        object.__setattr__(self, 'Id', id_controle)
+
+    def __setattr__(self, nome, valor):
+        self._sessao._com()
+        object.__setattr__(self, nome, valor)
+
+
+class _Janela(_Controle):
+    def __init__(self, sessao, id_controle, indice=0):
+        super().__init__(sessao, id_controle)
+        object.__setattr__(self, '_indice', indice)
+
+    def maximize(self):
+        self._sessao._com()
+
+    def sendVKey(self, vkey):
+        self._sessao._com()
+        self._sessao._vkey(vkey, self._indice)
+
+    def findById(self, id_relativo, levantar=True):
+        prefixo = "wnd" if self._indice == 0 else f"wnd[{self._indice}]"
+        return self._sessao.findById(f"{prefixo}/{id_relativo}", levantar)
+
+    @property
+    def text(self):
+        return self._sessao._titulo()
+
+    Text = text
+
+
+class _CampoTexto(_Controle):
+    """Campo de texto cujo valor é lido/gravado em um dicionário do modelo."""
+
+    def __init__(self, sessao, id_controle, ler, gravar):
+        super().__init__(sessao, id_controle)
+        object.__setattr__(self, '_ler', ler)
+        object.__setattr__(self, '_gravar', gravar)
+
+    @property
+    def text(self):
+        self._sessao._com()
+        return self._ler()
+
+    @text.setter
+    def text(self, valor):
+        self._sessao._com()
+        self._gravar(str(valor))
+
+    Text = text
+
+    # key (combo) usa o mesmo armazenamento
+    key = text
+    Key = text
+
+    def setSelectionIndexes(self, inicio, fim):
+        self._sessao._com()
+
+    def setFocus(self):
+        self._sessao._com()
+
+
+class _BarraStatus(_Controle):
+    @property
+    def text(self):
+        self._sessao._com()
+        return self._sessao.sbar_texto
+
+    Text = text
+
+    @property
+    def messageType(self):
+        self._sessao._com()
+        return self._sessao.sbar_tipo
+
+    MessageType = messageType
+
+
+class _Botao(_Controle):
+    def __init__(self, sessao, id_controle, acao):
+        super().__init__(sessao, id_controle)
+        object.__setattr__(self, '_acao', acao)
+
+    def press(self):
+        self._sessao._com()
+        self._acao()
+
+    def select(self):
+        self._sessao._com()
+        self._acao()
+
+    Select = select
+
+
+class _Conteiner(_Controle):
+    def __init__(self, sessao, id_controle, filhos):
+        super().__init__(sessao, id_controle)
+        object.__setattr__(self, '_filhos', filhos)
+
+    @property
+    def Children(self):
+        self._sessao._com()
+        return _Colecao(self._filhos)
+
+
+class _Grid(_Controle):
+    """Grid de itens da ME51N (GuiGridView)."""
+
+    def __init__(self, sessao, id_controle):
+        super().__init__(sessao, id_controle)
+        object.__setattr__(self, 'selectedRows', '')
+        object.__setattr__(self, 'currentCellColumn', '')
+
+    @property
+    def _doc(self):
+        return self._sessao.me51n
+
+    @property
+    def RowCount(self):
+        self._sessao._com()
+        return max(self._doc['linhas'].keys(), default=-1) + 1
+
+    rowCount = RowCount
+
+    def modifyCell(self, linha, coluna, valor):
+        self._sessao._com()
+        registro = self._doc['linhas'].setdefault(int(linha), {})
+        registro[coluna] = str(valor)
+        registro['_alterada'] = True
+        if coluna == 'EEIND':
+            registro['_eeind_digitado'] = True
+
+    def getCellValue(self, linha, coluna):
+        self._sessao._com()
+        return self._doc['linhas'].get(int(linha), {}).get(coluna, '') if not coluna.startswith('_') else ''
+
+    def setCurrentCell(self, linha, coluna):
+        self._sessao._com()
+        self._doc['item_atual'] = int(linha)
+        object.__setattr__(self, 'currentCellColumn', coluna)
+
+    def pressEnter(self):
+        self._sessao._com()
+        self._sessao._vkey(0, 0)
+
+    def pressToolbarButton(self, botao):
+        self._sessao._com()
+        if botao.upper() not in ('DELETE', '&MEREQDELETE', '&DELETE'):
+            raise ErroSimulado(f"Botão de toolbar desconhecido: {botao}")
+        selecionadas = sorted(
+            {int(x) for x in str(self.selectedRows).replace('-', ',').split(',') if x.strip().isdigit()},
+            reverse=True,
+        )
+        linhas = self._doc['linhas']
+        for idx in selecionadas:
+            linhas.pop(idx, None)
+        # Reindexa como o ALV faz ao excluir
+        self._doc['linhas'] = {novo: linhas[antigo] for novo, antigo in enumerate(sorted(linhas))}
+        self._sessao._roundtrip()
+
+
+# ------------------------------------------
+# SESSÃO
+# ------------------------------------------
+class SessaoSimulada:
+    def __init__(self, conexao, indice, logada=True):
+        self.Parent = conexao
+        self.indice = indice
+        self.sim = conexao.sim
+        self.tela = 'menu' if logada else 'login'
+        self.okcd = ''
+        self.sbar_texto = ''
+        self.sbar_tipo = ''
+        self.popup = None
+        self._ocupado_ate = 0.0
+        self.login = {'usuario': '', 'senha': ''}
+        self.co02 = {'aufnr': '', 'teco': False}
+        self._novo_documento()
+
+    @property
+    def Id(self):
+        return f"/app/con[{self.Parent.indice}]/ses[{self.indice}]"
+
+    # --- Busy ---
+    @property
+    def Busy(self):
+        return time.monotonic() < self._ocupado_ate
+
+    busy = Busy
+
+    def _com(self):
+        self.sim._contar('chamadas_com')
+        atraso = self.sim.latencias.com()
+        if atraso:
+            time.sleep(atraso)
+
+    def _roundtrip(self, extra=None):
+        self.sim._contar('roundtrips')
+        atraso = self.sim.latencias.roundtrip() + (extra() if extra else 0.0)
+        if atraso:
+            time.sleep(atraso)
+        self._ocupado_ate = time.monotonic() + self.sim.latencias.busy()
+
+    def _status(self, tipo, texto):
+        self.sbar_tipo = tipo
+        self.sbar_texto = texto
+
+    def _titulo(self):
+        return {
+            'login': 'SAP',
+            'menu': 'SAP Easy Access',
+            'ME51N': 'Criar requisição de compra',
+            'CO02_inicial': 'Modificar ordem de produção: tela inicial',
+            'CO02_ordem': 'Modificar ordem de produção: síntese',
+        }.get(self.tela, 'SAP')
+
+    def createSession(self):
+        self._com()
+        self.Parent._nova_sessao()
+
+    # --- Localização de controles ---
+    def findById(self, id_controle, levantar=True):
+        self._com()
+        self.sim._contar('findById')
+        controle = self._resolver(_normalizar(id_controle), id_controle)
+        if controle is None:
+            self.sim._contar('findById_falhos')
+            if levantar:
+                raise ErroSimulado(f"The control could not be found by id. ({id_controle})")
+        return controle
+
+    FindById = findById
+
+    def _resolver(self, n, original):
+        if n in ('wnd', ''):
+            return _Janela(self, original, 0)
+        if n == 'wnd[1]' or n.startswith('wnd[1]/'):
+            return self._resolver_popup(n, original)
+        if n.startswith('wnd[') and not n.startswith('wnd/'):
+            return None
+
+        if n == 'wnd/tbar/okcd':
+            return _CampoTexto(self, original, lambda: self.okcd, lambda v: setattr(self, 'okcd', v))
+        if n in ('wnd/sbar', 'sbar'):
+            return _BarraStatus(self, original)
+        if n in ('wnd/tbar/btn[11]', 'wnd/tbar/btn'):
+            return _Botao(self, original, self._gravar)
+        if n == 'wnd/tbar/btn[3]':
+            return _Botao(self, original, self._voltar)
+
+        ultimo = n.rsplit('/', 1)[-1]
+
+        if self.tela == 'login':
+            if ultimo == 'txtRSYST-BNAME':
+                return _CampoTexto(self, original, lambda: self.login['usuario'], lambda v: self.login.__setitem__('usuario', v))
+            if ultimo == 'pwdRSYST-BCODE':
+                return _CampoTexto(self, original, lambda: self.login['senha'], lambda v: self.login.__setitem__('senha', v))
+            return None
+
+        if self.tela == 'ME51N':
+            return self._resolver_me51n(n, ultimo, original)
+        if self.tela.startswith('CO02'):
+            return self._resolver_co02(n, ultimo, original)
+        return None
+
+    def _resolver_popup(self, n, original):
+        if not self.popup:
+            return None
+        if n == 'wnd[1]':
+            return _Janela(self, original, 1)
+        ultimo = n.rsplit('/', 1)[-1]
+        if ultimo in ('btn', 'btnSPOP-VAROPTION1', 'btnSPOP-OPTION1'):
+            return _Botao(self, original, self._confirmar_popup)
+        return None
+
+    def _resolver_me51n(self, n, ultimo, original):
+        doc = self.me51n
+        if n == 'wnd/usr':
+            subtela = f"{self.Id}/wnd[0]/usr/subSUB0:SAPLMEGUI:{self.sim.subtela_me51n or '0013'}"
+            return _Conteiner(self, original, [_Controle(self, subtela)])
+        # Com subtela_me51n definida, só o número de subtela correto é aceito
+        if self.sim.subtela_me51n and 'subSUB0:SAPLMEGUI:' in n \
+                and f"subSUB0:SAPLMEGUI:{self.sim.subtela_me51n}" not in n:
+            return None
+        if 'cntlGRIDCONTROL' in n:
+            return _Grid(self, original)
+        if 'cntlTEXT_EDITOR' in n:
+            if doc['cabecalho_recolhido']:
+                return None
+            return _CampoTexto(self, original, lambda: doc['texto'], lambda v: doc.__setitem__('texto', v))
+        if ultimo == 'cmbMEREQ_TOPLINE-BSART':
+            return _CampoTexto(self, original, lambda: doc['bsart'], lambda v: doc.__setitem__('bsart', v))
+        if ultimo.startswith('tabp'):
+            return _Botao(self, original, lambda: doc.__setitem__('aba', ultimo))
+        if ultimo == 'btn%#AUTOTEXT002':
+            return _Botao(self, original, self._proximo_item)
+        if ultimo == 'ctxtCOBL-PS_POSID':
+            return self._campo_item(original, 'PS_POSID')
+        if ultimo == 'ctxtEBAN-ZZDEP_FORNEC':
+            return self._campo_item(original, 'ZZDEP_FORNEC')
+        return None
+
+    def _campo_item(self, original, coluna):
+        doc = self.me51n
+        if not doc['linhas']:
+            return None
+
+        def ler():
+            return doc['linhas'].get(doc['item_atual'], {}).get(coluna, '')
+
+        def gravar(valor):
+            doc['linhas'].setdefault(doc['item_atual'], {})[coluna] = valor
+
+        return _CampoTexto(self, original, ler, gravar)
+
+    def _resolver_co02(self, n, ultimo, original):
+        if ultimo == 'ctxtCAUFVD-AUFNR':
+            return _CampoTexto(self, original, lambda: self.co02['aufnr'], lambda v: self.co02.__setitem__('aufnr', v.strip()))
+        if n == 'wnd/mbar/menu/menu/menu' and self.tela == 'CO02_ordem':
+            return _Botao(self, original, lambda: self.co02.__setitem__('teco', True))
+        return None
+
+    # --- Ações ---
+    def _vkey(self, vkey, janela):
+        if janela == 1:
+            if self.popup and vkey == 0:
+                self._confirmar_popup()
+            return
+        if self.popup:
+            raise ErroSimulado("Janela modal aberta (wnd[1]).")
+
+        if vkey == 0 and self.okcd:
+            comando, self.okcd = self.okcd.strip().upper(), ''
+            self._roundtrip()
+            self._executar_comando(comando)
+            return
+        if vkey == 0:
+            self._roundtrip()
+            self._enter()
+        elif vkey == 11:
+            self._gravar()
+        elif vkey == 3:
+            self._voltar()
+        elif vkey == 26 and self.tela == 'ME51N':
+            self._roundtrip()
+            self.me51n['cabecalho_recolhido'] = False
+
+    def _executar_comando(self, comando):
+        self._status('', '')
+        if comando in ('/NME51N', 'ME51N'):
+            self.tela = 'ME51N'
+            self._novo_documento()
+            # O SAP costuma abrir o cabeçalho recolhido a partir do 2º documento
+            recolher = self.sim.sessao_ja_criou_documento(self) and self.sim.sortear(self.sim.prob_cabecalho_recolhido)
+            self.me51n['cabecalho_recolhido'] = recolher
+        elif comando in ('/NCO02', 'CO02'):
+            self.tela = 'CO02_inicial'
+            self.co02 = {'aufnr': '', 'teco': False}
+        elif comando in ('/N', '/NEX'):
+            self.tela = 'menu'
+        else:
+            self._status('E', f"Transação {comando} não existe")
+
+    def _novo_documento(self):
+        self.me51n = {
+            'linhas': {}, 'bsart': 'NB', 'texto': '', 'item_atual': 0,
+            'aba': None, 'cabecalho_recolhido': False,
+        }
+
+    def _enter(self):
+        if self.tela == 'login':
+            if self.login['usuario'] and self.login['senha']:
+                self.tela = 'menu'
+            else:
+                self._status('E', 'Preencher todos os campos obrigatórios')
+        elif self.tela == 'ME51N':
+            self._verificar_me51n()
+        elif self.tela == 'CO02_inicial':
+            aufnr = self.co02['aufnr']
+            if not aufnr or aufnr in self.sim.ordens_inexistentes:
+                self._status('E', f"Ordem {aufnr} não existe")
+            else:
+                self.tela = 'CO02_ordem'
+                self._status('', '')
+
+    def _linhas_validas(self):
+        return {i: l for i, l in self.me51n['linhas'].items() if l.get('MATNR')}
+
+    @staticmethod
+    def _colunas_visiveis(linha):
+        return {k: v for k, v in linha.items() if not k.startswith('_')}
+
+    def _erro_linha(self, linha):
+        material = linha.get('MATNR', '')
+        if material in self.sim.materiais_invalidos:
+            centro = linha.get('NAME1') or linha.get('RESWK') or 'BR8E'
+            return f"Material {material} não está atualizado no centro {centro}"
+        if linha.get('KNTTP') == 'P' and not linha.get('PS_POSID'):
+            return "Informar elemento PEP"
+        return None
+
+    def _verificar_me51n(self):
+        # Só as linhas alteradas desde o último Enter geram mensagem; um Enter
+        # sem alterações mantém a barra de status como está
+        linhas = {i: l for i, l in self._linhas_validas().items() if l.pop('_alterada', False)}
+        if not linhas:
+            return
+        for idx in sorted(linhas):
+            linha = linhas[idx]
+            # SAP pode sobrescrever a data digitada na primeira verificação
+            if linha.pop('_eeind_digitado', False) and not linha.get('_eeind_sobrescrita'):
+                if self.sim.sortear(self.sim.prob_sobrescrever_data):
+                    linha['EEIND'] = (datetime.now() + timedelta(days=self.sim.dias_data_padrao)).strftime('%d.%m.%Y')
+                    linha['_eeind_sobrescrita'] = True
+        for idx in sorted(linhas):
+            erro = self._erro_linha(linhas[idx])
+            if erro and not erro.startswith("Informar elemento PEP"):
+                self._status('E', erro)
+                return
+        self._status('', '')
+        if self.sim.sortear(self.sim.prob_popup):
+            self.popup = 'info'
+            self.sim._contar('popups')
+
+    def _gravar(self):
+        if self.tela == 'ME51N':
+            self._gravar_me51n()
+        elif self.tela == 'CO02_ordem':
+            self._roundtrip(self.sim.latencias.gravar)
+            aufnr = self.co02['aufnr']
+            if self.co02['teco']:
+                self.sim.status_ordens[aufnr] = 'ENTE'
+                self.sim._contar('ordens_concluidas')
+            self._status('S', f"Ordem {aufnr} gravada")
+            self.tela = 'CO02_inicial'
+        else:
+            self._roundtrip()
+
+    def _gravar_me51n(self, confirmado=False):
+        linhas = self._linhas_validas()
+        self._roundtrip()
+        if not linhas:
+            self._status('E', 'Nenhuma posição no documento')
+            return
+        for pos, idx in enumerate(sorted(linhas), start=1):
+            erro = self._erro_linha(linhas[idx])
+            if erro:
+                self._status('E', f"Item {pos * 10:05d}: {erro}")
+                return
+        if not confirmado and self.sim.sortear(self.sim.prob_popup_gravar):
+            self.popup = 'gravar'
+            self.sim._contar('popups')
+            return
+
+        self._roundtrip(self.sim.latencias.gravar)
+        numero = self.sim._proximo_numero()
+        self.sim._registrar_documento(self, numero, [self._colunas_visiveis(linhas[i]) for i in sorted(linhas)], dict(self.me51n))
+        self._status('S', f"Requisição de compra {numero} criada")
+        self._novo_documento()
+
+    def _confirmar_popup(self):
+        tipo, self.popup = self.popup, None
+        if tipo == 'gravar':
+            self._gravar_me51n(confirmado=True)
+        else:
+            self._roundtrip()
+
+    def _voltar(self):
+        self._roundtrip()
+        self.tela = 'menu'
+
+    def _proximo_item(self):
+        self._roundtrip()
+        self.me51n['item_atual'] += 1
+
+
+# ------------------------------------------
+# CONEXÃO / APLICAÇÃO
+# ------------------------------------------
+class _Colecao:
+    """Coleção COM: chamável por índice e com Count."""
+
+    def __init__(self, itens):
+        self._itens = itens
+
+    def __call__(self, indice):
+        return self._itens[indice]
+
+    def Item(self, indice):
+        return self._itens[indice]
+
+    @property
+    def Count(self):
+        return len(self._itens)
+
+    Length = Count
+
+    def __iter__(self):
+        return iter(list(self._itens))
+
+
+class ConexaoSimulada:
+    MAX_SESSOES = 6
+
+    def __init__(self, sim, indice, logada=True):
+        self.sim = sim
+        self.indice = indice
+        self._sessoes = []
+        self._lock = threading.Lock()
+        self._nova_sessao(logada)
+
+    @property
+    def Id(self):
+        return f"/app/con[{self.indice}]"
+
+    @property
+    def Children(self):
+        return _Colecao(self._sessoes)
+
+    Sessions = Children
+
+    def _nova_sessao(self, logada=True):
+        with self._lock:
+            if len(self._sessoes) >= self.MAX_SESSOES:
+                raise ErroSimulado("Número máximo de sessões atingido")
+            sessao = SessaoSimulada(self, len(self._sessoes), logada)
+            self._sessoes.append(sessao)
+            return sessao
+
+
+class AplicacaoSimulada:
+    def __init__(self, sim):
+        self.sim = sim
+        self._conexoes = []
+
+    @property
+    def Children(self):
+        return _Colecao(self._conexoes)
+
+    Connections = Children
+
+    def OpenConnection(self, sistema, sincrono=True):
+        conexao = ConexaoSimulada(self.sim, len(self._conexoes), logada=False)
+        self._conexoes.append(conexao)
+        return conexao
+
+    def findById(self, id_controle):
+        m = re.match(r'^/app/con\[(\d+)\](?:/ses\[(\d+)\])?(/.*)?$', str(id_controle))
+        if not m:
+            raise ErroSimulado(f"Id inválido: {id_controle}")
+        conexao = self._conexoes[int(m.group(1))]
+        if m.group(2) is None:
+            return conexao
+        sessao = conexao.Children(int(m.group(2)))
+        if m.group(3):
+            return sessao.findById(m.group(3).lstrip('/'))
+        return sessao
+
+
+class SimuladorSAPGUI:
+    """
+    Substituto de GetObject("SAPGUI"). Parâmetros de cenário:
+
+    materiais_invalidos:      materiais que dão "não está atualizado no centro".
+    ordens_inexistentes:      OFs que a CO02 não encontra.
+    status_ordens:            status inicial das OFs (ex.: {'1000123': 'ENTE'}).
+    prob_popup:               chance de popup informativo após Enter na ME51N.
+    prob_popup_gravar:        chance do popup "Gravar doc." ao gravar.
+    prob_sobrescrever_data:   chance de o SAP trocar a EEIND digitada.
+    prob_cabecalho_recolhido: chance do texto de cabeçalho vir recolhido.
+    subtela_me51n:            se definida (ex.: '0016'), só Ids com esse número
+                              de subtela são encontrados na ME51N.
+    """
+
+    def __init__(self, latencias=None, conectado=True, materiais_invalidos=(),
+                 ordens_inexistentes=(), status_ordens=None, prob_popup=0.0,
+                 prob_popup_gravar=0.0, prob_sobrescrever_data=0.0,
+                 prob_cabecalho_recolhido=0.0, dias_data_padrao=30, subtela_me51n=None,
+                 semente=42):
+        self.latencias = latencias or Latencias()
+        self.materiais_invalidos = set(materiais_invalidos)
+        self.ordens_inexistentes = set(ordens_inexistentes)
+        self.status_ordens = dict(status_ordens or {})
+        self.prob_popup = prob_popup
+        self.prob_popup_gravar = prob_popup_gravar
+        self.prob_sobrescrever_data = prob_sobrescrever_data
+        self.prob_cabecalho_recolhido = prob_cabecalho_recolhido
+        self.dias_data_padrao = dias_data_padrao
+        self.subtela_me51n = subtela_me51n
+        self._rng = random.Random(semente)
+        self._lock = threading.Lock()
+        self._numero = 10000000
+        self.documentos = []
+        self.estatisticas = {}
+        self.GetScriptingEngine = AplicacaoSimulada(self)
+        if conectado:
+            self.GetScriptingEngine._conexoes.append(ConexaoSimulada(self, 0, logada=True))
+
+    def sortear(self, probabilidade):
+        if probabilidade <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < probabilidade
+
+    def _contar(self, chave, n=1):
+        with self._lock:
+            self.estatisticas[chave] = self.estatisticas.get(chave, 0) + n
+
+    def _proximo_numero(self):
+        with self._lock:
+            self._numero += 1
+            return f"{self._numero:010d}"
+
+    def _registrar_documento(self, sessao, numero, linhas, cabecalho):
+        with self._lock:
+            self.documentos.append({
+                'numero': numero, 'sessao': sessao.Id, 'itens': linhas,
+                'bsart': cabecalho['bsart'], 'texto': cabecalho['texto'],
+            })
+        self._contar('documentos')
+        self._contar('itens', len(linhas))
+
+    def sessao_ja_criou_documento(self, sessao):
+        with self._lock:
+            return any(d['sessao'] == sessao.Id for d in self.documentos)
@@ -0,0 +1,101 @@
+import argparse
+import logging
+import tempfile
+
+from espera_sap import aguardar_controle
+from exportacao_sap import ler_tabela, sem_zeros, importar_selecao_multipla, salvar_lista, voltar_ao_menu
+
+
+# ==========================================
+# PRÉ-VERIFICAÇÃO DO STATUS DAS OFs (COOIS)
+# ==========================================
+# Antes de abrir a CO02 OF por OF, o status de sistema de todas as ordens da
+# aba vem de uma única COOIS (seleção múltipla importada de arquivo, lista
+# salva como não convertida) ou de um arquivo já exportado. OFs que já estão
+# encerradas tecnicamente não precisam da CO02.
+#
+# Teste offline de um arquivo exportado:
+#   python status_ordens.py export_coois.txt [--ordem 1000123]
+
+# --- IDs DA COOIS (sistema de informação de ordens, lista de cabeçalhos) ---
+ID_COOIS_ORDEM = "wnd[0]/usr/ssub%_SUBSCREEN_TOPBLOCK:PPIO_ENTRY:1100/ctxtS_AUFNR-LOW"
+ID_COOIS_ORDEM_MULTIPLO = "wnd[0]/usr/ssub%_SUBSCREEN_TOPBLOCK:PPIO_ENTRY:1100/btn%_S_AUFNR_%_APP_%-VALU_PUSH"
+ID_COOIS_GRID = "wnd[0]/usr/cntlCUSTOM/shellcont/shell/shellcont/shell"
+
+# Status de sistema que dispensam a CO02 (PT e EN: encerramento técnico/comercial)
+STATUS_CONCLUIDOS = ('ENTE', 'TECO', 'ENCE', 'CLSD')
+
+COLUNAS = {
+    'ordem': ('ordem', 'order', 'aufnr'),
+    'status': ('statussistema', 'statusdosistema', 'systemstatus', 'status', 'sttxt'),
+}
+
+
+def ler_exportacao(caminho):
+    """{OF sem zeros à esquerda: status de sistema ('LIB  ENTE ...')}."""
+    return {
+        sem_zeros(valores['ordem']): valores.get('status', '')
+        for valores in ler_tabela(caminho, COLUNAS, ('ordem', 'status'))
+        if valores['ordem']
+    }
+
+
+def concluida(status, concluidos=STATUS_CONCLUIDOS):
+    return any(codigo in str(status or '').upper().split() for codigo in concluidos)
+
+
+def exportar_coois(session, ordens, pasta=None, timeout=120, logger=None):
+    """
+    Roda a COOIS para todas as OFs de uma vez e salva a lista. Retorna o
+    caminho do arquivo ou None se algo falhar.
+    """
+    logger = logger or logging.getLogger(__name__)
+    pasta = pasta or tempfile.gettempdir()
+    try:
+        session.findById("wnd[0]/tbar[0]/okcd").Text = "/NCOOIS"
+        session.findById("wnd[0]").sendVKey(0)
+        if not aguardar_controle(session, ID_COOIS_ORDEM, timeout):
+            logger.warning("COOIS: tela de seleção não abriu.")
+            return None
+        importar_selecao_multipla(session, ID_COOIS_ORDEM_MULTIPLO, ordens, pasta, 'coois_ordens.txt')
+        session.findById("wnd[0]/tbar[1]/btn[8]").press()  # Executar (F8)
+        if not aguardar_controle(session, ID_COOIS_GRID, timeout):
+            logger.warning("COOIS: lista não retornou (%s).", session.findById("wnd[0]/sbar").Text)
+            return None
+        return salvar_lista(session, pasta, 'coois_status.txt', id_grid=ID_COOIS_GRID, timeout=timeout)
+    except Exception as e:
+        logger.warning("COOIS: exportação falhou (%s).", e)
+        return None
+    finally:
+        voltar_ao_menu(session)
+
+
+def obter_status(session, ordens, arquivo=None, pasta=None, logger=None):
+    """
+    Status das OFs: de arquivo (se informado) ou de uma COOIS feita agora.
+    None se não foi possível obter (a CO02 roda para todas, como antes).
+    """
+    logger = logger or logging.getLogger(__name__)
+    caminho = arquivo or exportar_coois(session, ordens, pasta=pasta, logger=logger)
+    if not caminho:
+        return None
+    try:
+        status = ler_exportacao(caminho)
+    except Exception as e:
+        logger.warning("Não foi possível ler o status das OFs (%s): %s", caminho, e)
+        return None
+    logger.info("Status de %s OF(s) carregado de %s.", len(status), caminho)
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lê uma exportação da COOIS e mostra o status das OFs.")
+    parser.add_argument('arquivo')
+    parser.add_argument('--ordem', help="Mostra só esta OF")
+    args = parser.parse_args()
+
+    status = ler_exportacao(args.arquivo)
+    print(f"{len(status)} OF(s); {sum(concluida(s) for s in status.values())} já concluída(s).")
+    for ordem, texto in status.items():
+        if not args.ordem or ordem == sem_zeros(args.ordem):
+            print(f"{ordem}: {texto} {'(concluída)' if concluida(texto) else ''}")